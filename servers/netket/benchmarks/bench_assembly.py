@@ -0,0 +1,70 @@
+"""
+Benchmarks for Hamiltonian assembly of the netket server.
+
+Builds the fermion models on chains of increasing length, once by adding up one bond or site at a time and
+once through `HamiltonianSchema.build_netket_hamiltonian`, which passes all terms to a single
+FermionOperator2nd, and reports the assembly times.
+
+Usage:
+    python benchmarks/bench_assembly.py [--sites 12 14 16 18 20] [--repeat 5]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "netket"))
+from netket.experimental.operator.fermion import destroy as c
+from netket.experimental.operator.fermion import create as cdag
+from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
+
+MODELS = {
+    "ssh": ("1 spinless fermion", "SSH model with t1=1, t2=0.3"),
+    "hubbard": ("2 fermions with spin-1/2", "Hubbard model with t=1, U=4"),
+}
+
+
+def term_by_term(model: str, hi, L: int):
+    H = 0
+    for i in range(L - 1):
+        if model == "ssh":
+            t = 0.3 if i % 2 == 0 else 1.0
+            H += -t * (cdag(hi, i) * c(hi, i + 1) + cdag(hi, i + 1) * c(hi, i))
+        else:
+            H += -sum(cdag(hi, i, sz) * c(hi, i + 1, sz) + cdag(hi, i + 1, sz) * c(hi, i, sz) for sz in [1, -1])
+    if model == "hubbard":
+        for i in range(L):
+            H += 4.0 * cdag(hi, i, 1) * c(hi, i, 1) * cdag(hi, i, -1) * c(hi, i, -1)
+    return H
+
+
+def best_time(build, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark term-by-term and one-shot Hamiltonian assembly")
+    parser.add_argument("--sites", type=int, nargs="+", default=[12, 14, 16, 18, 20], help="Chain lengths")
+    parser.add_argument("--repeat", type=int, default=5, help="Builds per measurement (the best is kept)")
+    args = parser.parse_args()
+
+    print(f"{'model':<10}{'sites':>6}{'term by term (ms)':>20}{'one shot (ms)':>16}{'speedup':>10}")
+    for model, (hilbert_text, hamiltonian_text) in MODELS.items():
+        for sites in args.sites:
+            system_hilbert = HilbertSpaceSchema(text=hilbert_text)
+            hamiltonian = HamiltonianSchema(text=hamiltonian_text)
+            graph = LatticeSchema(text=f"chain of {sites} sites").to_netket_graph()
+            hi = system_hilbert.to_netket_hilbert(graph)
+
+            old = best_time(lambda: term_by_term(model, hi, sites), args.repeat)
+            new = best_time(lambda: hamiltonian.build_netket_hamiltonian(hi, graph, system_hilbert), args.repeat)
+            print(f"{model:<10}{sites:>6}{old * 1e3:>20.2f}{new * 1e3:>16.2f}{old / new:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
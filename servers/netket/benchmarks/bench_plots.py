@@ -0,0 +1,79 @@
+"""
+Benchmarks for plot rendering of the netket server.
+
+Renders spectrum and parameter sweep plots of changing data repeatedly, once through pyplot as
+`generate_plot` used to (a new figure per plot, saved with a tight bounding box) and once through
+`PlotRenderer`, which reuses one figure per plot type, and reports the time per plot and the image size.
+
+Usage:
+    python benchmarks/bench_plots.py [--plots 20] [--dpi 150]
+"""
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "netket"))
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from netket_plots import Panel, PlotRenderer
+
+
+def spectrum_panels(rng):
+    eigvals = np.sort(rng.normal(size=20)) * 10
+    return [Panel(range(len(eigvals)), eigvals, "Eigenvalue index", "Energy", "Energy Spectrum: ssh Model")]
+
+
+def sweep_panels(rng):
+    x = np.linspace(0, 2, 41)
+    return [Panel(x, -np.cosh(x) + rng.normal(size=x.size) * 0.01, "t2", "Ground State Energy", "Ground State Energy"),
+            Panel(x, np.abs(1 - x) + rng.normal(size=x.size) * 0.01, "t2", "Energy Gap", "Energy Gap")]
+
+
+def pyplot_render(plot_type: str, panels, fmt: str, dpi: float) -> bytes:
+    plt.close('all')
+    fig, axes = plt.subplots(1, len(panels), figsize=(12, 5) if len(panels) > 1 else (8, 6), squeeze=False)
+    for ax, panel, color in zip(axes[0], panels, [None, 'red']):
+        ax.plot(panel.x, panel.y, 'o-', markersize=6, color=color)
+        ax.set_xlabel(panel.xlabel, fontsize=12)
+        ax.set_ylabel(panel.ylabel, fontsize=12)
+        ax.set_title(panel.title, fontsize=14)
+        ax.grid(True, alpha=0.3)
+    plt.tight_layout()
+    buf = io.BytesIO()
+    plt.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight')
+    plt.close()
+    return buf.getvalue()
+
+
+def time_per_plot(render, plot_type: str, make_panels, fmt: str, dpi: float, plots: int):
+    rng = np.random.default_rng(0)
+    render(plot_type, make_panels(rng), fmt, dpi)
+    start = time.perf_counter()
+    for _ in range(plots):
+        image = render(plot_type, make_panels(rng), fmt, dpi)
+    return (time.perf_counter() - start) / plots, len(image)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pyplot and template plot rendering")
+    parser.add_argument("--plots", type=int, default=20, help="Plots per measurement")
+    parser.add_argument("--dpi", type=float, default=150, help="Resolution of the images")
+    args = parser.parse_args()
+
+    renderer = PlotRenderer()
+    templates = lambda plot_type, panels, fmt, dpi: renderer.render(plot_type, panels, fmt=fmt, dpi=dpi)
+
+    print(f"{'plot':<18}{'renderer':<12}{'format':<8}{'ms/plot':>10}{'KB':>8}")
+    for plot_type, make_panels in [("spectrum", spectrum_panels), ("parameter_sweep", sweep_panels)]:
+        for name, render, fmt in [("pyplot", pyplot_render, "png"), ("templates", templates, "png"),
+                                  ("templates", templates, "webp")]:
+            seconds, size = time_per_plot(render, plot_type, make_panels, fmt, args.dpi, args.plots)
+            print(f"{plot_type:<18}{name:<12}{fmt:<8}{seconds * 1e3:>10.1f}{size / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmarks for parameter sweeps of the netket server.
+
+Diagonalizes a transverse-field Ising chain along a path in hx, first with an increasing number of worker
+processes, then serially with and without warm-started eigsh calls, and reports wall-clock times and the
+number of matrix-vector products.
+
+Usage:
+    python benchmarks/bench_sweep.py [--sites 14] [--points 32] [--workers 1 2 4]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "netket"))
+from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
+from netket_sweep import AffineHamiltonian, SweepExecutor, shutdown_pools
+
+
+def build(sites: int) -> AffineHamiltonian:
+    hilbert = HilbertSpaceSchema(text="spin-1/2 on each site")
+    hamiltonian = HamiltonianSchema(text="Ising model with Jz=1, hx=0.5")
+    graph = LatticeSchema(text=f"chain of {sites} sites").to_netket_graph()
+    hi = hilbert.to_netket_hilbert(graph)
+    return AffineHamiltonian.from_schema(hamiltonian, hi, graph, hilbert)
+
+
+def timed(executor: SweepExecutor, points: list) -> tuple:
+    start = time.perf_counter()
+    results = executor.run(points)
+    return time.perf_counter() - start, sum(point.matvecs for point in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel and warm-started parameter sweeps")
+    parser.add_argument("--sites", type=int, default=14, help="Length of the Ising chain")
+    parser.add_argument("--points", type=int, default=32, help="Number of hx values")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--k", type=int, default=6, help="Eigenvalues per point")
+    args = parser.parse_args()
+
+    affine_h = build(args.sites)
+    points = [{"Jz": 1.0, "hx": hx, "hz": 0.0} for hx in np.linspace(0.1, 2.0, args.points)]
+    print(f"{args.sites}-site chain, {affine_h.n_states} states, {args.points} points, k={args.k}\n")
+
+    try:
+        print(f"{'workers':<10}{'time (s)':>10}{'speedup':>10}")
+        baseline = None
+        for workers in args.workers:
+            executor = SweepExecutor(affine_h, k=args.k, workers=workers)
+            if workers > 1:
+                # Start the pool outside of the measurement
+                executor.run(points[:workers])
+            elapsed, _ = timed(executor, points)
+            baseline = baseline or elapsed
+            print(f"{workers:<10}{elapsed:>10.2f}{baseline / elapsed:>10.2f}")
+    finally:
+        shutdown_pools()
+
+    print(f"\n{'serial':<14}{'time (s)':>10}{'matvecs':>10}")
+    for warm_start in (False, True):
+        elapsed, matvecs = timed(SweepExecutor(affine_h, k=args.k, warm_start=warm_start), points)
+        print(f"{'warm start' if warm_start else 'cold start':<14}{elapsed:>10.2f}{matvecs:>10}")
+
+
+if __name__ == "__main__":
+    main()
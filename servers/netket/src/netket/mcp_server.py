@@ -1,23 +1,36 @@
-from mcp.server.fastmcp import FastMCP, Image
+from mcp.server.fastmcp import FastMCP, Image, Context
 from mcp.types import TextContent, ImageContent
 from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
 from netket_jsons import NetKetJSONManager, QuantumSystemState
+from netket_cache import HamiltonianCache, spec_key, spectrum_key, stored_spectrum, sweep_key
+from netket_sweep import (AffineHamiltonian, SweepCheckpoint, SweepExecutor, DENSE_LIMIT, MAX_GRID_POINTS,
+                          SWEEP_CHECKPOINT, diagonalize, grid_arrays, grid_points, refinement_points)
+from netket_symmetry import parse_sectors, sector_matrices
+from netket_solver import SOLVER_STRATEGIES, select_eigenpairs, solve_spectrum
+from netket_vmc import VMC_CHECKPOINT, VMCSettings, run_vmc
+from netket_plots import DEFAULT_DPI, FILE_FORMATS, IMAGE_FORMATS, Heatmap, Panel, PlotRenderer
+from netket_observables import (OBSERVABLES, ObservableEngine, default_bipartitions, default_observables,
+                                marshall_sublattice)
 from typing import Literal, Optional, Dict, Any, List, Union
 import numpy as np
 import netket as nk
 from netket.experimental.operator.fermion import destroy as c
 from netket.experimental.operator.fermion import create as cdag
-from scipy.sparse.linalg import eigsh
-import matplotlib.pyplot as plt
-import io
 import base64
 import shutil
+import anyio
 
 # Create the MCP server object
 mcp = FastMCP('NetKet Quantum Many-Body Physics Server')
 
-# Create a JSON manager
-json_manager = NetKetJSONManager()
+# Create a JSON manager; snapshots of systems changed several times within half a second are written once
+json_manager = NetKetJSONManager(save_delay=0.5)
+
+# Cache of built Hamiltonians, shared by all tools
+hamiltonian_cache = HamiltonianCache()
+
+# Plot figures are created once per plot type and reused, outside of pyplot
+plot_renderer = PlotRenderer()
 
 # @mcp.tool() # This is a test tool
 # def add(a: int, b: int) -> int:
@@ -173,7 +186,9 @@ def set_hamiltonian(system_id: str, hamiltonian_spec: str,
     }
 
 @mcp.tool()
-def compute_energy_spectrum(system_id: str, num_eigenvalues: int = 10, which: str = "SA") -> Dict[str, Any]:
+def compute_energy_spectrum(system_id: str, num_eigenvalues: int = 10, which: str = "SA",
+                            sectors: Optional[Dict[str, Union[str, float, List[float]]]] = None,
+                            solver: str = "auto", memory_limit_mb: Optional[float] = None) -> Dict[str, Any]:
     '''Compute the energy spectrum of a quantum system.
     
     This tool performs exact diagonalization to find the energy eigenvalues
@@ -184,6 +199,21 @@ def compute_energy_spectrum(system_id: str, num_eigenvalues: int = 10, which: st
         system_id: The ID of the quantum system
         num_eigenvalues: Number of eigenvalues to compute (default: 10)
         which: Which eigenvalues to compute ("SA" for smallest algebraic, "LA" for largest algebraic)
+        sectors: Optional symmetry sectors to diagonalize separately, using the quantities the model conserves:
+            "total_sz" (spin models without transverse field, spin-1/2 fermions) and "momentum" (translation
+            invariant spin chains, in units of 2*pi/L). Values are a list or "all",
+            e.g. {"total_sz": [0], "momentum": "all"}. Only the total Sz blocks are built, so much larger
+            systems fit; momentum blocks are projected out of them and do not raise the size limit. Each
+            sector reports the eigenvalues `which` asks for, and no eigenvectors are stored.
+        solver: "dense", "sparse" (sparse matrix and Lanczos), "matrix_free" (Lanczos on the operator itself,
+            recomputing its matrix elements at every step: slower, but memory only scales with the number of
+            states) or "auto" (default) to choose from the estimated memory.
+        memory_limit_mb: Memory the sparse matrix may take before "auto" goes matrix-free
+            (default: half of the physical memory).
+    
+    The spectrum is stored with the system and reused until a component changes: asking for fewer
+    eigenvalues returns the stored ones, and asking for more of the lowest or highest ones only solves
+    for the missing ones.
         
     Returns:
         Dictionary containing the energy spectrum
@@ -195,7 +225,9 @@ def compute_energy_spectrum(system_id: str, num_eigenvalues: int = 10, which: st
             "eigenvalues": [-2.5, -1.8, -0.3, 0.3, 1.8],
             "ground_state_energy": -2.5,
             "energy_gap": 1.5,
-            "num_eigenvalues": 5
+            "num_eigenvalues": 5,
+            "solver": {"strategy": "dense", "estimated_memory_mb": 0.1, "peak_rss_mb": 412.3,
+                       "extended_from": 0, "cached": false}
           }
     '''
     try:
@@ -212,6 +244,9 @@ def compute_energy_spectrum(system_id: str, num_eigenvalues: int = 10, which: st
         if which not in ["SA", "LA", "SM", "LM"]:
             raise ValueError(f"Invalid 'which' parameter: {which}. Must be 'SA', 'LA', 'SM', or 'LM'")
         
+        if solver not in SOLVER_STRATEGIES:
+            raise ValueError(f"Invalid solver: {solver}. Must be one of {SOLVER_STRATEGIES}")
+        
         # Check if all required components are present
         if not system.lattice or not system.hilbert or not system.hamiltonian:
             missing = []
@@ -221,6 +256,15 @@ def compute_energy_spectrum(system_id: str, num_eigenvalues: int = 10, which: st
             raise ValueError(f"System missing required components: {', '.join(missing)}. "
                            "Use set_lattice(), set_hilbert_space(), and set_hamiltonian() first.")
         
+        if sectors is not None:
+            return _compute_sector_spectrum(system_id, system, num_eigenvalues, which, sectors)
+        
+        # Serve the stored spectrum if it already holds the eigenvalues asked for
+        cached = _cached_spectrum(system, num_eigenvalues, which)
+        if cached is not None:
+            eigvals, _, report = cached
+            return _spectrum_summary(system_id, system, eigvals, report)
+        
         # Build Hamiltonian from specification
         try:
             H, hi, graph = _build_hamiltonian_from_spec(system)
@@ -229,46 +273,27 @@ def compute_energy_spectrum(system_id: str, num_eigenvalues: int = 10, which: st
                            "Check lattice, Hilbert space, and Hamiltonian compatibility.")
         
         # Check system size constraints
+        if not hi.is_indexable:
+            raise ValueError("System too large: its states cannot even be enumerated. "
+                           "Consider reducing system size or using variational_ground_state().")
         if hi.n_states > 1e6:
             raise ValueError(f"System too large: {hi.n_states} states. "
-                           "Consider reducing system size or using approximate methods.")
-        
-
+                           "Consider reducing system size or using variational_ground_state().")
         
-        # Function for exact diagonalization with error handling
-        def ED(H, k=num_eigenvalues, which=which):
-            try:
-                if hi.n_states > 1e3:  # sparse matrix approach
-                    try:
-                        sp_h = H.to_sparse()
-                        eig_vals, eig_vecs = eigsh(sp_h, k=k, which=which)
-                        sort_idx = np.argsort(eig_vals)
-                        eig_vals_sorted = eig_vals[sort_idx]
-                        eig_vecs_sorted = eig_vecs[:, sort_idx]
-                    except Exception as e:
-                        raise RuntimeError(f"Sparse eigenvalue computation failed: {str(e)}. "
-                                         "Try reducing system size or num_eigenvalues.")
-                else:  # dense matrix approach
-                    try:
-                        dense_h = H.to_dense()
-                        eig_vals_sorted, eig_vecs_sorted = np.linalg.eigh(dense_h)
-                        if k < len(eig_vals_sorted):
-                            eig_vals_sorted = eig_vals_sorted[:k]
-                            eig_vecs_sorted = eig_vecs_sorted[:, :k]
-                    except np.linalg.LinAlgError as e:
-                        raise RuntimeError(f"Dense eigenvalue computation failed: {str(e)}. "
-                                         "The Hamiltonian matrix may be ill-conditioned.")
-                    except MemoryError:
-                        raise RuntimeError("Not enough memory for dense matrix diagonalization. "
-                                         "Try reducing system size.")
-                
-                return eig_vals_sorted, eig_vecs_sorted
-                
-            except Exception as e:
-                raise RuntimeError(f"Eigenvalue computation failed: {str(e)}")
-        
-        # Perform eigenvalue computation
-        eigvals, eigvecs = ED(H)
+        # Exact diagonalization with error handling, extending the stored eigenpairs if there are any
+        try:
+            solution = _solve_spectrum(system, H, hi, graph, num_eigenvalues, which, solver, memory_limit_mb,
+                                       known=_stored_eigenpairs(system, which))
+        except np.linalg.LinAlgError as e:
+            raise RuntimeError(f"Eigenvalue computation failed: Dense eigenvalue computation failed: {str(e)}. "
+                               "The Hamiltonian matrix may be ill-conditioned.")
+        except MemoryError:
+            raise RuntimeError("Eigenvalue computation failed: Not enough memory for the "
+                               f"{solver} solver. Try solver=\"matrix_free\" or reducing system size.")
+        except Exception as e:
+            raise RuntimeError(f"Eigenvalue computation failed: {str(e)}. "
+                               "Try reducing system size or num_eigenvalues.")
+        eigvals, eigvecs = solution.eigenvalues, solution.eigenvectors
         
         # Validate results
         if len(eigvals) == 0:
@@ -276,27 +301,12 @@ def compute_energy_spectrum(system_id: str, num_eigenvalues: int = 10, which: st
         
         # Store results with error handling
         try:
-            system.results["energy_spectrum"] = {
-                "eigenvalues": eigvals.tolist(),
-                "eigenvectors": eigvecs.tolist(),
-                "ground_state_energy": float(eigvals[0]),
-                "energy_gap": float(eigvals[1] - eigvals[0]) if len(eigvals) > 1 else 0.0
-            }
-            system.results["model_type"] = system.hamiltonian.model_type
-            system.results["parameters"] = system.hamiltonian.get_parameters()
-            json_manager.save_system(system_id)
+            _store_spectrum(system, which, solution)
+            json_manager.save_system(system_id, system)
         except Exception as e:
             print(f"Warning: Failed to save results: {str(e)}")
         
-        return {
-            "system_id": system_id,
-            "eigenvalues": eigvals.tolist(),
-            "ground_state_energy": float(eigvals[0]),
-            "energy_gap": float(eigvals[1] - eigvals[0]) if len(eigvals) > 1 else 0.0,
-            "num_eigenvalues": len(eigvals),
-            "model_type": system.hamiltonian.model_type.upper(),
-            "parameters": system.hamiltonian.get_parameters()
-        }
+        return _spectrum_summary(system_id, system, eigvals, {**solution.report(), "cached": False})
         
     except ValueError as e:
         # User input errors - clear error message
@@ -309,6 +319,176 @@ def compute_energy_spectrum(system_id: str, num_eigenvalues: int = 10, which: st
         raise RuntimeError(f"Unexpected error in compute_energy_spectrum: {str(e)}. "
                          f"System: {system_id}, Parameters: num_eigenvalues={num_eigenvalues}, which={which}")
 
+def _spectrum_summary(system_id: str, system, eigvals: np.ndarray, report: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "system_id": system_id,
+        "eigenvalues": eigvals.tolist(),
+        "ground_state_energy": float(eigvals[0]),
+        "energy_gap": float(eigvals[1] - eigvals[0]) if len(eigvals) > 1 else 0.0,
+        "num_eigenvalues": len(eigvals),
+        "model_type": system.hamiltonian.model_type.upper(),
+        "parameters": system.hamiltonian.get_parameters(),
+        "solver": report
+    }
+
+def _compute_sector_spectrum(system_id: str, system, num_eigenvalues: int, which: str,
+                             sectors: Dict[str, Union[str, float, List[float]]]) -> Dict[str, Any]:
+    """Block-diagonal version of compute_energy_spectrum, one eigensolve per symmetry sector."""
+    sector_list = parse_sectors(sectors, system.lattice, system.hilbert, system.hamiltonian)
+    
+    sector_results = []
+    try:
+        for sector, block in sector_matrices(system.lattice, system.hilbert, system.hamiltonian,
+                                             sector_list, max_states=1e6):
+            if block.shape[0] == 0:
+                continue
+            k = min(num_eigenvalues, block.shape[0] if block.shape[0] <= DENSE_LIMIT else block.shape[0] - 1)
+            eigvals, _, _ = diagonalize(block, k, which=which)
+            sector_results.append({**sector, "dimension": int(block.shape[0]), "eigenvalues": eigvals.tolist()})
+    except ValueError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Sector eigenvalue computation failed: {str(e)}")
+    
+    if not sector_results:
+        raise RuntimeError("No states in the requested sectors. Check the sector values.")
+    
+    # Levels `which` asks for over all sectors, each with its own degeneracy
+    eigvals = np.concatenate([result["eigenvalues"] for result in sector_results])
+    eigvals = eigvals[select_eigenpairs(eigvals, num_eigenvalues, which)]
+    spectrum = {
+        "eigenvalues": eigvals.tolist(),
+        "ground_state_energy": float(eigvals[0]),
+        "energy_gap": float(eigvals[1] - eigvals[0]) if len(eigvals) > 1 else 0.0,
+        "sectors": sector_results
+    }
+    try:
+        system.results["sector_spectrum"] = spectrum
+        system.results["model_type"] = system.hamiltonian.model_type
+        system.results["parameters"] = system.hamiltonian.get_parameters()
+        json_manager.save_system(system_id, system)
+    except Exception as e:
+        print(f"Warning: Failed to save results: {str(e)}")
+    
+    return {
+        "system_id": system_id,
+        **spectrum,
+        "num_eigenvalues": len(eigvals),
+        "model_type": system.hamiltonian.model_type.upper(),
+        "parameters": system.hamiltonian.get_parameters()
+    }
+
+@mcp.tool()
+async def variational_ground_state(system_id: str, model: str = "rbm", alpha: int = 1, sampler: str = "auto",
+                                   n_samples: int = 1008, n_iter: int = 300, learning_rate: float = 0.05,
+                                   diag_shift: float = 0.1, n_chains: int = 16, seed: int = 0,
+                                   resume: bool = True, checkpoint_every: int = 50,
+                                   ctx: Optional[Context] = None) -> Dict[str, Any]:
+    '''Find the ground state energy with variational Monte Carlo (VMC).
+    
+    Unlike compute_energy_spectrum, VMC never builds the Hamiltonian matrix or enumerates the Hilbert space,
+    so it handles lattices far beyond exact diagonalization, at the price of a variational, statistical estimate.
+    The energy and its variance are reported as progress after every iteration. Parameters are checkpointed in
+    the system directory, so a later call with the same system and model continues where the last one stopped.
+    
+    Args:
+        system_id: The ID of the quantum system
+        model: Variational wave function, "rbm" (restricted Boltzmann machine) or "jastrow" (default: "rbm")
+        alpha: Hidden unit density of the RBM (default: 1)
+        sampler: "local" (single spin flips), "exchange" (swaps of neighbouring sites), "hamiltonian"
+            (moves along the Hamiltonian's off-diagonal terms), "fermion_hop", "exact" (small systems only)
+            or "auto" (default): fermion_hop for fermions, local for spins
+        n_samples: Monte Carlo samples per iteration (default: 1008)
+        n_iter: Total number of optimization iterations, including resumed ones (default: 300)
+        learning_rate: Step size of the stochastic reconfiguration updates (default: 0.05)
+        diag_shift: Diagonal shift regularizing stochastic reconfiguration (default: 0.1)
+        n_chains: Number of Markov chains (default: 16)
+        seed: Seed of the parameter initialization and of the sampler (default: 0)
+        resume: Continue from the checkpoint of the same system and model, if any (default: True)
+        checkpoint_every: Iterations between checkpoints (default: 50)
+        
+    Returns:
+        Dictionary with the variational energy, its statistical error and variance. The full convergence
+        curves are stored in the system results under "vmc_ground_state".
+        
+    Examples:
+        - Input: {"system_id": "system_a1b2c3d4", "model": "rbm", "n_iter": 300}
+        - Output: {
+            "system_id": "system_a1b2c3d4",
+            "energy": -10.2437,
+            "energy_error": 0.0071,
+            "variance": 0.031,
+            "iterations": 300,
+            "resumed_from": 0,
+            ...
+          }
+    '''
+    if system_id not in json_manager.systems:
+        raise ValueError(f"System '{system_id}' not found. Use create_quantum_system() first.")
+    system = json_manager.systems[system_id]
+    if not system.lattice or not system.hilbert or not system.hamiltonian:
+        raise ValueError("System must have lattice, Hilbert space, and Hamiltonian defined. "
+                        "Use set_lattice(), set_hilbert_space(), and set_hamiltonian() first.")
+    if checkpoint_every <= 0:
+        raise ValueError(f"checkpoint_every must be positive, got {checkpoint_every}")
+    settings = VMCSettings(model=model, alpha=alpha, sampler=sampler, n_samples=n_samples, n_chains=n_chains,
+                           n_iter=n_iter, learning_rate=learning_rate, diag_shift=diag_shift, seed=seed)
+    
+    H, hi, graph = _build_hamiltonian_from_spec(system)
+    spec = spec_key(system.lattice, system.hilbert, system.hamiltonian)
+    checkpoint_path = json_manager.storage_dir / system_id / VMC_CHECKPOINT
+    
+    def progress(iteration, total, energy, error, variance):
+        if ctx is None:
+            return
+        # Called from the worker thread; report through the event loop
+        anyio.from_thread.run(ctx.report_progress, iteration, total)
+        anyio.from_thread.run(ctx.info, f"VMC iteration {iteration}/{total}: "
+                                        f"E = {energy:.6f} ± {error:.6f}, variance = {variance:.6f}")
+    
+    def run():
+        return run_vmc(H, hi, graph, settings, spec, checkpoint_path=checkpoint_path,
+                       checkpoint_every=checkpoint_every, resume=resume, progress=progress)
+    
+    try:
+        result = await anyio.to_thread.run_sync(run)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Variational Monte Carlo failed: {str(e)}. "
+                           "Try a smaller learning_rate, a larger diag_shift or more samples.")
+    
+    summary = {
+        "energy": result.energy,
+        "energy_error": result.energy_error,
+        "variance": result.variance,
+        "iterations": result.iterations,
+        "resumed_from": result.resumed_from,
+        "n_parameters": result.n_parameters,
+        "acceptance": result.acceptance,
+        "model": model,
+        "alpha": alpha,
+        "sampler": sampler,
+        "n_samples": n_samples,
+        "learning_rate": learning_rate,
+    }
+    # Other calls may have evicted the system during the run: store into and save the object held since the start,
+    # never one looked up again by id
+    try:
+        system.results["vmc_ground_state"] = {**summary, "curves": result.curves.to_arrays()}
+        system.results["model_type"] = system.hamiltonian.model_type
+        system.results["parameters"] = system.hamiltonian.get_parameters()
+        json_manager.save_system(system_id, system)
+    except Exception as e:
+        print(f"Warning: Failed to save results: {str(e)}")
+    
+    return {
+        "system_id": system_id,
+        **summary,
+        "model_type": system.hamiltonian.model_type.upper(),
+        "parameters": system.hamiltonian.get_parameters()
+    }
+
 @mcp.tool()
 def analyze_ground_state(system_id: str) -> Dict[str, Any]:
     '''Analyze the ground state properties of a quantum system.
@@ -325,7 +505,9 @@ def analyze_ground_state(system_id: str) -> Dict[str, Any]:
 
 @mcp.tool()
 def parameter_sweep(system_id: str, parameter_name: str, 
-                   parameter_range: Optional[List[float]] = None) -> Dict[str, Any]:
+                   parameter_range: Optional[List[float]] = None,
+                   workers: int = 1, warm_start: bool = False, resume: bool = True,
+                   refine_points: int = 0) -> Dict[str, Any]:
     '''Perform a parameter sweep for a quantum model.
     
     This tool varies one parameter while keeping others fixed, computing
@@ -336,6 +518,13 @@ def parameter_sweep(system_id: str, parameter_name: str,
         system_id: The ID of the quantum system
         parameter_name: Name of parameter to sweep (e.g., "t2", "U", "J")
         parameter_range: List of parameter values to try (optional, uses Hamiltonian specification if not provided)
+        workers: Number of processes to diagonalize the points in parallel (default: 1)
+        warm_start: Start each sparse eigensolve from the previous point's eigenvectors (default: False).
+            Saves iterations when parameter_range is ordered.
+        resume: Reuse the points an interrupted sweep of the same system already computed (default: True).
+            Points are checkpointed in the system directory as they are computed.
+        refine_points: Number of points to add after the sweep, each in the middle of the interval where
+            the energy gap changes most (default: 0). The results are then sorted by parameter value.
         
     Returns:
         Dictionary containing sweep results
@@ -388,6 +577,12 @@ def parameter_sweep(system_id: str, parameter_name: str,
         if len(parameter_range) < 2:
             raise ValueError("parameter_range must contain at least 2 values")
         
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        
+        if refine_points < 0:
+            raise ValueError(f"refine_points must be non-negative, got {refine_points}")
+        
         # Check if parameter exists in Hamiltonian
         base_params = system.hamiltonian.get_parameters()
         if parameter_name not in base_params:
@@ -410,21 +605,6 @@ def parameter_sweep(system_id: str, parameter_name: str,
             raise ValueError(f"System too large for parameter sweep: {hi.n_states} states. "
                            "Consider reducing system size.")
         
-        # Function for exact diagonalization with error handling
-        def ED(H, k=5, which="SA"):
-            try:
-                if hi.n_states > 1e3:  # sparse matrix
-                    sp_h = H.to_sparse()
-                    eig_vals, eig_vecs = eigsh(sp_h, k=k, which=which)
-                    sort_idx = np.argsort(eig_vals)
-                    eig_vals_sorted = eig_vals[sort_idx]
-                    eig_vecs_sorted = eig_vecs[:, sort_idx]
-                else:
-                    eig_vals_sorted, eig_vecs_sorted = np.linalg.eigh(H.to_dense())
-                return eig_vals_sorted, eig_vecs_sorted
-            except Exception as e:
-                raise RuntimeError(f"Eigenvalue computation failed: {str(e)}")
-        
         ground_state_energies = []
         energy_gaps = []
         spectra_data = {}
@@ -434,54 +614,58 @@ def parameter_sweep(system_id: str, parameter_name: str,
         base_params = system.hamiltonian.get_parameters()
         model_type = system.hamiltonian.model_type
         
-        # Main computation loop with error handling
-        for i, param_value in enumerate(parameter_range):
+        # Build the parameter-independent terms once; each point is then a linear combination of them
+        try:
+            affine_h = AffineHamiltonian.from_schema(system.hamiltonian, hi, graph, system.hilbert)
+        except Exception as e:
+            raise ValueError(f"Failed to build Hamiltonian: {str(e)}. Check Hamiltonian compatibility with lattice and Hilbert space.")
+        
+        # Diagonalize all points, in parallel and/or warm-started if requested. Points are checkpointed as they
+        # are computed, and those of an interrupted sweep are reused.
+        k = hi.n_states if hi.n_states <= 100 else 10
+        system_dir = json_manager.storage_dir / system_id
+        system_dir.mkdir(exist_ok=True)
+        checkpoint = SweepCheckpoint(system_dir / SWEEP_CHECKPOINT,
+                                     sweep_key(system.lattice, system.hilbert, model_type, k))
+        if not resume:
+            checkpoint.remove()
+        executor = SweepExecutor(affine_h, k=k, workers=workers, warm_start=warm_start)
+        resumed_points = 0
+        
+        def solve(values: List[float]) -> List[Any]:
+            nonlocal resumed_points
+            points = [{**base_params, parameter_name: value} for value in values]
+            pending = [parameters for parameters in points if checkpoint.get(parameters) is None]
+            resumed_points += len(points) - len(pending)
             try:
-                # Create a temporary Hamiltonian with the new parameter value
-                temp_params = base_params.copy()
-                temp_params[parameter_name] = param_value
-                
-                # Create a temporary HamiltonianSchema
-                temp_hamiltonian = HamiltonianSchema(
-                    model_type=model_type,
-                    parameters=temp_params
-                )
-                
-                # Build Hamiltonian using the schema's method
-                H = temp_hamiltonian.build_netket_hamiltonian(hi, graph, system_hilbert=system.hilbert)
-                
-                # Compute spectrum
-                eigvals, eigvecs = ED(H, k=hi.n_states if hi.n_states <= 100 else 10)
-                
-                if len(eigvals) == 0:
-                    raise RuntimeError(f"No eigenvalues computed for {parameter_name}={param_value}")
-                
-                ground_state_energies.append(float(eigvals[0]))
-                
-                # Calculate the physical excitation gap, accounting for degeneracy
-                if len(eigvals) > 1:
-                    E0 = eigvals[0]
-                    # Find the first eigenvalue that is not degenerate with the ground state
-                    first_excited_val = E0
-                    for e_val in eigvals[1:]:
-                        if not np.isclose(e_val, E0, atol=1e-6): # Use tolerance for numerical degeneracy
-                            first_excited_val = e_val
-                            break
-                    
-                    # If all computed eigenvalues are degenerate, the gap is 0
-                    if np.isclose(first_excited_val, E0, atol=1e-6):
-                        gap = 0.0
-                    else:
-                        gap = first_excited_val - E0
-                    energy_gaps.append(float(gap))
-                else:
-                    energy_gaps.append(0.0)
-
-                spectra_data[f"{parameter_name}_{param_value}"] = eigvals.tolist()
-                all_eigenvalues.append(eigvals.tolist())
-                
+                executor.run(pending, on_point=checkpoint.add)
             except Exception as e:
-                raise RuntimeError(f"Error computing spectrum for {parameter_name}={param_value}: {str(e)}")
+                raise RuntimeError(f"Error computing spectra for {parameter_name}: {str(e)}. "
+                                   f"{len(checkpoint)} computed points are kept for the next call.")
+            return [checkpoint.get(parameters) for parameters in points]
+        
+        sweep_points = solve(parameter_range)
+        
+        # Add points where the gap changes fastest, as many at a time as there are workers
+        refined_values = []
+        while len(refined_values) < refine_points:
+            values = list(parameter_range) + refined_values
+            gaps = [point.energy_gap for point in sweep_points]
+            new_values = refinement_points(values, gaps, min(workers, refine_points - len(refined_values)))
+            if not new_values:
+                break
+            sweep_points += solve(new_values)
+            refined_values += new_values
+        if refined_values:
+            order = np.argsort(list(parameter_range) + refined_values, kind="stable")
+            parameter_range = [float((list(parameter_range) + refined_values)[i]) for i in order]
+            sweep_points = [sweep_points[i] for i in order]
+        
+        for param_value, point in zip(parameter_range, sweep_points):
+            ground_state_energies.append(point.ground_state_energy)
+            energy_gaps.append(point.energy_gap)
+            spectra_data[f"{parameter_name}_{param_value}"] = point.eigenvalues.tolist()
+            all_eigenvalues.append(point.eigenvalues.tolist())
         
         # Validate results
         if not ground_state_energies:
@@ -500,7 +684,8 @@ def parameter_sweep(system_id: str, parameter_name: str,
                 "base_parameters": base_params
             }
             # Do NOT store any NetKet objects in results
-            json_manager.save_system(system_id)
+            json_manager.save_system(system_id, system)
+            checkpoint.remove()
         except Exception as e:
             print(f"Warning: Failed to save parameter sweep results: {str(e)}")
         
@@ -512,7 +697,14 @@ def parameter_sweep(system_id: str, parameter_name: str,
             "energy_gaps": energy_gaps,
             "all_eigenvalues": all_eigenvalues,
             "model_type": model_type.upper(),
-            "base_parameters": base_params
+            "base_parameters": base_params,
+            "solver": {
+                "workers": workers,
+                "warm_start": warm_start,
+                "matvecs": sum(point.matvecs for point in sweep_points),
+                "resumed_points": resumed_points,
+                "refined_points": refined_values
+            }
         }
         
     except ValueError as e:
@@ -523,10 +715,188 @@ def parameter_sweep(system_id: str, parameter_name: str,
         raise RuntimeError(f"Unexpected error in parameter_sweep: {str(e)}. "
                          f"System: {system_id}, Parameter: {parameter_name}")
 
+@mcp.tool()
+def parameter_grid_sweep(system_id: str, parameter_ranges: Optional[Dict[str, List[float]]] = None,
+                         workers: int = 1, warm_start: bool = False, resume: bool = True,
+                         chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    '''Perform a sweep over a grid of several parameters of a quantum model.
+    
+    This tool computes the energy spectrum at every combination of the given parameter values, keeping
+    the other parameters fixed, e.g. to map a phase diagram in (t, U) or (hx, hz). The Hamiltonian is
+    built once for the whole grid. Energies and gaps are stored as arrays over the grid and can be shown
+    as heatmaps with generate_plot(plot_type="grid_sweep").
+    
+    Args:
+        system_id: The ID of the quantum system
+        parameter_ranges: Values of each swept parameter (optional, uses the parameter ranges of the
+            Hamiltonian specification if not provided). At least 2 parameters with at least 2 values each.
+        workers: Number of processes to diagonalize the points in parallel (default: 1)
+        warm_start: Start each sparse eigensolve from the previous point's eigenvectors (default: False)
+        resume: Reuse the points an interrupted sweep of the same system already computed (default: True)
+        chunk_size: Number of consecutive grid points per task of a worker (default: one row of the
+            grid, i.e. the number of values of the last parameter)
+        
+    Returns:
+        Dictionary containing the grid and its ground state energies and gaps, indexed by the values of
+        the parameters in the order of parameter_names
+        
+    Examples:
+        - Input: {
+            "system_id": "system_a1b2c3d4",
+            "parameter_ranges": {"t": [0.5, 1.0], "U": [0.0, 4.0, 8.0]}
+          }
+        - Output: {
+            "system_id": "system_a1b2c3d4",
+            "parameter_names": ["t", "U"],
+            "shape": [2, 3],
+            "ground_state_energies": [[-2.5, -1.6, -1.1], [-5.0, -3.6, -2.9]],
+            "energy_gaps": [[0.4, 0.9, 1.8], [0.8, 1.1, 1.6]],
+            "min_gap": {"energy_gap": 0.4, "parameters": {"t": 0.5, "U": 0.0}}
+          }
+    '''
+    try:
+        # Validate system_id
+        if system_id not in json_manager.systems:
+            raise ValueError(f"System '{system_id}' not found. Use create_quantum_system() first.")
+        
+        system = json_manager.systems[system_id]
+        
+        # Check if all required components are present
+        if not system.lattice or not system.hilbert or not system.hamiltonian:
+            missing = []
+            if not system.lattice: missing.append("lattice")
+            if not system.hilbert: missing.append("Hilbert space")
+            if not system.hamiltonian: missing.append("Hamiltonian")
+            raise ValueError(f"System missing required components: {', '.join(missing)}. "
+                           "Use set_lattice(), set_hilbert_space(), and set_hamiltonian() first.")
+        
+        # Get parameter ranges from Hamiltonian specification if not provided
+        if parameter_ranges is None:
+            parameter_ranges = system.hamiltonian.parameter_ranges
+            if not parameter_ranges:
+                raise ValueError("No parameter_ranges provided and none found in Hamiltonian specification. "
+                               "Either provide parameter_ranges or set them in set_hamiltonian().")
+        
+        if not isinstance(parameter_ranges, dict) or len(parameter_ranges) < 2:
+            raise ValueError("parameter_ranges must map at least 2 parameters to their values. "
+                           "Use parameter_sweep() for a single parameter.")
+        
+        base_params = system.hamiltonian.get_parameters()
+        for name, values in parameter_ranges.items():
+            if name not in base_params:
+                raise ValueError(f"Parameter '{name}' not found in Hamiltonian. "
+                               f"Available parameters: {list(base_params.keys())}")
+            if not isinstance(values, list) or len(values) < 2:
+                raise ValueError(f"Range of '{name}' must be a list of at least 2 values")
+        
+        shape = tuple(len(values) for values in parameter_ranges.values())
+        n_points = int(np.prod(shape))
+        if n_points > MAX_GRID_POINTS:
+            raise ValueError(f"Grid of shape {list(shape)} has {n_points} points, more than {MAX_GRID_POINTS}. "
+                           "Use fewer values per parameter.")
+        
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+    
+    except ValueError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Error validating grid sweep inputs: {str(e)}")
+    
+    try:
+        # Create NetKet objects
+        graph = system.lattice.to_netket_graph()
+        hi = system.hilbert.to_netket_hilbert(graph)
+        
+        # Check system size constraints
+        if hi.n_states > 1e5:
+            raise ValueError(f"System too large for parameter sweep: {hi.n_states} states. "
+                           "Consider reducing system size.")
+        
+        model_type = system.hamiltonian.model_type
+        parameter_names = list(parameter_ranges)
+        
+        # Build the parameter-independent terms once; each point is then a linear combination of them
+        try:
+            affine_h = AffineHamiltonian.from_schema(system.hamiltonian, hi, graph, system.hilbert)
+        except Exception as e:
+            raise ValueError(f"Failed to build Hamiltonian: {str(e)}. Check Hamiltonian compatibility with lattice and Hilbert space.")
+        
+        # Points are checkpointed like those of parameter_sweep, with the same key, so both reuse each other's
+        # points. Workers take up the pending points a chunk at a time, a row of the grid by default, along
+        # which warm starts follow the last parameter.
+        k = hi.n_states if hi.n_states <= 100 else 10
+        system_dir = json_manager.storage_dir / system_id
+        system_dir.mkdir(exist_ok=True)
+        checkpoint = SweepCheckpoint(system_dir / SWEEP_CHECKPOINT,
+                                     sweep_key(system.lattice, system.hilbert, model_type, k))
+        if not resume:
+            checkpoint.remove()
+        executor = SweepExecutor(affine_h, k=k, workers=workers, warm_start=warm_start,
+                                 chunk_size=chunk_size or shape[-1])
+        points = grid_points(base_params, parameter_ranges)
+        pending = [parameters for parameters in points if checkpoint.get(parameters) is None]
+        try:
+            executor.run(pending, on_point=checkpoint.add)
+        except Exception as e:
+            raise RuntimeError(f"Error computing spectra on the grid: {str(e)}. "
+                               f"{len(checkpoint)} computed points are kept for the next call.")
+        sweep_points = [checkpoint.get(parameters) for parameters in points]
+        arrays = grid_arrays(sweep_points, shape)
+        
+        min_index = np.unravel_index(np.argmin(arrays["energy_gaps"]), shape)
+        min_gap = {
+            "energy_gap": float(arrays["energy_gaps"][min_index]),
+            "parameters": {name: float(parameter_ranges[name][i]) for name, i in zip(parameter_names, min_index)},
+        }
+        
+        # Store results with error handling; the arrays are saved as .npy files next to the system
+        try:
+            system.results["grid_sweep"] = {
+                "parameter_names": parameter_names,
+                "parameter_values": {name: [float(v) for v in values] for name, values in parameter_ranges.items()},
+                **arrays,
+                "model_type": model_type,
+                "base_parameters": base_params
+            }
+            json_manager.save_system(system_id, system)
+            checkpoint.remove()
+        except Exception as e:
+            print(f"Warning: Failed to save grid sweep results: {str(e)}")
+        
+        return {
+            "system_id": system_id,
+            "parameter_names": parameter_names,
+            "parameter_values": {name: [float(v) for v in values] for name, values in parameter_ranges.items()},
+            "shape": list(shape),
+            "ground_state_energies": arrays["ground_state_energies"].tolist(),
+            "energy_gaps": arrays["energy_gaps"].tolist(),
+            "min_gap": min_gap,
+            "model_type": model_type.upper(),
+            "base_parameters": base_params,
+            "solver": {
+                "workers": workers,
+                "warm_start": warm_start,
+                "chunk_size": executor.chunk_size,
+                "matvecs": sum(point.matvecs for point in sweep_points),
+                "resumed_points": len(points) - len(pending)
+            }
+        }
+        
+    except ValueError as e:
+        raise ValueError(str(e))
+    except RuntimeError as e:
+        raise RuntimeError(str(e))
+    except Exception as e:
+        raise RuntimeError(f"Unexpected error in parameter_grid_sweep: {str(e)}. System: {system_id}")
+
 @mcp.tool()
 def plot_xy(system_id: str, x_data: List[float], y_data: List[float], 
             x_label: str, y_label: str, title: str, 
-            file_name: str) -> Dict[str, Any]:
+            file_name: str, dpi: float = DEFAULT_DPI) -> Dict[str, Any]:
     '''Generate a generic 2D plot and save it to a file.
     
     This tool creates a 2D plot from given x and y data and saves it
@@ -539,7 +909,8 @@ def plot_xy(system_id: str, x_data: List[float], y_data: List[float],
         x_label: Label for the x-axis.
         y_label: Label for the y-axis.
         title: Title of the plot.
-        file_name: Name of the file to save the plot (e.g., 'custom_plot.png').
+        file_name: Name of the file to save the plot (e.g., 'custom_plot.png' or 'custom_plot.webp').
+        dpi: Resolution of the image (default: 150)
         
     Returns:
         Dictionary confirming the plot has been saved.
@@ -547,18 +918,11 @@ def plot_xy(system_id: str, x_data: List[float], y_data: List[float],
     system = json_manager.systems[system_id]
     system_dir = json_manager.storage_dir / system.system_id
     system_dir.mkdir(exist_ok=True)
-    full_path = system_dir / file_name
+    full_path = system_dir / _plot_file_name(file_name)
     
-    plt.figure(figsize=(8, 6))
-    plt.plot(x_data, y_data, 'o-', markersize=6)
-    plt.xlabel(x_label, fontsize=12)
-    plt.ylabel(y_label, fontsize=12)
-    plt.title(title, fontsize=14)
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    
-    plt.savefig(full_path, dpi=150, bbox_inches='tight')
-    plt.close()
+    image = plot_renderer.render("xy", [Panel(x_data, y_data, x_label, y_label, title)],
+                                 fmt=full_path.suffix[1:], dpi=dpi)
+    full_path.write_bytes(image)
         
     return {
         "system_id": system_id,
@@ -567,16 +931,77 @@ def plot_xy(system_id: str, x_data: List[float], y_data: List[float],
         "description": "XY plot saved to file"
     }
 
+def _plot_file_name(file_name: str) -> str:
+    """File name with a supported image extension, PNG by default."""
+    if not file_name.lower().endswith(tuple(f".{fmt}" for fmt in FILE_FORMATS)):
+        file_name += '.png'
+    return file_name
+
+def _plot_panels(system, plot_type: str) -> List[Union[Panel, Heatmap]]:
+    """Data and labels of a plot of the stored results of a system."""
+    model = system.results.get('model_type', 'Unknown')
+    if plot_type == "spectrum":
+        if "energy_spectrum" not in system.results:
+            raise ValueError("No energy spectrum data available. Run compute_energy_spectrum() first.")
+        eigvals = system.results["energy_spectrum"]["eigenvalues"]
+        if not eigvals:
+            raise ValueError("Empty eigenvalue data")
+        return [Panel(range(len(eigvals)), eigvals, "Eigenvalue index", "Energy", f"Energy Spectrum: {model} Model")]
+    
+    if plot_type == "ground_state":
+        gs_analysis = system.results.get("ground_state_analysis") or system.results.get("eigenstate_0_analysis")
+        if gs_analysis is None:
+            raise ValueError("No ground state data available. Run analyze_ground_state() first.")
+        spatial_profile = gs_analysis["spatial_profile"]
+        if not spatial_profile:
+            raise ValueError("Empty spatial profile data")
+        return [Panel(range(len(spatial_profile)), spatial_profile, "Site index", "|ψ(i)|²",
+                      f"Ground State Profile: {model} Model")]
+    
+    if plot_type == "grid_sweep":
+        if "grid_sweep" not in system.results:
+            raise ValueError("No grid sweep data available. Run parameter_grid_sweep() first.")
+        grid = system.results["grid_sweep"]
+        names = grid["parameter_names"]
+        if len(names) != 2:
+            raise ValueError(f"Heatmaps need a grid of 2 parameters, the grid sweep has {len(names)}: {names}")
+        x, y = (grid["parameter_values"][name] for name in names)
+        return [
+            Heatmap(x, y, grid["ground_state_energies"], names[0], names[1], "Ground State Energy"),
+            Heatmap(x, y, grid["energy_gaps"], names[0], names[1], "Energy Gap"),
+        ]
+    
+    if "parameter_sweep" not in system.results:
+        raise ValueError("No parameter sweep data available. Run parameter_sweep() first.")
+    sweep = system.results["parameter_sweep"]
+    param_range = sweep["parameter_range"]
+    gs_energies = sweep["ground_state_energies"]
+    energy_gaps = sweep["energy_gaps"]
+    if not param_range or not gs_energies or not energy_gaps:
+        raise ValueError("Incomplete parameter sweep data")
+    if len(param_range) != len(gs_energies) or len(param_range) != len(energy_gaps):
+        raise ValueError("Inconsistent parameter sweep data lengths")
+    return [
+        Panel(param_range, gs_energies, sweep["parameter_name"], "Ground State Energy", "Ground State Energy"),
+        Panel(param_range, energy_gaps, sweep["parameter_name"], "Energy Gap", "Energy Gap"),
+    ]
+
 @mcp.tool()
-def generate_plot(system_id: str, plot_type: str, file_path: Optional[str] = None) -> Dict[str, Any]:
+def generate_plot(system_id: str, plot_type: str, file_path: Optional[str] = None,
+                  image_format: str = "png", dpi: float = DEFAULT_DPI) -> Dict[str, Any]:
     '''Generate plots for quantum system analysis.
     
     This tool creates various types of plots based on the system's analysis results.
     
     Args:
         system_id: The ID of the quantum system
-        plot_type: Type of plot ("spectrum", "ground_state", "parameter_sweep")
-        file_path: Optional path to save the plot image file (e.g., "ssh_transition.png")
+        plot_type: Type of plot ("spectrum", "ground_state", "parameter_sweep", or "grid_sweep" for
+            heatmaps of a parameter_grid_sweep over 2 parameters)
+        file_path: Optional path to save the plot image file (e.g., "ssh_transition.png"); the format
+            follows the extension (png, webp, jpg, pdf or svg)
+        image_format: Format of the image returned when no file_path is given: "png" (default) or
+            "webp" (lossless, smaller)
+        dpi: Resolution of the image (default: 150)
         
     Returns:
         Dictionary containing plot data
@@ -598,111 +1023,23 @@ def generate_plot(system_id: str, plot_type: str, file_path: Optional[str] = Non
         system = json_manager.systems[system_id]
         
         # Validate plot_type
-        valid_plot_types = ["spectrum", "ground_state", "parameter_sweep"]
+        valid_plot_types = ["spectrum", "ground_state", "parameter_sweep", "grid_sweep"]
         if plot_type not in valid_plot_types:
             raise ValueError(f"Invalid plot_type '{plot_type}'. Must be one of: {valid_plot_types}")
         
-        # Clear any existing plots to avoid conflicts
-        plt.close('all')
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Invalid image_format '{image_format}'. Must be one of: {list(IMAGE_FORMATS)}")
         
-        # Generate plots based on type with error handling
-        if plot_type == "spectrum":
-            if "energy_spectrum" not in system.results:
-                raise ValueError("No energy spectrum data available. Run compute_energy_spectrum() first.")
-            
-            try:
-                spectrum = system.results["energy_spectrum"]
-                eigvals = spectrum["eigenvalues"]
-                
-                if not eigvals:
-                    raise ValueError("Empty eigenvalue data")
-                
-                plt.figure(figsize=(8, 6))
-                plt.plot(range(len(eigvals)), eigvals, 'o-', markersize=6)
-                plt.xlabel("Eigenvalue index", fontsize=12)
-                plt.ylabel("Energy", fontsize=12)
-                plt.title(f"Energy Spectrum: {system.results.get('model_type', 'Unknown')} Model", fontsize=14)
-                plt.grid(True, alpha=0.3)
-                plt.tight_layout()
-            except Exception as e:
-                raise RuntimeError(f"Failed to create energy spectrum plot: {str(e)}")
-                
-        elif plot_type == "ground_state":
-            if "ground_state_analysis" not in system.results:
-                raise ValueError("No ground state data available. Run analyze_ground_state() first.")
-            
-            try:
-                gs_analysis = system.results["ground_state_analysis"]
-                spatial_profile = gs_analysis["spatial_profile"]
-                
-                if not spatial_profile:
-                    raise ValueError("Empty spatial profile data")
-                
-                plt.figure(figsize=(8, 5))
-                plt.plot(range(len(spatial_profile)), spatial_profile, 'o-', markersize=4)
-                plt.xlabel("Site index", fontsize=12)
-                plt.ylabel("|ψ(i)|²", fontsize=12)
-                plt.title(f"Ground State Profile: {system.results.get('model_type', 'Unknown')} Model", fontsize=14)
-                plt.grid(True, alpha=0.3)
-                plt.tight_layout()
-            except Exception as e:
-                raise RuntimeError(f"Failed to create ground state plot: {str(e)}")
-                
-        elif plot_type == "parameter_sweep":
-            if "parameter_sweep" not in system.results:
-                raise ValueError("No parameter sweep data available. Run parameter_sweep() first.")
-            
-            try:
-                sweep = system.results["parameter_sweep"]
-                param_range = sweep["parameter_range"]
-                gs_energies = sweep["ground_state_energies"]
-                energy_gaps = sweep["energy_gaps"]
-                
-                if not param_range or not gs_energies or not energy_gaps:
-                    raise ValueError("Incomplete parameter sweep data")
-                
-                if len(param_range) != len(gs_energies) or len(param_range) != len(energy_gaps):
-                    raise ValueError("Inconsistent parameter sweep data lengths")
-                
-                fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-                
-                # Ground state energy
-                ax1.plot(param_range, gs_energies, 'o-', markersize=6)
-                ax1.set_xlabel(sweep["parameter_name"], fontsize=12)
-                ax1.set_ylabel("Ground State Energy", fontsize=12)
-                ax1.set_title("Ground State Energy", fontsize=14)
-                ax1.grid(True, alpha=0.3)
-                
-                # Energy gap
-                ax2.plot(param_range, energy_gaps, 'o-', markersize=6, color='red')
-                ax2.set_xlabel(sweep["parameter_name"], fontsize=12)
-                ax2.set_ylabel("Energy Gap", fontsize=12)
-                ax2.set_title("Energy Gap", fontsize=14)
-                ax2.grid(True, alpha=0.3)
-                
-                plt.tight_layout()
-            except Exception as e:
-                raise RuntimeError(f"Failed to create parameter sweep plot: {str(e)}")
+        panels = _plot_panels(system, plot_type)
         
         # Handle file saving or base64 encoding
         if file_path:
             try:
-                # Validate file path
-                if not file_path.endswith(('.png', '.jpg', '.jpeg', '.pdf', '.svg')):
-                    file_path += '.png'  # Default to PNG
-                
                 # Save plot to file inside the system's directory
                 system_dir = json_manager.storage_dir / system_id
                 system_dir.mkdir(exist_ok=True)
-                full_path = system_dir / file_path
-                
-                plt.savefig(full_path, dpi=150, bbox_inches='tight')
-                
-                # Verify file was created
-                if not full_path.exists():
-                    raise RuntimeError("Plot file was not created successfully")
-                
-                plt.close()
+                full_path = system_dir / _plot_file_name(file_path)
+                full_path.write_bytes(plot_renderer.render(plot_type, panels, fmt=full_path.suffix[1:].lower(), dpi=dpi))
                 
                 return {
                     "system_id": system_id,
@@ -712,16 +1049,10 @@ def generate_plot(system_id: str, plot_type: str, file_path: Optional[str] = Non
                 }
                 
             except Exception as e:
-                plt.close()  # Clean up
                 raise RuntimeError(f"Failed to save plot to file: {str(e)}")
         else:
             try:
-                # Return plot as base64
-                buf = io.BytesIO()
-                plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-                buf.seek(0)
-                plot_data = base64.b64encode(buf.getvalue()).decode()
-                plt.close()
+                plot_data = base64.b64encode(plot_renderer.render(plot_type, panels, fmt=image_format, dpi=dpi)).decode()
                 
                 if not plot_data:
                     raise RuntimeError("Failed to generate plot data")
@@ -730,22 +1061,18 @@ def generate_plot(system_id: str, plot_type: str, file_path: Optional[str] = Non
                     "system_id": system_id,
                     "plot_type": plot_type,
                     "plot_data": plot_data,
+                    "mime_type": IMAGE_FORMATS[image_format],
                     "description": f"{plot_type.replace('_', ' ').title()} plot as base64"
                 }
                 
             except Exception as e:
-                plt.close()  # Clean up
                 raise RuntimeError(f"Failed to encode plot as base64: {str(e)}")
                 
     except ValueError as e:
-        # Clean up matplotlib resources
-        plt.close('all')
         raise ValueError(str(e))
     except RuntimeError as e:
-        plt.close('all')
         raise RuntimeError(str(e))
     except Exception as e:
-        plt.close('all')
         raise RuntimeError(f"Unexpected error in generate_plot: {str(e)}. "
                          f"System: {system_id}, Plot type: {plot_type}")
 
@@ -827,7 +1154,8 @@ def display_numerical_result(system_id: str, file_name: str) -> Union[ImageConte
         image_base64 = base64.b64encode(image_data).decode('utf-8')
 
         # Return the image content
-        return ImageContent(data=image_base64, mimeType="image/png", type="image")
+        mime_type = IMAGE_FORMATS.get(plot_path.suffix[1:].lower(), "image/png")
+        return ImageContent(data=image_base64, mimeType=mime_type, type="image")
 
     except Exception as e:
         # Return an error message if anything goes wrong
@@ -854,8 +1182,8 @@ def delete_quantum_system(system_id: str) -> Dict[str, Any]:
     if system_id not in json_manager.systems:
         raise ValueError(f"System {system_id} not found")
     
-    # Remove from memory
-    del json_manager.systems[system_id]
+    # Remove from memory and from the index
+    json_manager.delete_system(system_id)
 
     # Delete the entire system directory
     system_dir = json_manager.storage_dir / system_id
@@ -870,31 +1198,40 @@ def delete_quantum_system(system_id: str) -> Dict[str, Any]:
 
 def _build_hamiltonian_from_spec(system) -> Any:
     """Helper function to build NetKet Hamiltonian from system specification."""
+    if not system.lattice or not system.hilbert or not system.hamiltonian:
+        raise ValueError("System must have lattice, Hilbert space, and Hamiltonian defined")
+    return _build_hamiltonian(system.lattice, system.hilbert, system.hamiltonian)
+
+def _build_hamiltonian(lattice: LatticeSchema, hilbert: HilbertSpaceSchema, hamiltonian: HamiltonianSchema) -> Any:
+    """Build the NetKet Hamiltonian, Hilbert space and graph of a specification, reusing cached builds."""
+    key = spec_key(lattice, hilbert, hamiltonian)
+    cached = hamiltonian_cache.get(key)
+    if cached is not None:
+        return cached.hamiltonian, cached.hilbert, cached.graph
+
     try:
-        if not system.lattice or not system.hilbert or not system.hamiltonian:
-            raise ValueError("System must have lattice, Hilbert space, and Hamiltonian defined")
-        
         # Create NetKet objects with error handling
         try:
-            graph = system.lattice.to_netket_graph()
+            graph = lattice.to_netket_graph()
         except Exception as e:
             raise ValueError(f"Failed to create lattice graph: {str(e)}. Check lattice specification.")
         
         try:
-            hi = system.hilbert.to_netket_hilbert(graph)
+            hi = hilbert.to_netket_hilbert(graph)
         except Exception as e:
             raise ValueError(f"Failed to create Hilbert space: {str(e)}. Check Hilbert space compatibility with lattice.")
         
-        # Validate Hilbert space size
-        if hi.n_states <= 0:
+        # Validate Hilbert space size; spaces too large to index are only usable by VMC
+        if hi.is_indexable and hi.n_states <= 0:
             raise ValueError("Invalid Hilbert space: zero states")
         
         # Build Hamiltonian using the schema's method, passing the Hilbert space schema
         try:
-            H = system.hamiltonian.build_netket_hamiltonian(hi, graph, system_hilbert=system.hilbert)
+            H = hamiltonian.build_netket_hamiltonian(hi, graph, system_hilbert=hilbert)
         except Exception as e:
             raise ValueError(f"Failed to build Hamiltonian: {str(e)}. Check Hamiltonian compatibility with lattice and Hilbert space.")
         
+        hamiltonian_cache.put(key, H, hi, graph)
         return H, hi, graph
         
     except ValueError:
@@ -904,6 +1241,67 @@ def _build_hamiltonian_from_spec(system) -> Any:
         # Wrap unexpected errors
         raise RuntimeError(f"Unexpected error building quantum system: {str(e)}")
 
+def _sparse_hamiltonian(lattice: LatticeSchema, hilbert: HilbertSpaceSchema, hamiltonian: HamiltonianSchema) -> Any:
+    """Sparse matrix of the Hamiltonian of a specification, cached together with its NetKet objects."""
+    H, _, _ = _build_hamiltonian(lattice, hilbert, hamiltonian)
+    return hamiltonian_cache.sparse(spec_key(lattice, hilbert, hamiltonian), H)
+
+def _solve_spectrum(system, H: Any, hi: Any, graph: Any, k: int, which: str, solver: str = "auto",
+                    memory_limit_mb: Optional[float] = None, known: Optional[tuple] = None):
+    """Lowest eigenpairs of a system's Hamiltonian, by the dense, sparse or matrix-free strategy."""
+    return solve_spectrum(H, hi, lambda: _sparse_hamiltonian(system.lattice, system.hilbert, system.hamiltonian),
+                          n_sites=graph.n_nodes, k=k, which=which, strategy=solver, memory_limit_mb=memory_limit_mb,
+                          known=known)
+
+def _spectrum_key(system, which: str) -> str:
+    return spectrum_key(system.lattice, system.hilbert, system.hamiltonian, which)
+
+def _stored_eigenpairs(system, which: str) -> Optional[tuple]:
+    """Eigenvalues and eigenvectors stored for the current specification of a system and `which`, or None."""
+    spectrum = stored_spectrum(system.results, _spectrum_key(system, which))
+    if spectrum is None:
+        return None
+    return np.asarray(spectrum["eigenvalues"]), np.asarray(spectrum["eigenvectors"])
+
+def _cached_spectrum(system, k: int, which: str) -> Optional[tuple]:
+    """
+    The `k` eigenvalues and eigenvectors `which` asks for, with the solver report, if the stored spectrum
+    of the current specification holds them; else None.
+    """
+    spectrum = stored_spectrum(system.results, _spectrum_key(system, which))
+    if spectrum is None or len(spectrum["eigenvalues"]) < k:
+        return None
+    eigvals = np.asarray(spectrum["eigenvalues"])
+    chosen = select_eigenpairs(eigvals, k, which)
+    return eigvals[chosen], np.asarray(spectrum["eigenvectors"])[:, chosen], {**spectrum["solver"], "cached": True}
+
+def _store_spectrum(system, which: str, solution):
+    eigvals = solution.eigenvalues
+    system.results["energy_spectrum"] = {
+        "key": _spectrum_key(system, which),
+        "which": which,
+        "eigenvalues": eigvals.tolist(),
+        "eigenvectors": solution.eigenvectors,
+        "ground_state_energy": float(eigvals[0]),
+        "energy_gap": float(eigvals[1] - eigvals[0]) if len(eigvals) > 1 else 0.0,
+        "solver": solution.report()
+    }
+    system.results["model_type"] = system.hamiltonian.model_type
+    system.results["parameters"] = system.hamiltonian.get_parameters()
+
+def _lowest_eigenpairs(system, k: int) -> tuple:
+    """
+    At least the `k` lowest eigenvalues and eigenvectors of a system, reused from the stored spectrum or
+    else computed (10 at least) and stored.
+    """
+    cached = _cached_spectrum(system, k, "SA")
+    if cached is not None:
+        return cached[:2]
+    H, hi, graph = _build_hamiltonian_from_spec(system)
+    solution = _solve_spectrum(system, H, hi, graph, max(10, k), "SA", known=_stored_eigenpairs(system, "SA"))
+    _store_spectrum(system, "SA", solution)
+    return solution.eigenvalues, solution.eigenvectors
+
 @mcp.tool()
 def analyze_eigenstate(system_id: str, eigenstate_index: int) -> Dict[str, Any]:
     '''Analyze a specific eigenstate of a quantum system.
@@ -936,44 +1334,7 @@ def analyze_eigenstate(system_id: str, eigenstate_index: int) -> Dict[str, Any]:
         raise ValueError("System must have lattice, Hilbert space, and Hamiltonian defined. "
                         "Use set_lattice(), set_hilbert_space(), and set_hamiltonian() first.")
     
-    # Check if we need to compute the spectrum
-    spectrum = system.results.get("energy_spectrum")
-    if not spectrum or eigenstate_index >= len(spectrum.get("eigenvalues", [])):
-        num_to_compute = max(10, eigenstate_index + 1)
-        
-        # Build Hamiltonian and compute spectrum
-        H, hi, graph = _build_hamiltonian_from_spec(system)
-        
-        # Function for exact diagonalization
-        def ED(H, k=num_to_compute, which="SA"):
-            if hi.n_states > 1e3:  # sparse matrix
-                sp_h = H.to_sparse()
-                eig_vals, eig_vecs = eigsh(sp_h, k=k, which=which)
-                sort_idx = np.argsort(eig_vals)
-                eig_vals_sorted = eig_vals[sort_idx]
-                eig_vecs_sorted = eig_vecs[:, sort_idx]
-            else:
-                eig_vals_sorted, eig_vecs_sorted = np.linalg.eigh(H.to_dense())
-                if k < len(eig_vals_sorted):
-                    eig_vals_sorted = eig_vals_sorted[:k]
-                    eig_vecs_sorted = eig_vecs_sorted[:, :k]
-            return eig_vals_sorted, eig_vecs_sorted
-        
-        eigvals, eigvecs = ED(H)
-        
-        # Store spectrum results
-        system.results["energy_spectrum"] = {
-            "eigenvalues": eigvals.tolist(),
-            "eigenvectors": eigvecs.tolist(),
-            "ground_state_energy": float(eigvals[0]),
-            "energy_gap": float(eigvals[1] - eigvals[0]) if len(eigvals) > 1 else 0.0
-        }
-        system.results["model_type"] = system.hamiltonian.model_type
-        system.results["parameters"] = system.hamiltonian.get_parameters()
-
-    spectrum = system.results["energy_spectrum"]
-    eigvals = np.array(spectrum["eigenvalues"])
-    eigvecs = np.array(spectrum["eigenvectors"])
+    eigvals, eigvecs = _lowest_eigenpairs(system, eigenstate_index + 1)
     
     if eigenstate_index >= len(eigvals):
         raise ValueError(f"Eigenstate index {eigenstate_index} is out of bounds. "
@@ -999,7 +1360,7 @@ def analyze_eigenstate(system_id: str, eigenstate_index: int) -> Dict[str, Any]:
         "spatial_profile": prob_density.tolist(),
         "localization": localization
     }
-    json_manager.save_system(system_id)
+    json_manager.save_system(system_id, system)
     
     return {
         "system_id": system_id,
@@ -1011,6 +1372,87 @@ def analyze_eigenstate(system_id: str, eigenstate_index: int) -> Dict[str, Any]:
         "parameters": system.hamiltonian.get_parameters()
     }
 
+@mcp.tool()
+def compute_observables(system_id: str, observables: Optional[List[str]] = None,
+                        eigenstate_indices: Optional[List[int]] = None,
+                        subsystems: Optional[List[List[int]]] = None) -> Dict[str, Any]:
+    '''Evaluate site-resolved observables and correlation maps in eigenstates of a quantum system.
+    
+    All observables are computed in one pass over the stored eigenvectors (computing the spectrum if
+    needed), and the operator matrices are kept for later calls on the same system.
+    
+    Args:
+        system_id: The ID of the quantum system
+        observables: Any of "magnetization" (<Sz_i>, spins and spin-1/2 fermions), "spin_correlations"
+            (<S_i.S_j>, spins), "density" (<n_i>, fermions and bosons), "density_correlations" (<n_i n_j>)
+            and "entanglement_entropy" (von Neumann entropy of each subsystem against the rest).
+            Default: all those that apply to the Hilbert space.
+        eigenstate_indices: Eigenstates to evaluate, 0 for the ground state (default: [0])
+        subsystems: Site lists whose entanglement with the rest is computed
+            (default: the first l sites, for every l)
+        
+    Returns:
+        Dictionary with, for each observable, one entry per eigenstate: a list over sites, a
+        site-by-site matrix, or a list over subsystems
+        
+    Examples:
+        - Input: {"system_id": "system_a1b2c3d4", "observables": ["magnetization", "spin_correlations"]}
+        - Output: {
+            "system_id": "system_a1b2c3d4",
+            "eigenstate_indices": [0],
+            "energies": [-3.65],
+            "magnetization": [[0.0, 0.0, 0.0, 0.0]],
+            "spin_correlations": [[[0.75, -0.46, 0.1, -0.14], ...]]
+          }
+    '''
+    if system_id not in json_manager.systems:
+        raise ValueError(f"System '{system_id}' not found. Use create_quantum_system() first.")
+    system = json_manager.systems[system_id]
+    if not system.lattice or not system.hilbert or not system.hamiltonian:
+        raise ValueError("System must have lattice, Hilbert space, and Hamiltonian defined. "
+                        "Use set_lattice(), set_hilbert_space(), and set_hamiltonian() first.")
+    
+    eigenstate_indices = eigenstate_indices if eigenstate_indices is not None else [0]
+    if not eigenstate_indices or min(eigenstate_indices) < 0:
+        raise ValueError(f"eigenstate_indices must be a nonempty list of non-negative indices, got {eigenstate_indices}")
+    observables = observables or default_observables(system.hilbert)
+    unknown = [name for name in observables if name not in OBSERVABLES]
+    if unknown:
+        raise ValueError(f"Unknown observables: {unknown}. Must be among {OBSERVABLES}")
+    
+    eigvals, eigvecs = _lowest_eigenpairs(system, max(eigenstate_indices) + 1)
+    if max(eigenstate_indices) >= len(eigvals):
+        raise ValueError(f"Eigenstate index {max(eigenstate_indices)} is out of bounds: the Hilbert space "
+                         f"only has {len(eigvals)} states.")
+    
+    _, hi, graph = _build_hamiltonian_from_spec(system)
+    key = spec_key(system.lattice, system.hilbert, system.hamiltonian)
+    engine = ObservableEngine(hi, system.hilbert, graph.n_nodes,
+                              cached=lambda name, build: hamiltonian_cache.operator(key, name, build),
+                              sublattice=marshall_sublattice(system.hamiltonian, graph))
+    values = engine.evaluate(np.asarray(eigvecs)[:, eigenstate_indices], observables, subsystems)
+    if "entanglement_entropy" in observables:
+        subsystems = subsystems if subsystems is not None else default_bipartitions(graph.n_nodes)
+    
+    energies = [float(eigvals[i]) for i in eigenstate_indices]
+    system.results["observables"] = {
+        "eigenstate_indices": list(eigenstate_indices),
+        "energies": energies,
+        "subsystems": subsystems,
+        **values
+    }
+    json_manager.save_system(system_id, system)
+    
+    result = {
+        "system_id": system_id,
+        "eigenstate_indices": list(eigenstate_indices),
+        "energies": energies,
+        **{name: value.tolist() for name, value in values.items()}
+    }
+    if subsystems is not None:
+        result["subsystems"] = subsystems
+    return result
+
 def main():
     mcp.run('stdio')
 
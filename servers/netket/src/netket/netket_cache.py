@@ -0,0 +1,184 @@
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
+
+# Default bounds of the Hamiltonian build cache
+DEFAULT_MAX_ENTRIES = 32
+DEFAULT_MAX_MEMORY_MB = 512
+
+# Version of the stored spectra; spectra stored under an older version are recomputed once. Version 2: the
+# dense solver used to store the lowest eigenpairs under any `which`
+SPECTRUM_VERSION = 2
+
+def spec_key(lattice: LatticeSchema, hilbert: HilbertSpaceSchema, hamiltonian: HamiltonianSchema) -> str:
+    """
+    Canonical key of a system specification.
+
+    Built from the `model_dump()` of the three schemas, leaving out the fields that do not change the
+    Hamiltonian: the rendered text and the parameter ranges meant for sweeps.
+    """
+    return json.dumps({
+        "lattice": lattice.model_dump(exclude={"text"}),
+        "hilbert": hilbert.model_dump(exclude={"text"}),
+        "hamiltonian": hamiltonian.model_dump(exclude={"text", "parameter_ranges"}),
+    }, sort_keys=True)
+
+def spectrum_key(lattice: LatticeSchema, hilbert: HilbertSpaceSchema, hamiltonian: HamiltonianSchema,
+                 which: str) -> str:
+    """
+    Key of a stored spectrum: the specification, the part of the spectrum asked for and SPECTRUM_VERSION.
+    The solver strategy is left out since all strategies find the same eigenpairs.
+    """
+    text = f"{spec_key(lattice, hilbert, hamiltonian)}|{which}|{SPECTRUM_VERSION}"
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+def sweep_key(lattice: LatticeSchema, hilbert: HilbertSpaceSchema, model_type: str, k: int) -> str:
+    """Key of checkpointed sweep points: everything that determines them besides the parameter values."""
+    text = json.dumps({
+        "lattice": lattice.model_dump(exclude={"text"}),
+        "hilbert": hilbert.model_dump(exclude={"text"}),
+        "model_type": model_type,
+        "k": k,
+    }, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+def stored_spectrum(results: dict, key: str) -> Optional[dict]:
+    """The energy spectrum in a system's results if it was computed under `key`, else None."""
+    spectrum = results.get("energy_spectrum")
+    if not spectrum or spectrum.get("key") != key:
+        return None
+    return spectrum
+
+def sparse_nbytes(matrix: Any) -> int:
+    """Memory held by a scipy sparse matrix in CSR/CSC form."""
+    return int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+
+def object_nbytes(value: Any) -> int:
+    """Memory held by sparse matrices and arrays, also inside tuples, lists and dicts."""
+    if isinstance(value, (tuple, list)):
+        return sum(object_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(object_nbytes(item) for item in value.values())
+    if hasattr(value, "indptr"):
+        return sparse_nbytes(value)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    return 0
+
+@dataclass
+class CachedHamiltonian:
+    """
+    The NetKet objects built for one specification, the sparse matrix once it was asked for, and the
+    matrices of other operators on the same Hilbert space, by name.
+    """
+    hamiltonian: Any
+    hilbert: Any
+    graph: Any
+    sparse: Any = None
+    operators: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def nbytes(self) -> int:
+        sparse = sparse_nbytes(self.sparse) if self.sparse is not None else 0
+        return sparse + object_nbytes(self.operators)
+
+class HamiltonianCache:
+    """
+    LRU cache of built Hamiltonians keyed on `spec_key`.
+
+    Holds at most `max_entries` systems, and evicts the least recently used ones once their sparse
+    matrices and operators take more than `max_memory_mb`. Changing any component of a system changes its
+    key, so entries never need to be invalidated.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_memory_mb: float = DEFAULT_MAX_MEMORY_MB):
+        self.max_entries = max_entries
+        self.max_memory = int(max_memory_mb * 1024 * 1024)
+        self._entries: OrderedDict[str, CachedHamiltonian] = OrderedDict()
+        self._memory = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    @property
+    def memory(self) -> int:
+        """Bytes held by the cached sparse matrices and operators."""
+        return self._memory
+
+    def get(self, key: str) -> Optional[CachedHamiltonian]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, hamiltonian: Any, hilbert: Any, graph: Any) -> CachedHamiltonian:
+        self._remove(key)
+        entry = CachedHamiltonian(hamiltonian=hamiltonian, hilbert=hilbert, graph=graph)
+        self._entries[key] = entry
+        self._evict()
+        return entry
+
+    def sparse(self, key: str, hamiltonian: Any) -> Any:
+        """
+        Sparse matrix of `hamiltonian`, the operator cached under `key`.
+
+        The matrix is built on first use and kept with the entry. If the entry is no longer cached, the
+        matrix is built and returned without being stored.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.sparse is not None:
+            return entry.sparse
+        matrix = hamiltonian.to_sparse()
+        if entry is not None and entry.hamiltonian is hamiltonian:
+            entry.sparse = matrix
+            self._memory += sparse_nbytes(matrix)
+            self._evict()
+        return matrix
+
+    def operator(self, key: str, name: str, build: Callable[[], Any]) -> Any:
+        """
+        Operator `name` on the Hilbert space of the entry cached under `key`, built by `build()` on first
+        use and kept with the entry. If the entry is no longer cached, it is built and not stored.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and name in entry.operators:
+            return entry.operators[name]
+        value = build()
+        if entry is not None:
+            entry.operators[name] = value
+            self._memory += object_nbytes(value)
+            self._evict()
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self._memory = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "memory_mb": self._memory / (1024 * 1024),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._memory -= entry.nbytes
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._memory > self.max_memory):
+            self._remove(next(iter(self._entries)))
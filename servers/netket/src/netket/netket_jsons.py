@@ -1,10 +1,75 @@
+import atexit
 import json
+import os
+import tempfile
+import threading
 import uuid
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Iterator
+import numpy as np
 from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
 
+# Numpy arrays in results are stored next to the system JSON, in this subdirectory
+ARRAY_DIR = "arrays"
+# Key marking a reference to a stored array in the system JSON
+ARRAY_KEY = "__array__"
+# Summary of every stored system, kept in the storage directory
+INDEX_FILE = "index.json"
+# Results dropped when a component of the system changes
+SPECIFICATION_RESULTS = ["energy_spectrum", "sector_spectrum", "observables"]
+# Default number of systems kept in memory
+DEFAULT_MAX_LOADED_SYSTEMS = 16
+# Append-only log of the changes to a system, next to its snapshot JSON
+HISTORY_FILE = "history.jsonl"
+
+def atomic_write(path: Path, write: Callable[[Any], None], mode: str = 'w'):
+    """Write a file through `write(f)` into a temporary file that then replaces `path`."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def index_entry(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary of a system for `list_systems`, from its `to_dict()` data."""
+    return {
+        "status": data.get("status"),
+        "last_modified": data.get("last_modified"),
+        **{component: data[component]["text"] if data.get(component) else None
+           for component in ("lattice", "hilbert", "hamiltonian")},
+    }
+
+def encode_arrays(value: Any, prefix: str, arrays: Optional[Dict[str, np.ndarray]] = None) -> Any:
+    """
+    Replace the numpy arrays in nested result dicts by references to .npy files named after their keys.
+
+    The arrays are collected into `arrays` (file name -> array) when given. Arrays inside lists are not
+    looked for, so lists of numbers pass through untouched.
+    """
+    if isinstance(value, np.ndarray):
+        file_name = f"{ARRAY_DIR}/{prefix.replace(os.sep, '_')}.npy"
+        if arrays is not None:
+            arrays[file_name] = value
+        return {ARRAY_KEY: file_name, "shape": list(value.shape), "dtype": str(value.dtype)}
+    if isinstance(value, dict):
+        return {key: encode_arrays(item, f"{prefix}.{key}", arrays) for key, item in value.items()}
+    return value
+
+def decode_arrays(value: Any, system_dir: Path) -> Any:
+    """Inverse of encode_arrays: memory-map the referenced .npy files of a system directory."""
+    if isinstance(value, dict):
+        if ARRAY_KEY in value:
+            return np.load(system_dir / value[ARRAY_KEY], mmap_mode="r")
+        return {key: decode_arrays(item, system_dir) for key, item in value.items()}
+    return value
+
 class QuantumSystemState:
     def __init__(self, system_id: Optional[str] = None):
         self.system_id = system_id or f"system_{uuid.uuid4().hex[:8]}"
@@ -17,8 +82,11 @@ class QuantumSystemState:
         self.hilbert: Optional[HilbertSpaceSchema] = None
         self.hamiltonian: Optional[HamiltonianSchema] = None
         self.results: Dict[str, Any] = {}
+        # Number of history entries already in the history log
+        self.history_saved = 0
 
-    def to_dict(self):
+    def to_dict(self, arrays: Optional[Dict[str, np.ndarray]] = None):
+        """JSON-ready state; numpy arrays in the results become references, collected into `arrays` if given."""
         return {
             "system_id": self.system_id,
             "created_at": self.created_at,
@@ -29,11 +97,11 @@ class QuantumSystemState:
             "lattice": self.lattice.model_dump() if self.lattice else None,
             "hilbert": self.hilbert.model_dump() if self.hilbert else None,
             "hamiltonian": self.hamiltonian.model_dump() if self.hamiltonian else None,
-            "results": self.results,
+            "results": encode_arrays(self.results, "results", arrays),
         }
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, system_dir: Optional[Path] = None):
         obj = cls(system_id=data.get("system_id"))
         obj.created_at = data.get("created_at", obj.created_at)
         obj.last_modified = data.get("last_modified", obj.last_modified)
@@ -47,15 +115,87 @@ class QuantumSystemState:
         if data.get("hamiltonian"):
             obj.hamiltonian = HamiltonianSchema(**data["hamiltonian"])
         obj.results = data.get("results", {})
+        if system_dir is not None:
+            obj.results = decode_arrays(obj.results, system_dir)
         return obj
 
+class SystemCache(MutableMapping):
+    """
+    The systems of a manager by id, loaded from disk on first access.
+
+    Every system in `index` is available, but only the `max_loaded` most recently used ones are kept in
+    memory. Systems are saved whenever they change, so evicted ones are simply loaded again; code that holds a
+    system while others are loaded saves the object it holds (see NetKetJSONManager.save_system).
+    """
+
+    def __init__(self, index: Dict[str, Dict[str, Any]], load: Callable[[str], QuantumSystemState],
+                 max_loaded: int = DEFAULT_MAX_LOADED_SYSTEMS):
+        self.index = index
+        self.load = load
+        self.max_loaded = max_loaded
+        self._loaded: OrderedDict[str, QuantumSystemState] = OrderedDict()
+
+    @property
+    def loaded(self) -> list:
+        """Ids of the systems in memory, least recently used first."""
+        return list(self._loaded)
+
+    def __contains__(self, system_id: object) -> bool:
+        return system_id in self._loaded or system_id in self.index
+
+    def __getitem__(self, system_id: str) -> QuantumSystemState:
+        system = self._loaded.get(system_id)
+        if system is not None:
+            self._loaded.move_to_end(system_id)
+            return system
+        if system_id not in self.index:
+            raise KeyError(system_id)
+        try:
+            system = self.load(system_id)
+        except FileNotFoundError:
+            # Removed from disk behind our back
+            self.index.pop(system_id, None)
+            raise KeyError(system_id)
+        self[system_id] = system
+        return system
+
+    def __setitem__(self, system_id: str, system: QuantumSystemState):
+        self._loaded[system_id] = system
+        self._loaded.move_to_end(system_id)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+
+    def __delitem__(self, system_id: str):
+        if system_id not in self:
+            raise KeyError(system_id)
+        self._loaded.pop(system_id, None)
+        self.index.pop(system_id, None)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.index
+        yield from (system_id for system_id in self._loaded if system_id not in self.index)
+
+    def __len__(self) -> int:
+        return len(self.index) + sum(system_id not in self.index for system_id in self._loaded)
+
 class NetKetJSONManager:
-    def __init__(self, storage_dir: str = "/tmp/quantum_systems"):
+    def __init__(self, storage_dir: str = "/tmp/quantum_systems",
+                 max_loaded_systems: int = DEFAULT_MAX_LOADED_SYSTEMS, save_delay: float = 0.0):
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(exist_ok=True)
-        self.systems: Dict[str, QuantumSystemState] = {}
+        self.save_delay = save_delay
+        # Snapshots waiting to be written, by system id
+        self._pending: Dict[str, tuple] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        # Array last written to each .npy file, so that arrays kept in memory are not written again by every save
+        self._saved_arrays: Dict[Path, weakref.ref] = {}
+        if save_delay > 0:
+            atexit.register(self.flush)
+        self.index: Dict[str, Dict[str, Any]] = {}
+        self.systems = SystemCache(self.index, self._read_system, max_loaded_systems)
         self.current_system_id: Optional[str] = None
-        self._load_existing_systems()
+        self._load_index()
 
     def _get_system_dir(self, system_id: str) -> Path:
         system_dir = self.storage_dir / system_id
@@ -76,7 +216,7 @@ class NetKetJSONManager:
         
         self.systems[system.system_id] = system
         self.current_system_id = system.system_id
-        self.save_system(system.system_id)
+        self.save_system(system=system)
         return system.system_id
 
     def update_component(self, component_type: str, specification: Any, system_id: Optional[str] = None):
@@ -97,6 +237,9 @@ class NetKetJSONManager:
         else:
             raise ValueError(f"Unknown component type: {component_type}")
         
+        # Spectra and observables of the previous specification no longer apply
+        for stale in SPECIFICATION_RESULTS:
+            system.results.pop(stale, None)
         system.last_modified = datetime.now().isoformat()
         system.history.append({
             "timestamp": system.last_modified,
@@ -104,51 +247,162 @@ class NetKetJSONManager:
             "data": specification
         })
         self._validate_system(system)
-        self.save_system(system_id)
+        self.save_system(system=system)
+
+    def save_system(self, system_id: Optional[str] = None, system: Optional[QuantumSystemState] = None):
+        """
+        Save a system: new history entries are appended to its log right away, while the snapshot is
+        written after `save_delay` seconds, so that saves in quick succession are written only once.
 
-    def save_system(self, system_id: Optional[str] = None):
+        Callers that changed a system pass it as `system`: it may have been evicted from memory while they
+        held it, and looking it up again by id would then load and save the older copy on disk.
+        """
+        if system is not None:
+            system_id = system.system_id
         system_id = system_id or self.current_system_id
         if not system_id or system_id not in self.systems:
             raise ValueError("No such system to save.")
-        system = self.systems[system_id]
+        if system is None:
+            system = self.systems[system_id]
+        else:
+            # The saved system is the current one, even if a copy was loaded again meanwhile
+            self.systems[system_id] = system
         
         # Ensure the directory exists
-        self._get_system_dir(system_id)
-        
+        system_dir = self._get_system_dir(system_id)
+        self._append_history(system_dir, system)
+
+        arrays: Dict[str, np.ndarray] = {}
+        data = system.to_dict(arrays)
+        del data["history"]
+        with self._lock:
+            self.index[system_id] = index_entry(data)
+            # Serialize now, so that later changes to the system cannot race the delayed write
+            self._pending[system_id] = (json.dumps(data, indent=2), arrays)
+            if self.save_delay > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.save_delay, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self.flush()
+
+    def flush(self):
+        """Write all pending snapshots and the index."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, {}
+            for system_id, (text, arrays) in pending.items():
+                self._write_snapshot(system_id, text, arrays)
+            if pending:
+                self._save_index()
+
+    def _write_snapshot(self, system_id: str, text: str, arrays: Dict[str, np.ndarray]):
         file_path = self._system_file(system_id)
-        with open(file_path, 'w') as f:
-            json.dump(system.to_dict(), f, indent=2)
+        for file_name, array in arrays.items():
+            self._save_array(file_path.parent / file_name, array)
+        atomic_write(file_path, lambda f: f.write(text))
+        self._remove_stale_arrays(file_path.parent, arrays)
+
+    def _append_history(self, system_dir: Path, system: QuantumSystemState):
+        new_entries = system.history[system.history_saved:]
+        if not new_entries:
+            return
+        with open(system_dir / HISTORY_FILE, 'a') as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in new_entries))
+        system.history_saved = len(system.history)
+
+    def _save_array(self, path: Path, array: np.ndarray):
+        # Arrays loaded from this file are memory-mapped and already saved
+        if isinstance(array, np.memmap) and array.filename and Path(array.filename) == path.resolve():
+            return
+        # So are the arrays written by an earlier save: results are replaced, never changed in place
+        saved = self._saved_arrays.get(path)
+        if saved is not None and saved() is array:
+            return
+        path.parent.mkdir(exist_ok=True)
+        # Replace rather than overwrite the file, which may still be memory-mapped by an older array
+        atomic_write(path, lambda f: np.save(f, np.ascontiguousarray(array)), mode='wb')
+        self._saved_arrays[path] = weakref.ref(array)
+
+    def _remove_stale_arrays(self, system_dir: Path, arrays: Dict[str, np.ndarray]):
+        array_dir = system_dir / ARRAY_DIR
+        if not array_dir.exists():
+            return
+        current = {system_dir / file_name for file_name in arrays}
+        for path in array_dir.glob("*.npy"):
+            if path not in current:
+                path.unlink()
+                self._saved_arrays.pop(path, None)
 
     def load_system(self, system_id: str):
-        file_path = self._system_file(system_id)
+        system = self._read_system(system_id)
+        self.systems[system_id] = system
+        self.current_system_id = system_id
+        return system
+
+    def delete_system(self, system_id: str):
+        """Forget a system; its directory is left to the caller."""
+        with self._lock:
+            self._pending.pop(system_id, None)
+            del self.systems[system_id]
+            self._save_index()
+        if self.current_system_id == system_id:
+            self.current_system_id = None
+
+    def list_systems(self):
+        return [{"system_id": sys_id, **entry} for sys_id, entry in self.index.items()]
+
+    def _read_system(self, system_id: str) -> QuantumSystemState:
+        if system_id in self._pending:
+            self.flush()
+        file_path = self.storage_dir / system_id / f"{system_id}.json"
         if not file_path.exists():
             raise FileNotFoundError(f"System file {file_path} does not exist.")
         with open(file_path, 'r') as f:
             data = json.load(f)
-        system = QuantumSystemState.from_dict(data)
-        self.systems[system_id] = system
-        self.current_system_id = system_id
+        system = QuantumSystemState.from_dict(data, file_path.parent)
+        history_path = file_path.parent / HISTORY_FILE
+        if history_path.exists():
+            # Snapshots written before the history log keep their history inline
+            system.history = self._read_history(history_path)
+            system.history_saved = len(system.history)
         return system
 
-    def list_systems(self):
-        return [
-            {
-                "system_id": sys_id,
-                "status": sys.status,
-                "last_modified": sys.last_modified,
-                "lattice": sys.lattice.text if sys.lattice else None,
-                "hilbert": sys.hilbert.text if sys.hilbert else None,
-                "hamiltonian": sys.hamiltonian.text if sys.hamiltonian else None
-            }
-            for sys_id, sys in self.systems.items()
-        ]
-
-    def _load_existing_systems(self):
-        for file_path in self.storage_dir.glob("system_*/system_*.json"):
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            system = QuantumSystemState.from_dict(data)
-            self.systems[system.system_id] = system
+    def _read_history(self, history_path: Path) -> list:
+        history = []
+        with open(history_path, 'r') as f:
+            for line in f:
+                try:
+                    history.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Line cut short by a crash while appending
+                    continue
+        return history
+
+    def _save_index(self):
+        atomic_write(self.storage_dir / INDEX_FILE, lambda f: json.dump(self.index, f, indent=2))
+
+    def _load_index(self):
+        index_path = self.storage_dir / INDEX_FILE
+        if index_path.exists():
+            with open(index_path, 'r') as f:
+                self.index.update(json.load(f))
+        # Only list the directories: systems are read once, when they are missing from the index
+        # (e.g. storage written before the index existed)
+        stored = {path.name for path in self.storage_dir.glob("system_*") if (path / f"{path.name}.json").exists()}
+        changed = False
+        for system_id in sorted(stored - self.index.keys()):
+            with open(self.storage_dir / system_id / f"{system_id}.json", 'r') as f:
+                self.index[system_id] = index_entry(json.load(f))
+            changed = True
+        for system_id in self.index.keys() - stored:
+            del self.index[system_id]
+            changed = True
+        if changed:
+            self._save_index()
 
     def _validate_system(self, system: QuantumSystemState):
         warnings = []
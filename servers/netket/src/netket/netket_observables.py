@@ -0,0 +1,197 @@
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import scipy.sparse as sp
+from netket_schemas import HilbertSpaceSchema, HamiltonianSchema
+
+# Observables evaluated by ObservableEngine
+OBSERVABLES = ["magnetization", "spin_correlations", "density", "density_correlations", "entanglement_entropy"]
+
+# Largest reduced density matrix diagonalized for an entanglement entropy
+MAX_REDUCED_DIM = 4096
+
+# Schmidt weights below this are left out of the entropy
+SCHMIDT_CUTOFF = 1e-14
+
+def default_observables(hilbert: HilbertSpaceSchema) -> List[str]:
+    """Observables that apply to a Hilbert space."""
+    if hilbert.space_type == "spin":
+        return ["magnetization", "spin_correlations", "entanglement_entropy"]
+    observables = ["density", "density_correlations", "entanglement_entropy"]
+    if hilbert.space_type == "fermion" and hilbert.spin == 0.5:
+        observables.insert(0, "magnetization")
+    return observables
+
+def default_bipartitions(n_sites: int) -> List[List[int]]:
+    """Sites 0..l-1 against the rest, for every cut l of the site order."""
+    return [list(range(l)) for l in range(1, n_sites)]
+
+def marshall_sublattice(hamiltonian: HamiltonianSchema, graph: Any) -> Optional[np.ndarray]:
+    """
+    Sublattice (0 or 1) of every site if the Hamiltonian is NetKet's Heisenberg model on a bipartite
+    lattice, else None. NetKet then applies Marshall's sign rule, so eigenvectors are in a basis where
+    the spins of one sublattice are rotated by pi about z.
+    """
+    if hamiltonian.model_type != "heisenberg" or not graph.is_bipartite():
+        return None
+    neighbors = [[] for _ in range(graph.n_nodes)]
+    for i, j in graph.edges():
+        neighbors[i].append(j)
+        neighbors[j].append(i)
+    sublattice = np.full(graph.n_nodes, -1)
+    for root in range(graph.n_nodes):
+        if sublattice[root] >= 0:
+            continue
+        sublattice[root] = 0
+        stack = [root]
+        while stack:
+            i = stack.pop()
+            for j in neighbors[i]:
+                if sublattice[j] < 0:
+                    sublattice[j] = 1 - sublattice[i]
+                    stack.append(j)
+    return sublattice
+
+class ObservableEngine:
+    """
+    Expectation values of site-resolved observables in many eigenstates at once.
+
+    Diagonal observables (magnetizations, densities and their correlations) are weighted sums over the
+    basis states, computed for all sites and pairs with one matrix product per eigenstate. The transverse
+    part of S_i.S_j is a sparse matrix per pair, applied to all eigenstates at once. Basis states, matrices
+    and bipartition indices come from `cached(name, build)`, so that they can be kept across calls.
+    With a `sublattice` from `marshall_sublattice`, spin correlations are those of the unrotated spins.
+    """
+
+    def __init__(self, hi: Any, hilbert: HilbertSpaceSchema, n_sites: int,
+                 cached: Optional[Callable[[str, Callable[[], Any]], Any]] = None,
+                 sublattice: Optional[np.ndarray] = None):
+        self.hi = hi
+        self.hilbert = hilbert
+        self.n_sites = n_sites
+        self.sublattice = sublattice
+        self._cached = cached or (lambda name, build: build())
+
+    @property
+    def states(self) -> np.ndarray:
+        return self._cached("states", lambda: np.asarray(self.hi.all_states()))
+
+    def site_modes(self, site: int) -> List[int]:
+        """Positions of the local degrees of freedom of a site in a basis state."""
+        if self.hilbert.space_type != "fermion":
+            return [site]
+        n_spin = self.hi.size // self.n_sites
+        return [site + k * self.n_sites for k in range(n_spin)]
+
+    def evaluate(self, vectors: np.ndarray, observables: List[str],
+                 subsystems: Optional[List[List[int]]] = None) -> Dict[str, np.ndarray]:
+        """
+        Observables in the states given as the columns of `vectors`, each an array whose first axis runs
+        over the states: site values, site-by-site matrices, or one entropy per subsystem of `subsystems`
+        (default: `default_bipartitions`).
+        """
+        unknown = [name for name in observables if name not in OBSERVABLES]
+        if unknown:
+            raise ValueError(f"Unknown observables: {unknown}. Must be among {OBSERVABLES}")
+        vectors = np.asarray(vectors)
+        weights = np.abs(vectors)**2
+        results = {}
+        for name in observables:
+            if name == "magnetization":
+                results[name] = weights.T @ self._sz()
+            elif name == "spin_correlations":
+                results[name] = self._spin_correlations(vectors, weights)
+            elif name == "density":
+                results[name] = weights.T @ self._occupations()
+            elif name == "density_correlations":
+                n = self._occupations()
+                results[name] = np.stack([n.T @ (n * w[:, None]) for w in weights.T])
+            else:
+                subsystems = subsystems if subsystems is not None else default_bipartitions(self.n_sites)
+                results[name] = np.array([[self._entropy(psi, sites) for sites in subsystems]
+                                          for psi in vectors.T])
+        return results
+
+    def _sz(self) -> np.ndarray:
+        """Sz of every site in every basis state."""
+        def build():
+            if self.hilbert.space_type == "spin":
+                # Local spin states are stored as 2*m
+                return self.states / 2
+            if self.hilbert.space_type == "fermion" and self.hilbert.spin == 0.5:
+                up = [self.hi._get_index(i, 1) for i in range(self.n_sites)]
+                down = [self.hi._get_index(i, -1) for i in range(self.n_sites)]
+                return (self.states[:, up] - self.states[:, down]) / 2
+            raise ValueError(f"Magnetization is only defined for spins and spin-1/2 fermions, not {self.hilbert.text}")
+        return self._cached("sz", build)
+
+    def _occupations(self) -> np.ndarray:
+        """Number of particles on every site in every basis state."""
+        def build():
+            if self.hilbert.space_type == "spin":
+                raise ValueError("Densities are defined for fermions and bosons; use magnetization for spins")
+            return np.stack([self.states[:, self.site_modes(i)].sum(axis=1) for i in range(self.n_sites)], axis=1)
+        return self._cached("occupations", build)
+
+    def _spin_correlations(self, vectors: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """<S_i.S_j> for every pair of sites: Sz_i Sz_j from the basis states, plus Re<S+_i S-_j>."""
+        if self.hilbert.space_type != "spin":
+            raise ValueError(f"Spin correlations are only defined for spin Hilbert spaces, not {self.hilbert.text}")
+        sz = self._sz()
+        correlations = np.stack([sz.T @ (sz * w[:, None]) for w in weights.T])
+        for i in range(self.n_sites):
+            for j in range(i + 1, self.n_sites):
+                exchange = self._cached(f"exchange_{i}_{j}", lambda: self._exchange(i, j))
+                transverse = np.real(np.sum(vectors.conj() * (exchange @ vectors), axis=0))
+                if self.sublattice is not None and self.sublattice[i] != self.sublattice[j]:
+                    transverse = -transverse
+                correlations[:, i, j] += transverse
+                correlations[:, j, i] += transverse
+        # S_i.S_i = s(s+1)
+        spin = self.hilbert.spin
+        correlations[:, np.arange(self.n_sites), np.arange(self.n_sites)] = spin * (spin + 1)
+        return correlations
+
+    def _exchange(self, i: int, j: int) -> Any:
+        """Sparse matrix of S+_i S-_j."""
+        states = self.states
+        spin = self.hilbert.spin
+        source = np.flatnonzero((states[:, i] < 2 * spin) & (states[:, j] > -2 * spin))
+        m_i, m_j = states[source, i] / 2, states[source, j] / 2
+        amplitudes = np.sqrt(spin * (spin + 1) - m_i * (m_i + 1)) * np.sqrt(spin * (spin + 1) - m_j * (m_j - 1))
+        targets = states[source].copy()
+        targets[:, i] += 2
+        targets[:, j] -= 2
+        rows = np.asarray(self.hi.states_to_numbers(targets))
+        n_states = len(states)
+        return sp.csr_matrix((amplitudes, (rows, source)), shape=(n_states, n_states))
+
+    def _bipartition(self, sites: List[int]) -> tuple:
+        """Row and column of every basis state in the matrix of amplitudes between `sites` and the rest."""
+        if not sites or len(set(sites)) == self.n_sites or not all(0 <= i < self.n_sites for i in sites):
+            raise ValueError(f"A subsystem must be a proper, nonempty subset of the sites 0..{self.n_sites - 1}, "
+                             f"got {sites}")
+        modes_a = [mode for i in sorted(set(sites)) for mode in self.site_modes(i)]
+        modes_b = [mode for i in range(self.n_sites) if i not in set(sites) for mode in self.site_modes(i)]
+        local_states = np.sort(np.asarray(self.hi.local_states))
+        d = len(local_states)
+        if d ** min(len(modes_a), len(modes_b)) > MAX_REDUCED_DIM:
+            raise ValueError(f"Subsystem {sites} is too large: its reduced density matrix would exceed "
+                             f"{MAX_REDUCED_DIM} states")
+        local = np.searchsorted(local_states, self.states)
+        rows = np.ravel_multi_index(local[:, modes_a].T, (d,) * len(modes_a))
+        columns = np.ravel_multi_index(local[:, modes_b].T, (d,) * len(modes_b))
+        return rows, columns, d ** len(modes_a), d ** len(modes_b)
+
+    def _entropy(self, psi: np.ndarray, sites: List[int]) -> float:
+        """Von Neumann entanglement entropy between `sites` and the rest of the lattice."""
+        rows, columns, dim_a, dim_b = self._cached(f"bipartition_{sorted(set(sites))}",
+                                                   lambda: self._bipartition(sites))
+        amplitudes = sp.csr_matrix((psi, (rows, columns)), shape=(dim_a, dim_b))
+        # The smaller of the two reduced density matrices has the same nonzero spectrum
+        if dim_a <= dim_b:
+            rho = amplitudes @ amplitudes.conj().T
+        else:
+            rho = amplitudes.conj().T @ amplitudes
+        schmidt = np.linalg.eigvalsh(rho.toarray())
+        schmidt = schmidt[schmidt > SCHMIDT_CUTOFF]
+        return float(-np.sum(schmidt * np.log(schmidt)))
@@ -0,0 +1,158 @@
+import io
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+
+# Image formats plots can be returned in, with their MIME types. Both are encoded from the Agg buffer;
+# WebP is lossless, which keeps lines sharp and is smaller than PNG
+IMAGE_FORMATS = {"png": "image/png", "webp": "image/webp"}
+
+# Formats plots can be saved to, by file extension
+FILE_FORMATS = ["png", "webp", "jpg", "jpeg", "pdf", "svg"]
+
+DEFAULT_DPI = 150
+
+# Figure size and line style of each panel, per plot type
+TEMPLATES = {
+    "spectrum": ((8, 6), [{"markersize": 6}]),
+    "ground_state": ((8, 5), [{"markersize": 4}]),
+    "parameter_sweep": ((12, 5), [{"markersize": 6}, {"markersize": 6, "color": "red"}]),
+    "xy": ((8, 6), [{"markersize": 6}]),
+}
+
+# Figure size and colormap of each panel, per heatmap plot type
+HEATMAP_TEMPLATES = {
+    "grid_sweep": ((13, 5), ["viridis", "magma"]),
+}
+
+@dataclass
+class Panel:
+    """Data and labels of one set of axes."""
+    x: Sequence[float]
+    y: Sequence[float]
+    xlabel: str
+    ylabel: str
+    title: str
+
+@dataclass
+class Heatmap:
+    """Values on a grid and labels of one set of axes; `values[i, j]` is at `x[i]`, `y[j]`."""
+    x: Sequence[float]
+    y: Sequence[float]
+    values: np.ndarray
+    xlabel: str
+    ylabel: str
+    title: str
+
+class PlotTemplate:
+    """
+    Figure of one plot type on its own Agg canvas, outside of pyplot. The axes and lines are created once;
+    later plots only replace the line data and the labels.
+    """
+
+    def __init__(self, plot_type: str):
+        figsize, styles = TEMPLATES[plot_type]
+        self.figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figure)
+        self.axes = list(self.figure.subplots(1, len(styles), squeeze=False)[0])
+        self.lines = []
+        for ax, style in zip(self.axes, styles):
+            line, = ax.plot([], [], 'o-', **style)
+            ax.grid(True, alpha=0.3)
+            self.lines.append(line)
+
+    def update(self, panels: List[Panel], dpi: float):
+        if len(panels) != len(self.axes):
+            raise ValueError(f"Expected {len(self.axes)} panels, got {len(panels)}")
+        self.figure.set_dpi(dpi)
+        for ax, line, panel in zip(self.axes, self.lines, panels):
+            line.set_data(panel.x, panel.y)
+            ax.relim()
+            ax.autoscale_view()
+            ax.set_xlabel(panel.xlabel, fontsize=12)
+            ax.set_ylabel(panel.ylabel, fontsize=12)
+            ax.set_title(panel.title, fontsize=14)
+        # Tick labels change with the data, so the margins are fitted again
+        self.figure.tight_layout()
+
+    def render(self, fmt: str) -> bytes:
+        buf = io.BytesIO()
+        if fmt in IMAGE_FORMATS:
+            # One draw of the canvas, where savefig would draw again to lay out the figure
+            canvas = self.figure.canvas
+            canvas.draw()
+            image = Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+            image.save(buf, format=fmt, **({"lossless": True} if fmt == "webp" else {}))
+        else:
+            self.figure.savefig(buf, format=fmt, dpi=self.figure.dpi)
+        return buf.getvalue()
+
+class HeatmapTemplate(PlotTemplate):
+    """
+    Heatmaps of one plot type on their own Agg canvas. The axes and colorbars are created once; later
+    plots replace the color meshes, since their shapes change with the grids.
+    """
+
+    def __init__(self, plot_type: str):
+        figsize, self.cmaps = HEATMAP_TEMPLATES[plot_type]
+        self.figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figure)
+        self.axes = list(self.figure.subplots(1, len(self.cmaps), squeeze=False)[0])
+        self.meshes = [None] * len(self.axes)
+        self.colorbars = [None] * len(self.axes)
+
+    def update(self, panels: List[Heatmap], dpi: float):
+        if len(panels) != len(self.axes):
+            raise ValueError(f"Expected {len(self.axes)} panels, got {len(panels)}")
+        self.figure.set_dpi(dpi)
+        for i, (ax, cmap, panel) in enumerate(zip(self.axes, self.cmaps, panels)):
+            values = np.asarray(panel.values, dtype=float)
+            if values.shape != (len(panel.x), len(panel.y)):
+                raise ValueError(f"Heatmap values have shape {values.shape}, expected {(len(panel.x), len(panel.y))}")
+            if self.meshes[i] is not None:
+                self.meshes[i].remove()
+            # Fit the limits to the new grid alone
+            ax.ignore_existing_data_limits = True
+            # Cells are centered on the grid points, which need not be evenly spaced
+            self.meshes[i] = ax.pcolormesh(panel.x, panel.y, values.T, shading="nearest", cmap=cmap)
+            if self.colorbars[i] is None:
+                self.colorbars[i] = self.figure.colorbar(self.meshes[i], ax=ax)
+            else:
+                self.colorbars[i].update_normal(self.meshes[i])
+            ax.set_xlabel(panel.xlabel, fontsize=12)
+            ax.set_ylabel(panel.ylabel, fontsize=12)
+            ax.set_title(panel.title, fontsize=14)
+        self.figure.tight_layout()
+
+class PlotRenderer:
+    """
+    Renders plots from cached templates, one per plot type. Rendering is serialized by a lock since
+    templates are shared, which also makes it safe to call from worker threads.
+    """
+
+    def __init__(self):
+        self._templates: Dict[str, PlotTemplate] = {}
+        self._lock = threading.Lock()
+
+    def render(self, plot_type: str, panels: List[Union[Panel, Heatmap]], fmt: str = "png",
+               dpi: Optional[float] = None) -> bytes:
+        """Image of a plot as bytes in `fmt`, one of FILE_FORMATS."""
+        if plot_type not in TEMPLATES and plot_type not in HEATMAP_TEMPLATES:
+            raise ValueError(f"Unknown plot type: {plot_type}. "
+                             f"Must be one of {list(TEMPLATES) + list(HEATMAP_TEMPLATES)}")
+        if fmt not in FILE_FORMATS:
+            raise ValueError(f"Unsupported image format: {fmt}. Must be one of {FILE_FORMATS}")
+        dpi = dpi or DEFAULT_DPI
+        if dpi <= 0:
+            raise ValueError(f"dpi must be positive, got {dpi}")
+        with self._lock:
+            template = self._templates.get(plot_type)
+            if template is None:
+                template_class = PlotTemplate if plot_type in TEMPLATES else HeatmapTemplate
+                template = self._templates[plot_type] = template_class(plot_type)
+            template.update(panels, dpi)
+            return template.render(fmt)
@@ -8,8 +8,45 @@ import netket.graph as nkgraph
 import netket.hilbert as nkh
 import netket.experimental as nkx
 import netket.operator as nko
-from netket.experimental.operator.fermion import destroy as c
-from netket.experimental.operator.fermion import create as cdag
+
+def _orbital(hilbert: Any, site: int, sz: Optional[int]) -> int:
+    """Position of the fermionic mode (site, sz) in the Hilbert space, as used by NetKet's `create`."""
+    return site if sz is None else hilbert._get_index(site, sz)
+
+def _hopping_terms(hilbert: Any, bonds: List[tuple], sz: Optional[int]) -> List[tuple]:
+    """Terms cdag_i c_j and cdag_j c_i of every bond (i, j), in the form of FermionOperator2nd."""
+    terms = []
+    for i, j in bonds:
+        a, b = _orbital(hilbert, i, sz), _orbital(hilbert, j, sz)
+        terms += [((a, 1), (b, 0)), ((b, 1), (a, 0))]
+    return terms
+
+def _number_terms(hilbert: Any, sites: range, sz: Optional[int]) -> List[tuple]:
+    """Terms cdag_i c_i of every site."""
+    return [((a, 1), (a, 0)) for a in (_orbital(hilbert, i, sz) for i in sites)]
+
+def _double_occupancy_terms(hilbert: Any, sites: range) -> List[tuple]:
+    """Terms n_i,up n_i,down of every site."""
+    terms = []
+    for i in sites:
+        up, down = _orbital(hilbert, i, 1), _orbital(hilbert, i, -1)
+        terms.append(((up, 1), (up, 0), (down, 1), (down, 0)))
+    return terms
+
+def _fermion_operator(hilbert: Any, weighted_terms: List[tuple]) -> Any:
+    """
+    Sum of weight * term over the (weight, terms) groups, built as a single FermionOperator2nd.
+
+    Adding up operators term by term creates and merges an intermediate operator at every step; passing
+    all terms at once avoids that. Returns 0 if there are no terms, like an empty sum of operators.
+    """
+    terms, weights = [], []
+    for weight, group in weighted_terms:
+        terms += group
+        weights += [weight] * len(group)
+    if not terms:
+        return 0
+    return nko.FermionOperator2nd(hilbert, terms=terms, weights=weights, dtype=np.result_type(float, *weights))
 
 class LatticeSchema(BaseModel):
     """
@@ -506,60 +543,42 @@ class HamiltonianSchema(BaseModel):
         if system_hilbert and system_hilbert.space_type == "fermion" and system_hilbert.spin == 0.5:
             is_spin_fermion = True
         
+        # Nearest-neighbour bonds of the open chain; single-species models use the spin-up component
+        # of spin-1/2 fermions
+        bonds = [(i, i + 1) for i in range(L - 1)]
+        sz = 1 if is_spin_fermion else None
+        
         if self.model_type == "ssh":
             t1 = self.parameters.get("t1", 1.0)
             t2 = self.parameters.get("t2", 0.2)
-            for i in range(L - 1):
-                t = t2 if i % 2 == 0 else t1
-                if is_spin_fermion:
-                    # For spin-1/2 fermions, use spin-up component (sz=1)
-                    H += -t * (cdag(hilbert, i, sz=1) * c(hilbert, i+1, sz=1) + 
-                              cdag(hilbert, i+1, sz=1) * c(hilbert, i, sz=1))
-                else:
-                    # For spinless fermions
-                    H += -t * (cdag(hilbert, i) * c(hilbert, i+1) + 
-                              cdag(hilbert, i+1) * c(hilbert, i))
+            # Bonds (0,1), (2,3), ... have t2 and the others t1
+            H = _fermion_operator(hilbert, [
+                (-t2, _hopping_terms(hilbert, bonds[0::2], sz)),
+                (-t1, _hopping_terms(hilbert, bonds[1::2], sz)),
+            ])
         
         elif self.model_type == "hubbard":
             t = self.parameters.get("t", 1.0)
             U = self.parameters.get("U", 4.0)
-            # Full spinful Hubbard model: sum hopping over both spins, and on-site U n_up n_down
-            for i in range(L - 1):
-                # Hopping for both spins
-                H += -t * sum(
-                    cdag(hilbert, i, sz) * c(hilbert, i+1, sz) + cdag(hilbert, i+1, sz) * c(hilbert, i, sz)
-                    for sz in [1, -1]
-                )
-            # On-site interaction U n_up n_down
-            for i in range(L):
-                H += U * cdag(hilbert, i, sz=1) * c(hilbert, i, sz=1) * cdag(hilbert, i, sz=-1) * c(hilbert, i, sz=-1)
+            # Full spinful Hubbard model: hopping of both spins, and on-site U n_up n_down
+            H = _fermion_operator(hilbert, [
+                (-t, _hopping_terms(hilbert, bonds, 1) + _hopping_terms(hilbert, bonds, -1)),
+                (U, _double_occupancy_terms(hilbert, range(L))),
+            ])
         
         elif self.model_type == "fermion_hopping":
             t = self.parameters.get("t", 1.0)
             B = self.parameters.get("B", 0.0)
-            for i in range(L - 1):
-                if is_spin_fermion:
-                    # For spin-1/2 fermions, use spin-up component (sz=1)
-                    H += -t * (cdag(hilbert, i, sz=1) * c(hilbert, i+1, sz=1) + 
-                              cdag(hilbert, i+1, sz=1) * c(hilbert, i, sz=1))
-                else:
-                    # For spinless fermions
-                    H += -t * (cdag(hilbert, i) * c(hilbert, i+1) + 
-                              cdag(hilbert, i+1) * c(hilbert, i))
-            if B != 0:
-                for i in range(L):
-                    if is_spin_fermion:
-                        # For spin-1/2 fermions, use spin-up component (sz=1)
-                        H += B * cdag(hilbert, i, sz=1) * c(hilbert, i, sz=1)
-                    else:
-                        # For spinless fermions
-                        H += B * cdag(hilbert, i) * c(hilbert, i)
+            H = _fermion_operator(hilbert, [
+                (-t, _hopping_terms(hilbert, bonds, sz)),
+                (B, _number_terms(hilbert, range(L), sz) if B != 0 else []),
+            ])
         
         elif self.model_type == "heisenberg":
             J = self.parameters.get("J", 1.0)
             # Heisenberg model for spins
             if system_hilbert and system_hilbert.space_type == "spin":
-                H = J * nko.Heisenberg(hilbert)
+                H = J * nko.Heisenberg(hilbert, graph)
             else:
                 raise ValueError("Heisenberg model requires spin Hilbert space")
         
@@ -571,7 +590,7 @@ class HamiltonianSchema(BaseModel):
             if system_hilbert and system_hilbert.space_type == "spin":
                 H = Jz * nko.Ising(hilbert, graph, h=hx)
                 if hz != 0:
-                    H += hz * nko.LocalOperator(hilbert, nko.PauliZ, 0)
+                    H += hz * nko.spin.sigmaz(hilbert, 0)
             else:
                 raise ValueError("Ising model requires spin Hilbert space")
         
@@ -583,9 +602,9 @@ class HamiltonianSchema(BaseModel):
             if system_hilbert and system_hilbert.space_type == "spin":
                 # This is a simplified Kitaev implementation
                 # In practice, you'd need to implement the specific Kitaev interactions
-                H = Jx * nko.LocalOperator(hilbert, nko.sigmax, 0) + \
-                    Jy * nko.LocalOperator(hilbert, nko.sigmay, 0) + \
-                    Jz * nko.LocalOperator(hilbert, nko.sigmaz, 0)
+                H = Jx * nko.spin.sigmax(hilbert, 0) + \
+                    Jy * nko.spin.sigmay(hilbert, 0) + \
+                    Jz * nko.spin.sigmaz(hilbert, 0)
             else:
                 raise ValueError("Kitaev model requires spin Hilbert space")
         
@@ -594,6 +613,68 @@ class HamiltonianSchema(BaseModel):
         
         return H
     
+    def build_parameter_terms(self, hilbert: Any, graph: Any, system_hilbert=None) -> List[tuple]:
+        """
+        Split the Hamiltonian into terms that do not depend on the parameter values.
+
+        Returns a list of (parameter names, operator) pairs such that the Hamiltonian equals the sum of
+        each operator times the product of its parameters. Every supported model is linear in each of its
+        parameters, so a sweep only needs to build these operators once.
+        """
+        L = graph.n_nodes
+        is_spin_fermion = bool(system_hilbert and system_hilbert.space_type == "fermion" and system_hilbert.spin == 0.5)
+        bonds = [(i, i + 1) for i in range(L - 1)]
+        
+        # Single-species models use the spin-up component of spin-1/2 fermions
+        sz = 1 if is_spin_fermion else None
+        
+        if self.model_type == "ssh":
+            # Bonds (0,1), (2,3), ... have t2 and the others t1
+            return [
+                (("t2",), _fermion_operator(hilbert, [(-1.0, _hopping_terms(hilbert, bonds[0::2], sz))])),
+                (("t1",), _fermion_operator(hilbert, [(-1.0, _hopping_terms(hilbert, bonds[1::2], sz))])),
+            ]
+        
+        elif self.model_type == "hubbard":
+            hopping = _hopping_terms(hilbert, bonds, 1) + _hopping_terms(hilbert, bonds, -1)
+            return [
+                (("t",), _fermion_operator(hilbert, [(-1.0, hopping)])),
+                (("U",), _fermion_operator(hilbert, [(1.0, _double_occupancy_terms(hilbert, range(L)))])),
+            ]
+        
+        elif self.model_type == "fermion_hopping":
+            return [
+                (("t",), _fermion_operator(hilbert, [(-1.0, _hopping_terms(hilbert, bonds, sz))])),
+                (("B",), _fermion_operator(hilbert, [(1.0, _number_terms(hilbert, range(L), sz))])),
+            ]
+        
+        elif self.model_type == "heisenberg":
+            if not (system_hilbert and system_hilbert.space_type == "spin"):
+                raise ValueError("Heisenberg model requires spin Hilbert space")
+            return [(("J",), nko.Heisenberg(hilbert, graph))]
+        
+        elif self.model_type == "ising":
+            if not (system_hilbert and system_hilbert.space_type == "spin"):
+                raise ValueError("Ising model requires spin Hilbert space")
+            # Jz * Ising(h=hx) = Jz * sum ZZ - Jz * hx * sum X, where Ising(h=1, J=0) = -sum X
+            return [
+                (("Jz",), nko.Ising(hilbert, graph, h=0.0)),
+                (("Jz", "hx"), nko.Ising(hilbert, graph, h=1.0, J=0.0)),
+                (("hz",), nko.spin.sigmaz(hilbert, 0)),
+            ]
+        
+        elif self.model_type == "kitaev":
+            if not (system_hilbert and system_hilbert.space_type == "spin"):
+                raise ValueError("Kitaev model requires spin Hilbert space")
+            return [
+                (("Jx",), nko.spin.sigmax(hilbert, 0)),
+                (("Jy",), nko.spin.sigmay(hilbert, 0)),
+                (("Jz",), nko.spin.sigmaz(hilbert, 0)),
+            ]
+        
+        else:
+            raise ValueError(f"Unsupported model type: {self.model_type}")
+    
     def get_parameters(self) -> Dict[str, float]:
         """Get current parameters as a dictionary."""
         return self.parameters.copy()
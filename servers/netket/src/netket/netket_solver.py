@@ -0,0 +1,269 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+import numpy as np
+import jax
+import jax.numpy as jnp
+from scipy.sparse.linalg import LinearOperator, eigsh
+from netket_sweep import DENSE_LIMIT, select_eigenpairs
+
+# Ways of diagonalizing the Hamiltonian; "auto" picks one from the estimated memory
+SOLVER_STRATEGIES = ["auto", "dense", "sparse", "matrix_free"]
+
+# Parts of the spectrum that can be extended past known eigenpairs, by shifting those out of the way
+DEFLATABLE = ["SA", "LA"]
+
+# States per batch of the matrix-free matrix-vector product
+DEFAULT_BATCH_SIZE = 2**14
+
+# Peak bytes per nonzero while NetKet builds a sparse matrix (padded connections, COO arrays, then the CSR
+# copy), as measured on 18-site spin chains
+SPARSE_BYTES_PER_NONZERO = 64
+
+def default_memory_limit_mb() -> float:
+    """Half of the physical memory, or 4 GB if it cannot be determined."""
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 2 / 1024**2
+    except (ValueError, OSError, AttributeError):
+        return 4096.0
+
+def resident_memory() -> Optional[int]:
+    """Resident memory (RSS) of this process in bytes, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+class PeakResidentMemory:
+    """
+    Highest resident memory of the process while a `with` block runs, sampled from a background thread.
+
+    Unlike tracing Python allocations, this sees the memory of JAX/XLA and ARPACK too, and does not slow
+    the block down. Short spikes between two samples are missed. `peak_mb` is None without /proc.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_mb: Optional[float] = None
+        self._peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        while True:
+            self._peak = max(self._peak, resident_memory() or 0)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        if resident_memory() is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._peak = max(self._peak, resident_memory() or 0)
+            self.peak_mb = self._peak / 1024**2
+        return False
+
+def lanczos_vectors(n_states: int, k: int) -> int:
+    """Number of Lanczos vectors `eigsh` keeps for k eigenpairs."""
+    return min(n_states, max(2 * k + 1, 20))
+
+def estimate_memory(strategy: str, n_states: int, max_conn_size: int, n_sites: int, k: int,
+                    batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Estimated peak memory in bytes of diagonalizing an operator with the given strategy.
+
+    The sparse estimate counts `max_conn_size` nonzeros per row, an upper bound since padded connections
+    and zero matrix elements are not stored.
+    """
+    vectors = lanczos_vectors(n_states, k) * n_states * 16
+    if strategy == "dense":
+        # The matrix and all of its eigenvectors
+        return 2 * n_states**2 * 8
+    if strategy == "sparse":
+        return n_states * max_conn_size * SPARSE_BYTES_PER_NONZERO + vectors
+    if strategy == "matrix_free":
+        # All basis states as int8, and the connected states and matrix elements of one batch
+        batch = min(batch_size, n_states) * max_conn_size * (n_sites + 16)
+        return n_states * n_sites + batch + vectors
+    raise ValueError(f"Unknown solver strategy: {strategy}. Must be one of {SOLVER_STRATEGIES}")
+
+def choose_strategy(n_states: int, max_conn_size: int, n_sites: int, k: int,
+                    memory_limit_mb: float, strategy: str = "auto") -> str:
+    """
+    Solver strategy for an operator: dense up to DENSE_LIMIT states, then a sparse matrix while its
+    estimated memory fits in `memory_limit_mb`, and matrix-free beyond. Explicit strategies are kept.
+    """
+    if strategy not in SOLVER_STRATEGIES:
+        raise ValueError(f"Unknown solver strategy: {strategy}. Must be one of {SOLVER_STRATEGIES}")
+    if strategy != "auto":
+        return strategy
+    if n_states <= DENSE_LIMIT:
+        return "dense"
+    if estimate_memory("sparse", n_states, max_conn_size, n_sites, k) <= memory_limit_mb * 1024**2:
+        return "sparse"
+    return "matrix_free"
+
+class MatrixFreeHamiltonian(LinearOperator):
+    """
+    NetKet operator as a LinearOperator, computing H @ x from the connected states of each basis state.
+
+    Nothing but the basis states is stored, so memory scales with the number of states rather than with
+    the nonzeros of H, at the price of recomputing the connections at every product. With `jit`, each
+    batch goes through the JAX version of the operator, compiled once for the batch size.
+    """
+
+    def __init__(self, operator: Any, hi: Any, batch_size: int = DEFAULT_BATCH_SIZE, jit: bool = True):
+        super().__init__(dtype=np.dtype(operator.dtype), shape=(hi.n_states, hi.n_states))
+        self.operator = operator
+        self.hi = hi
+        self.batch_size = min(batch_size, hi.n_states)
+        self.matvecs = 0
+        states = np.asarray(hi.all_states())
+        self.state_dtype = states.dtype
+        # Local states are small integers (2*sz for spins, occupations for fermions)
+        if np.array_equal(states, states.astype(np.int8)):
+            states = states.astype(np.int8)
+        self._jax_matvec = self._compile() if jit else None
+        self.batches = [self._batch(states[start:start + self.batch_size])
+                        for start in range(0, hi.n_states, self.batch_size)]
+
+    def _compile(self) -> Optional[Callable]:
+        try:
+            jax_operator = self.operator.to_jax_operator()
+        except (AttributeError, NotImplementedError, TypeError):
+            return None
+        hi, state_dtype = self.hi, self.state_dtype
+
+        @jax.jit
+        def batch_matvec(states, x):
+            connected, mels = jax_operator.get_conn_padded(states.astype(state_dtype))
+            return jnp.sum(mels * x[hi.states_to_numbers(connected)], axis=-1)
+
+        return batch_matvec
+
+    def _batch(self, states: np.ndarray) -> Any:
+        if self._jax_matvec is None:
+            return states
+        # Pad the last batch so that the compiled function is reused
+        padding = self.batch_size - len(states)
+        return jnp.asarray(np.concatenate([states, np.repeat(states[:1], padding, axis=0)]) if padding else states)
+
+    def _matvec(self, x: np.ndarray) -> np.ndarray:
+        self.matvecs += 1
+        x = np.asarray(x).ravel()
+        y = np.empty(self.shape[0], dtype=np.result_type(self.dtype, x.dtype))
+        if self._jax_matvec is not None:
+            # Move the vector to JAX once rather than for every batch
+            x_jax = jnp.asarray(x)
+        for i, states in enumerate(self.batches):
+            start = i * self.batch_size
+            stop = min(start + self.batch_size, self.shape[0])
+            if self._jax_matvec is not None:
+                y[start:stop] = np.asarray(self._jax_matvec(states, x_jax))[:stop - start]
+            else:
+                connected, mels = self.operator.get_conn_padded(states.astype(self.state_dtype))
+                y[start:stop] = np.sum(mels * x[np.asarray(self.hi.states_to_numbers(connected))], axis=-1)
+        return y
+
+    def _adjoint(self):
+        # Hamiltonians are Hermitian
+        return self
+
+    def max_abs_row_sum(self) -> float:
+        """Largest sum of the absolute matrix elements of a row, in one pass over the connections."""
+        bound = 0.0
+        for states in self.batches:
+            _, mels = self.operator.get_conn_padded(np.asarray(states).astype(self.state_dtype))
+            bound = max(bound, float(np.abs(mels).sum(axis=-1).max()))
+        return bound
+
+def spectral_bound(matrix: Any) -> float:
+    """Upper bound on the absolute eigenvalues of a sparse or matrix-free Hamiltonian (Gershgorin)."""
+    if isinstance(matrix, MatrixFreeHamiltonian):
+        return matrix.max_abs_row_sum()
+    # Without touching the matrix, which may be read-only; duplicate entries only loosen the bound
+    coo = matrix.tocoo(copy=False)
+    return float(np.bincount(coo.row, weights=np.abs(coo.data), minlength=matrix.shape[0]).max())
+
+def extend_eigenpairs(matrix: Any, known_vals: np.ndarray, known_vecs: np.ndarray, k: int,
+                      which: str) -> tuple:
+    """
+    The `k` lowest ("SA") or highest ("LA") eigenpairs, given the first `len(known_vals)` of them.
+
+    Only the missing eigenpairs are solved for: adding shift * V V^dagger, with V the known eigenvectors,
+    moves the known eigenvalues past the other end of the spectrum and leaves the other eigenpairs alone.
+    """
+    shift = 2 * spectral_bound(matrix) + 1.0
+    if which == "LA":
+        shift = -shift
+    V = np.asarray(known_vecs)
+
+    def matvec(x):
+        x = np.asarray(x).ravel()
+        return matrix @ x + shift * (V @ (V.conj().T @ x))
+
+    deflated = LinearOperator(matrix.shape, matvec=matvec, dtype=np.result_type(matrix.dtype, V.dtype))
+    new_vals, new_vecs = eigsh(deflated, k=k - len(known_vals), which=which)
+    return np.concatenate([known_vals, new_vals]), np.hstack([V, new_vecs])
+
+@dataclass
+class SpectrumSolution:
+    """Eigenpairs of a Hamiltonian and how they were computed."""
+    eigenvalues: np.ndarray
+    eigenvectors: np.ndarray
+    strategy: str
+    estimated_memory_mb: float
+    # Highest resident memory of the process while solving, None where it cannot be measured
+    peak_rss_mb: Optional[float]
+    # Number of eigenpairs that were already known and not solved for again
+    extended_from: int = 0
+
+    def report(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "estimated_memory_mb": round(float(self.estimated_memory_mb), 1),
+            "peak_rss_mb": None if self.peak_rss_mb is None else round(float(self.peak_rss_mb), 1),
+            "extended_from": self.extended_from,
+        }
+
+def solve_spectrum(operator: Any, hi: Any, sparse: Callable[[], Any], n_sites: int, k: int,
+                   which: str = "SA", strategy: str = "auto", memory_limit_mb: Optional[float] = None,
+                   known: Optional[tuple] = None) -> SpectrumSolution:
+    """
+    The `k` eigenpairs `which` asks for of a NetKet operator, sorted by energy, with the strategy of
+    `choose_strategy`.
+
+    `sparse` returns the sparse matrix of the operator, so that it can come from a cache. `known` holds
+    eigenvalues and eigenvectors found before for the same `which`; Lanczos strategies then only solve
+    for the missing ones. The dense strategy always solves the whole spectrum and picks what `which` asks
+    for. The peak memory is the highest resident memory of the whole process while solving.
+    """
+    memory_limit_mb = memory_limit_mb or default_memory_limit_mb()
+    n_states = hi.n_states
+    strategy = choose_strategy(n_states, operator.max_conn_size, n_sites, k, memory_limit_mb, strategy)
+    estimated = estimate_memory(strategy, n_states, operator.max_conn_size, n_sites, k) / 1024**2
+
+    extended_from = 0
+    with PeakResidentMemory() as memory:
+        if strategy == "dense":
+            eig_vals, eig_vecs = np.linalg.eigh(sparse().toarray())
+            chosen = select_eigenpairs(eig_vals, k, which)
+            eig_vals, eig_vecs = eig_vals[chosen], eig_vecs[:, chosen]
+        else:
+            matrix = sparse() if strategy == "sparse" else MatrixFreeHamiltonian(operator, hi)
+            if known is not None and which in DEFLATABLE and 0 < len(known[0]) < k:
+                extended_from = len(known[0])
+                eig_vals, eig_vecs = extend_eigenpairs(matrix, np.asarray(known[0]), known[1], k, which)
+            else:
+                eig_vals, eig_vecs = eigsh(matrix, k=k, which=which)
+            sort_idx = np.argsort(eig_vals)
+            eig_vals, eig_vecs = eig_vals[sort_idx], eig_vecs[:, sort_idx]
+    return SpectrumSolution(eig_vals, eig_vecs, strategy, estimated, memory.peak_mb, extended_from)
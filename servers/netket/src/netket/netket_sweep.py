@@ -0,0 +1,316 @@
+import itertools
+import json
+import multiprocessing
+import numbers
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+import numpy as np
+from scipy.sparse.linalg import LinearOperator, eigsh
+
+if TYPE_CHECKING:
+    # Sweep workers import this module, and should not pay for importing NetKet
+    from netket_schemas import HilbertSpaceSchema, HamiltonianSchema
+
+# Matrices up to this size are diagonalized densely
+DENSE_LIMIT = 1000
+
+# Tolerance for treating two eigenvalues as degenerate
+DEGENERACY_TOL = 1e-6
+
+# Points of an unfinished sweep, appended as they are computed, in the system directory
+SWEEP_CHECKPOINT = "sweep_checkpoint.jsonl"
+
+# Refinement does not split intervals narrower than this fraction of the swept range
+MIN_REFINE_WIDTH = 1e-6
+
+# Largest number of points of a grid sweep
+MAX_GRID_POINTS = 10000
+
+class AffineHamiltonian:
+    """
+    Sparse Hamiltonian as a linear combination of parameter-independent terms.
+
+    The sparse matrix of every term of `HamiltonianSchema.build_parameter_terms` is built once, and the
+    matrix at any parameter values is formed as the sum of the terms weighted by the product of their
+    parameters, without building NetKet operators again.
+    """
+
+    def __init__(self, terms: List[tuple]):
+        # (parameter names, sparse matrix); terms that vanish on this lattice are plain numbers
+        self.terms = [(names, operator if _is_sparse(operator) else operator.to_sparse())
+                      for names, operator in terms if not isinstance(operator, numbers.Number)]
+        if not self.terms:
+            raise ValueError("Hamiltonian has no terms on this lattice")
+
+    @classmethod
+    def from_schema(cls, hamiltonian: "HamiltonianSchema", hi: Any, graph: Any,
+                    system_hilbert: "HilbertSpaceSchema") -> "AffineHamiltonian":
+        return cls(hamiltonian.build_parameter_terms(hi, graph, system_hilbert=system_hilbert))
+
+    @property
+    def parameter_names(self) -> List[str]:
+        return sorted({name for names, _ in self.terms for name in names})
+
+    @property
+    def n_states(self) -> int:
+        return self.terms[0][1].shape[0]
+
+    def matrix(self, parameters: Dict[str, float]) -> Any:
+        """Sparse matrix of the Hamiltonian at the given parameter values."""
+        missing = [name for name in self.parameter_names if name not in parameters]
+        if missing:
+            raise ValueError(f"Missing values for parameters: {missing}")
+        result = None
+        for names, term in self.terms:
+            coefficient = 1.0
+            for name in names:
+                coefficient *= parameters[name]
+            result = coefficient * term if result is None else result + coefficient * term
+        return result.tocsr()
+
+def _is_sparse(operator: Any) -> bool:
+    return hasattr(operator, "tocsr")
+
+def select_eigenpairs(eig_vals: np.ndarray, k: int, which: str) -> np.ndarray:
+    """Indices of the `k` eigenvalues `which` asks for among `eig_vals`, in ascending order of energy."""
+    eig_vals = np.asarray(eig_vals)
+    if which == "SA":
+        chosen = np.argsort(eig_vals)[:k]
+    elif which == "LA":
+        chosen = np.argsort(eig_vals)[len(eig_vals) - k:]
+    elif which == "SM":
+        chosen = np.argsort(np.abs(eig_vals))[:k]
+    else:
+        chosen = np.argsort(np.abs(eig_vals))[len(eig_vals) - k:]
+    return chosen[np.argsort(eig_vals[chosen])]
+
+def diagonalize(matrix: Any, k: int, which: str = "SA", v0: Optional[np.ndarray] = None) -> tuple:
+    """
+    The `k` eigenpairs `which` asks for of a sparse Hermitian matrix, sorted by energy.
+
+    Small matrices are diagonalized densely and return all eigenpairs up to `k`. Larger ones go through
+    `eigsh`, starting from `v0` if given. Returns the eigenvalues, the eigenvectors and the number of
+    matrix-vector products used (0 for the dense path).
+    """
+    n_states = matrix.shape[0]
+    if n_states <= DENSE_LIMIT:
+        eig_vals, eig_vecs = np.linalg.eigh(matrix.toarray())
+        chosen = select_eigenpairs(eig_vals, k, which)
+        return eig_vals[chosen], eig_vecs[:, chosen], 0
+
+    matvecs = 0
+    def matvec(x):
+        nonlocal matvecs
+        matvecs += 1
+        return matrix @ x
+
+    operator = LinearOperator(matrix.shape, matvec=matvec, dtype=matrix.dtype)
+    eig_vals, eig_vecs = eigsh(operator, k=k, which=which, v0=v0)
+    sort_idx = np.argsort(eig_vals)
+    return eig_vals[sort_idx], eig_vecs[:, sort_idx], matvecs
+
+def excitation_gap(eigvals: np.ndarray) -> float:
+    """Gap between the ground state and the first level that is not degenerate with it."""
+    if len(eigvals) < 2:
+        return 0.0
+    E0 = eigvals[0]
+    for e_val in eigvals[1:]:
+        if not np.isclose(e_val, E0, atol=DEGENERACY_TOL):
+            return float(e_val - E0)
+    # All computed eigenvalues are degenerate
+    return 0.0
+
+@dataclass
+class SweepPoint:
+    """Spectrum at one point of a sweep."""
+    parameters: Dict[str, float]
+    eigenvalues: np.ndarray
+    matvecs: int
+
+    @property
+    def ground_state_energy(self) -> float:
+        return float(self.eigenvalues[0])
+
+    @property
+    def energy_gap(self) -> float:
+        return excitation_gap(self.eigenvalues)
+
+def point_key(parameters: Dict[str, float]) -> str:
+    return json.dumps({name: float(value) for name, value in parameters.items()}, sort_keys=True)
+
+class SweepCheckpoint:
+    """
+    Append-only log of the points computed by the sweeps of one system, so that an interrupted sweep
+    resumes with the points it has not computed yet.
+
+    Records hold all parameter values of their point and are tagged with `key`, which stands for the rest
+    of the system (lattice, Hilbert space, model and number of eigenvalues); records of other keys are
+    ignored.
+    """
+
+    def __init__(self, path: Path, key: str):
+        self.path = Path(path)
+        self.key = key
+        self.points: Dict[str, SweepPoint] = {}
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Line cut short by a crash while appending
+                        continue
+                    if record.get("key") == key:
+                        point = SweepPoint(parameters=record["parameters"],
+                                           eigenvalues=np.asarray(record["eigenvalues"]), matvecs=record["matvecs"])
+                        self.points[point_key(point.parameters)] = point
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def get(self, parameters: Dict[str, float]) -> Optional[SweepPoint]:
+        return self.points.get(point_key(parameters))
+
+    def add(self, point: SweepPoint):
+        record = {"key": self.key, "parameters": point.parameters,
+                  "eigenvalues": np.asarray(point.eigenvalues).tolist(), "matvecs": point.matvecs}
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+        self.points[point_key(point.parameters)] = point
+
+    def remove(self):
+        self.path.unlink(missing_ok=True)
+        self.points.clear()
+
+def refinement_points(values: List[float], gaps: List[float], n: int) -> List[float]:
+    """
+    Midpoints of the (at most) `n` intervals between consecutive parameter values across which the gap
+    changes most. Intervals where the gap does not change, or narrower than MIN_REFINE_WIDTH of the
+    range, are not split.
+    """
+    order = np.argsort(values)
+    x, gap = np.asarray(values, dtype=float)[order], np.asarray(gaps, dtype=float)[order]
+    change, width = np.abs(np.diff(gap)), np.diff(x)
+    min_width = MIN_REFINE_WIDTH * (x[-1] - x[0])
+    intervals = [i for i in np.argsort(-change, kind="stable") if change[i] > 0 and width[i] > min_width]
+    return [float((x[i] + x[i + 1]) / 2) for i in intervals[:n]]
+
+def grid_points(base_parameters: Dict[str, float], axes: Dict[str, List[float]]) -> List[Dict[str, float]]:
+    """
+    Parameters of every point of the grid spanned by `axes`, with the other parameters from
+    `base_parameters`. Points are in row-major order, so consecutive points only differ in the last
+    parameter, except between rows.
+    """
+    names = list(axes)
+    return [{**base_parameters, **dict(zip(names, (float(v) for v in values)))}
+            for values in itertools.product(*(axes[name] for name in names))]
+
+def grid_arrays(points: List[SweepPoint], shape: tuple) -> Dict[str, np.ndarray]:
+    """
+    Eigenvalues, ground state energies and gaps of the points of a grid (in the order of `grid_points`)
+    as arrays of the grid's shape, the eigenvalues with an extra last axis.
+    """
+    return {
+        "eigenvalues": np.stack([np.asarray(point.eigenvalues, dtype=float) for point in points]).reshape(*shape, -1),
+        "ground_state_energies": np.array([point.ground_state_energy for point in points]).reshape(shape),
+        "energy_gaps": np.array([point.energy_gap for point in points]).reshape(shape),
+    }
+
+# Worker pools by size, kept between sweeps since spawning a worker re-imports the server
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    pool = _pools.get(workers)
+    if pool is None:
+        # Spawned workers do not inherit the threads of JAX or numba from the server process
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _pools[workers] = pool
+    return pool
+
+def shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+
+def _solve_chunk(affine_h: AffineHamiltonian, points: List[Dict[str, float]], k: int, warm_start: bool,
+                 on_point: Optional[Callable[[SweepPoint], None]] = None) -> List[SweepPoint]:
+    results = []
+    v0 = None
+    for parameters in points:
+        eig_vals, eig_vecs, matvecs = diagonalize(affine_h.matrix(parameters), k, v0=v0)
+        if len(eig_vals) == 0:
+            raise RuntimeError(f"No eigenvalues computed for {parameters}")
+        if warm_start:
+            # Neighbouring points have similar low-lying states. Starting from their sum rather than the
+            # ground state alone keeps every wanted eigenvector in the Krylov space.
+            v0 = eig_vecs.sum(axis=1)
+        results.append(SweepPoint(parameters=parameters, eigenvalues=eig_vals, matvecs=matvecs))
+        if on_point is not None:
+            on_point(results[-1])
+    return results
+
+class SweepExecutor:
+    """
+    Diagonalizes the Hamiltonian at many parameter points.
+
+    The points are split into contiguous chunks: one per worker process by default, or of at most
+    `chunk_size` points, which the workers take up as they become free. Smaller chunks balance the load
+    and lose less work if a worker dies. With `warm_start`, each `eigsh` call starts from the
+    eigenvectors of the previous point of its chunk, which saves iterations when the points are ordered
+    along a path in parameter space. `on_point` is called in this process with every point once it is
+    solved (with workers, once its chunk is), e.g. to checkpoint it.
+    """
+
+    def __init__(self, affine_h: AffineHamiltonian, k: int, workers: int = 1, warm_start: bool = False,
+                 chunk_size: Optional[int] = None):
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        self.affine_h = affine_h
+        self.k = k
+        self.workers = workers
+        self.warm_start = warm_start
+        self.chunk_size = chunk_size
+
+    def chunks(self, points: List[Dict[str, float]]) -> List[List[Dict[str, float]]]:
+        if self.chunk_size is None:
+            n_chunks = min(self.workers, len(points))
+            return [list(chunk) for chunk in np.array_split(np.array(points, dtype=object), n_chunks)]
+        return [points[start:start + self.chunk_size] for start in range(0, len(points), self.chunk_size)]
+
+    def run(self, points: List[Dict[str, float]],
+            on_point: Optional[Callable[[SweepPoint], None]] = None) -> List[SweepPoint]:
+        if not points:
+            return []
+        chunks = self.chunks(points)
+        if self.workers == 1 or len(chunks) == 1:
+            return [point for chunk in chunks
+                    for point in _solve_chunk(self.affine_h, chunk, self.k, self.warm_start, on_point)]
+
+        pool = _get_pool(self.workers)
+        futures = {pool.submit(_solve_chunk, self.affine_h, chunk, self.k, self.warm_start): i
+                   for i, chunk in enumerate(chunks)}
+        results: Dict[int, List[SweepPoint]] = {}
+        error = None
+        # Keep the chunks that succeed even if another one fails
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory); start a fresh pool next time
+                _pools.pop(self.workers, None)
+                error = error or RuntimeError("A sweep worker process died. Try fewer workers or a smaller system.")
+                continue
+            except Exception as e:
+                error = error or e
+                continue
+            if on_point is not None:
+                for point in results[futures[future]]:
+                    on_point(point)
+        if error is not None:
+            raise error
+        return [point for i in range(len(chunks)) for point in results[i]]
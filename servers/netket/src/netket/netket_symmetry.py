@@ -0,0 +1,233 @@
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+import scipy.sparse as sp
+import netket.hilbert as nkh
+import netket.experimental as nkx
+from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
+
+# Conserved quantities that can split the Hamiltonian into blocks
+SECTOR_KINDS = ["total_sz", "momentum"]
+
+# Tolerance for checking that the Hamiltonian commutes with a translation
+SYMMETRY_TOL = 1e-10
+
+def conserves_total_sz(hilbert: HilbertSpaceSchema, hamiltonian: HamiltonianSchema) -> bool:
+    """Whether the model conserves the total Sz of its Hilbert space."""
+    if hilbert.space_type == "spin":
+        if hamiltonian.model_type == "heisenberg":
+            return True
+        if hamiltonian.model_type == "ising":
+            # The transverse field flips spins
+            return hamiltonian.parameters.get("hx", 0.0) == 0
+        return False
+    if hilbert.space_type == "fermion":
+        # Every fermion model here hops and interacts without flipping spins
+        return hilbert.spin == 0.5
+    return False
+
+def total_sz_values(hilbert: HilbertSpaceSchema, n_sites: int) -> List[float]:
+    """All total Sz values of the Hilbert space."""
+    if hilbert.space_type == "spin":
+        max_sz = n_sites * hilbert.spin
+        return [float(sz) for sz in np.arange(-max_sz, max_sz + 0.5, 1.0)]
+    if hilbert.space_type == "fermion" and hilbert.spin == 0.5:
+        n = hilbert.n_particles
+        return [float(n_up - (n - n_up)) / 2 for n_up in range(max(0, n - n_sites), min(n, n_sites) + 1)]
+    raise ValueError(f"Total Sz sectors are not supported for {hilbert.text}")
+
+def sector_hilbert(hilbert: HilbertSpaceSchema, graph: Any, total_sz: Optional[float] = None) -> Any:
+    """NetKet Hilbert space restricted to a total Sz sector, or the full space if `total_sz` is None."""
+    if total_sz is None:
+        return hilbert.to_netket_hilbert(graph)
+    if hilbert.space_type == "spin":
+        return nkh.Spin(s=hilbert.spin, N=graph.n_nodes, total_sz=total_sz)
+    if hilbert.space_type == "fermion" and hilbert.spin == 0.5:
+        n_up = int(round(hilbert.n_particles / 2 + total_sz))
+        n_down = hilbert.n_particles - n_up
+        if n_up < 0 or n_down < 0:
+            raise ValueError(f"No states with total Sz={total_sz} for {hilbert.n_particles} fermions")
+        return nkx.hilbert.SpinOrbitalFermions(graph.n_nodes, s=0.5, n_fermions_per_spin=(n_up, n_down))
+    raise ValueError(f"Total Sz sectors are not supported for {hilbert.text}")
+
+def basis_states(hi: Any, hilbert: HilbertSpaceSchema, total_sz: Optional[float] = None,
+                 batch_size: int = 2**20) -> np.ndarray:
+    """
+    Basis states of the sector Hilbert space `hi`.
+
+    Spin sectors are enumerated directly: NetKet's `all_states()` checks the constraint through JAX,
+    which takes tens of seconds from about 20 sites on.
+    """
+    if hilbert.space_type != "spin" or total_sz is None:
+        return np.asarray(hi.all_states())
+    local_states = np.asarray(hi.local_states)
+    n_sites = hi.size
+    # NetKet stores spins as 2*sz
+    target = int(round(2 * total_sz))
+    powers = len(local_states) ** np.arange(n_sites, dtype=np.int64)[::-1]
+    sectors = []
+    for start in range(0, len(local_states) ** n_sites, batch_size):
+        numbers = np.arange(start, min(start + batch_size, len(local_states) ** n_sites), dtype=np.int64)
+        states = local_states[(numbers[:, None] // powers) % len(local_states)]
+        sectors.append(states[states.sum(axis=1) == target])
+    return np.concatenate(sectors)
+
+class _StateIndex:
+    """Position of basis states in `states`, looked up by their integer encoding."""
+
+    def __init__(self, states: np.ndarray, local_states: np.ndarray):
+        self.local_states = np.asarray(local_states)
+        self.base = len(self.local_states) ** np.arange(states.shape[1], dtype=np.int64)[::-1]
+        self.keys = self.encode(states)
+        self.order = np.argsort(self.keys)
+
+    def encode(self, states: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.local_states, states) @ self.base
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Basis index of each encoded state, or -1 for states outside the basis."""
+        position = np.searchsorted(self.keys, keys, sorter=self.order)
+        index = self.order[np.minimum(position, len(self.keys) - 1)]
+        return np.where(self.keys[index] == keys, index, -1)
+
+def translation_permutation(states: np.ndarray, local_states: np.ndarray) -> np.ndarray:
+    """Index of the translated basis state (every site shifted by one along the chain) for each basis state."""
+    index = _StateIndex(states, local_states)
+    return index.lookup(index.encode(np.roll(states, 1, axis=1)))
+
+def sector_sparse(operator: Any, states: np.ndarray, local_states: np.ndarray, batch_size: int = 2**16) -> Any:
+    """
+    Sparse matrix of `operator` in the basis `states` of a sector.
+
+    Equivalent to `operator.to_sparse()` on the constrained Hilbert space, which is much slower since it
+    looks every connected state up through JAX. Raises ValueError if the operator leaves the sector,
+    i.e. does not conserve the quantity that defines it.
+    """
+    index = _StateIndex(states, local_states)
+    rows, cols, values = [], [], []
+    for start in range(0, len(states), batch_size):
+        batch = states[start:start + batch_size]
+        connected, mels = operator.get_conn_padded(batch)
+        connected, mels = np.asarray(connected), np.asarray(mels)
+        row = np.broadcast_to(np.arange(start, start + len(batch))[:, None], mels.shape)
+        nonzero = mels != 0
+        col = index.lookup(index.encode(connected[nonzero]))
+        if np.any(col < 0):
+            raise ValueError("The Hamiltonian connects states outside the symmetry sector")
+        rows.append(row[nonzero])
+        cols.append(col)
+        values.append(mels[nonzero])
+    n = len(states)
+    return sp.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+
+def is_translation_invariant(matrix: Any, permutation: np.ndarray) -> bool:
+    """Whether the matrix commutes with the basis permutation of a translation."""
+    n = len(permutation)
+    T = sp.csr_matrix((np.ones(n), (permutation, np.arange(n))), shape=(n, n))
+    difference = (T @ matrix - matrix @ T).tocsr()
+    difference.eliminate_zeros()
+    return difference.nnz == 0 or np.max(np.abs(difference.data)) < SYMMETRY_TOL
+
+def translation_orbits(permutation: np.ndarray, length: int) -> tuple:
+    """
+    Orbits of the basis states under translation along a chain of `length` sites.
+
+    Returns an array whose entry [j, i] is the index of T^j |i>, and the indices of the orbit
+    representatives (the smallest index of each orbit).
+    """
+    n = len(permutation)
+    orbits = np.empty((length, n), dtype=np.int64)
+    orbits[0] = np.arange(n)
+    for j in range(1, length):
+        orbits[j] = permutation[orbits[j - 1]]
+    representatives = np.flatnonzero(orbits.min(axis=0) == np.arange(n))
+    return orbits, representatives
+
+def momentum_projector(orbits: np.ndarray, representatives: np.ndarray, momentum: int) -> Any:
+    """
+    Sparse isometry from the momentum sector `momentum` (in units of 2*pi/L) into the basis.
+
+    Each column is the normalized Bloch state sum_j exp(-2*pi*i*momentum*j/L) T^j |r> of one orbit
+    representative r. Orbits whose period is incompatible with the momentum have no state in the sector.
+    """
+    length, n = orbits.shape
+    # Bloch states; states repeated within an orbit add up, and incompatible orbits cancel out
+    phases = np.exp(-2j * np.pi * momentum * np.arange(length) / length)
+    rows = orbits[:, representatives].ravel()
+    cols = np.tile(np.arange(len(representatives)), length)
+    values = np.repeat(phases, len(representatives))
+    P = sp.csc_matrix((values, (rows, cols)), shape=(n, len(representatives)))
+    P.sum_duplicates()
+
+    norms = np.sqrt(np.asarray(abs(P).power(2).sum(axis=0))).ravel()
+    keep = np.flatnonzero(norms > 1e-8)
+    return (P[:, keep] @ sp.diags(1.0 / norms[keep])).tocsr()
+
+def parse_sectors(sectors: Dict[str, Union[str, float, List[float]]], lattice: LatticeSchema,
+                  hilbert: HilbertSpaceSchema, hamiltonian: HamiltonianSchema) -> List[Dict[str, Any]]:
+    """
+    Expand a sector request such as {"total_sz": [0], "momentum": "all"} into the list of sectors to
+    diagonalize, after checking that the model has the requested symmetries.
+    """
+    unknown = [kind for kind in sectors if kind not in SECTOR_KINDS]
+    if unknown:
+        raise ValueError(f"Unknown sector kinds: {unknown}. Supported: {SECTOR_KINDS}")
+    if not sectors:
+        raise ValueError("sectors must name at least one conserved quantity")
+
+    n_sites = int(np.prod(lattice.extent))
+    sz_values = [None]
+    if "total_sz" in sectors:
+        if not conserves_total_sz(hilbert, hamiltonian):
+            raise ValueError(f"The {hamiltonian.model_type} model on {hilbert.text} does not conserve total Sz")
+        available = total_sz_values(hilbert, n_sites)
+        sz_values = available if sectors["total_sz"] == "all" else [float(sz) for sz in _as_list(sectors["total_sz"])]
+        invalid = [sz for sz in sz_values if sz not in available]
+        if invalid:
+            raise ValueError(f"Invalid total_sz values {invalid}. Available: {available}")
+
+    momenta = [None]
+    if "momentum" in sectors:
+        if lattice.lattice_type != "chain" or hilbert.space_type != "spin":
+            raise ValueError("Momentum sectors are only supported for spin chains")
+        momenta = list(range(n_sites)) if sectors["momentum"] == "all" else [int(k) % n_sites for k in _as_list(sectors["momentum"])]
+
+    return [{"total_sz": sz, "momentum": k} for sz in sz_values for k in momenta]
+
+def _as_list(value: Union[float, List[float]]) -> List[float]:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+def sector_matrices(lattice: LatticeSchema, hilbert: HilbertSpaceSchema, hamiltonian: HamiltonianSchema,
+                    sectors: List[Dict[str, Any]], max_states: float):
+    """
+    Yield (sector, sparse block) for each sector of `parse_sectors`.
+
+    The Hamiltonian is built directly on each total Sz sector, so the full Hilbert space is never
+    materialized. Momentum blocks are projected out of their Sz sector (or the full space), whose matrix is
+    built first: `max_states` applies to that space, and momentum sectors do not raise it.
+    """
+    graph = lattice.to_netket_graph()
+    by_sz: Dict[Optional[float], List[Dict[str, Any]]] = {}
+    for sector in sectors:
+        by_sz.setdefault(sector["total_sz"], []).append(sector)
+
+    for total_sz, sz_sectors in by_sz.items():
+        hi = sector_hilbert(hilbert, graph, total_sz)
+        if hi.n_states > max_states:
+            advice = ("adding total_sz sectors" if total_sz is None and conserves_total_sz(hilbert, hamiltonian)
+                      else "reducing system size")
+            raise ValueError(f"Sector total_sz={total_sz} too large: {hi.n_states} states. Momentum sectors are "
+                             f"projected out of this space and do not lower its size; consider {advice}.")
+        operator = hamiltonian.build_netket_hamiltonian(hi, graph, system_hilbert=hilbert)
+        states = basis_states(hi, hilbert, total_sz)
+        matrix = operator.to_sparse() if total_sz is None else sector_sparse(operator, states, hi.local_states)
+        if sz_sectors[0]["momentum"] is None:
+            yield sz_sectors[0], matrix
+            continue
+
+        permutation = translation_permutation(states, hi.local_states)
+        if not is_translation_invariant(matrix, permutation):
+            raise ValueError(f"The {hamiltonian.model_type} Hamiltonian is not translation invariant on this lattice")
+        orbits, representatives = translation_orbits(permutation, graph.n_nodes)
+        for sector in sz_sectors:
+            P = momentum_projector(orbits, representatives, sector["momentum"])
+            yield sector, (P.conj().T @ matrix @ P).tocsr()
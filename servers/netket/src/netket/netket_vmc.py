@@ -0,0 +1,174 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import netket as nk
+from flax import serialization
+from netket_jsons import atomic_write
+
+# Variational wave functions
+VMC_MODELS = ["rbm", "jastrow"]
+
+# Monte Carlo samplers; "auto" moves fermions by hopping and flips spins one at a time
+VMC_SAMPLERS = ["auto", "local", "exchange", "hamiltonian", "fermion_hop", "exact"]
+
+# Parameters, iteration and convergence curves of the last VMC run, in the system directory
+VMC_CHECKPOINT = "vmc_checkpoint.msgpack"
+
+@dataclass
+class VMCSettings:
+    """Settings of a VMC run. Only the model ones must match for a checkpoint to be resumed."""
+    model: str = "rbm"
+    alpha: int = 1
+    sampler: str = "auto"
+    n_samples: int = 1008
+    n_chains: int = 16
+    n_iter: int = 300
+    learning_rate: float = 0.05
+    diag_shift: float = 0.1
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.model not in VMC_MODELS:
+            raise ValueError(f"Unknown model: {self.model}. Must be one of {VMC_MODELS}")
+        if self.sampler not in VMC_SAMPLERS:
+            raise ValueError(f"Unknown sampler: {self.sampler}. Must be one of {VMC_SAMPLERS}")
+        for name in ("alpha", "n_samples", "n_chains", "n_iter"):
+            if getattr(self, name) <= 0:
+                raise ValueError(f"{name} must be positive, got {getattr(self, name)}")
+        if self.learning_rate <= 0:
+            raise ValueError(f"learning_rate must be positive, got {self.learning_rate}")
+
+    def model_key(self, spec: str) -> str:
+        """Identifies the variational parameters: the system specification and the model."""
+        return f"{spec}|{self.model}|{self.alpha}"
+
+@dataclass
+class VMCCurves:
+    """Energy statistics at every iteration."""
+    iteration: List[int] = field(default_factory=list)
+    energy: List[float] = field(default_factory=list)
+    energy_error: List[float] = field(default_factory=list)
+    variance: List[float] = field(default_factory=list)
+
+    def append(self, iteration: int, stats: Any):
+        self.iteration.append(iteration)
+        self.energy.append(float(np.real(stats.mean)))
+        self.energy_error.append(float(stats.error_of_mean))
+        self.variance.append(float(stats.variance))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {name: np.asarray(values) for name, values in vars(self).items()}
+
+@dataclass
+class VMCResult:
+    """Outcome of a VMC run."""
+    energy: float
+    energy_error: float
+    variance: float
+    iterations: int
+    resumed_from: int
+    n_parameters: int
+    acceptance: Optional[float]
+    curves: VMCCurves
+
+def build_sampler(kind: str, hi: Any, graph: Any, hamiltonian: Any, n_chains: int) -> Any:
+    """NetKet sampler of the given kind on the Hilbert space `hi`."""
+    fermions = isinstance(hi, nk.experimental.hilbert.SpinOrbitalFermions)
+    if kind == "auto":
+        kind = "fermion_hop" if fermions else "local"
+    if kind == "exact":
+        return nk.sampler.ExactSampler(hi)
+    if kind == "fermion_hop":
+        if not fermions:
+            raise ValueError("The fermion_hop sampler needs a fermionic Hilbert space")
+        return nk.sampler.MetropolisFermionHop(hi, graph=graph, n_chains=n_chains)
+    if fermions:
+        # Spin flips and exchanges would not conserve the number of fermions
+        raise ValueError(f"The {kind} sampler does not conserve the particle number; use fermion_hop")
+    if kind == "local":
+        return nk.sampler.MetropolisLocal(hi, n_chains=n_chains)
+    if kind == "exchange":
+        return nk.sampler.MetropolisExchange(hi, graph=graph, n_chains=n_chains)
+    return nk.sampler.MetropolisHamiltonian(hi, hamiltonian, n_chains=n_chains)
+
+def build_model(kind: str, alpha: int, param_dtype: Any) -> Any:
+    if kind == "rbm":
+        return nk.models.RBM(alpha=alpha, param_dtype=param_dtype)
+    return nk.models.Jastrow(param_dtype=param_dtype)
+
+def load_checkpoint(path: Path, key: str) -> Optional[Dict[str, Any]]:
+    """Checkpoint at `path` if it was written for the same system and model, else None."""
+    if not path.exists():
+        return None
+    with open(path, 'rb') as f:
+        checkpoint = serialization.msgpack_restore(f.read())
+    return checkpoint if checkpoint.get("key") == key else None
+
+def save_checkpoint(path: Path, key: str, variables: Any, curves: VMCCurves):
+    checkpoint = {
+        "key": key,
+        "iteration": len(curves.iteration),
+        "variables": serialization.to_state_dict(variables),
+        "curves": curves.to_arrays(),
+    }
+    atomic_write(path, lambda f: f.write(serialization.msgpack_serialize(checkpoint)), mode='wb')
+
+def run_vmc(hamiltonian: Any, hi: Any, graph: Any, settings: VMCSettings, spec: str,
+            checkpoint_path: Optional[Path] = None, checkpoint_every: int = 50, resume: bool = True,
+            progress: Optional[Callable[[int, int, float, float, float], None]] = None) -> VMCResult:
+    """
+    Optimize a variational wave function for the ground state of `hamiltonian` with stochastic
+    reconfiguration, up to `settings.n_iter` iterations in total.
+
+    With `resume`, a checkpoint of the same system (`spec`) and model continues from its iteration and
+    keeps its curves. Checkpoints are written every `checkpoint_every` iterations and at the end.
+    `progress(iteration, n_iter, energy, error, variance)` is called after every iteration.
+    """
+    complex_params = np.issubdtype(np.dtype(hamiltonian.dtype), np.complexfloating)
+    model = build_model(settings.model, settings.alpha, complex if complex_params else float)
+    sampler = build_sampler(settings.sampler, hi, graph, hamiltonian, settings.n_chains)
+    vstate = nk.vqs.MCState(sampler, model, n_samples=settings.n_samples, seed=settings.seed,
+                            sampler_seed=settings.seed)
+
+    key = settings.model_key(spec)
+    curves = VMCCurves()
+    checkpoint = load_checkpoint(checkpoint_path, key) if checkpoint_path is not None and resume else None
+    if checkpoint is not None:
+        vstate.variables = serialization.from_state_dict(vstate.variables, checkpoint["variables"])
+        curves = VMCCurves(**{name: np.asarray(values).tolist() for name, values in checkpoint["curves"].items()})
+    resumed_from = len(curves.iteration)
+
+    # Complex RBM and Jastrow amplitudes are holomorphic in their parameters
+    preconditioner = nk.optimizer.SR(diag_shift=settings.diag_shift, holomorphic=True if complex_params else None)
+    driver = nk.driver.VMC(hamiltonian, nk.optimizer.Sgd(settings.learning_rate), variational_state=vstate,
+                           preconditioner=preconditioner)
+
+    def callback(step, log_data, _driver):
+        iteration = resumed_from + step + 1
+        curves.append(iteration, log_data["Energy"])
+        if progress is not None:
+            progress(iteration, settings.n_iter, curves.energy[-1], curves.energy_error[-1], curves.variance[-1])
+        if checkpoint_path is not None and iteration % checkpoint_every == 0:
+            save_checkpoint(checkpoint_path, key, vstate.variables, curves)
+        return True
+
+    remaining = settings.n_iter - resumed_from
+    if remaining > 0:
+        driver.run(remaining, out=None, callback=callback, show_progress=False)
+        if checkpoint_path is not None:
+            save_checkpoint(checkpoint_path, key, vstate.variables, curves)
+
+    # Energy of the final state, on fresh samples
+    stats = vstate.expect(hamiltonian)
+    acceptance = getattr(vstate.sampler_state, "acceptance", None)
+    return VMCResult(
+        energy=float(np.real(stats.mean)),
+        energy_error=float(stats.error_of_mean),
+        variance=float(stats.variance),
+        iterations=len(curves.iteration),
+        resumed_from=resumed_from,
+        n_parameters=int(vstate.n_parameters),
+        acceptance=float(acceptance) if acceptance is not None else None,
+        curves=curves,
+    )
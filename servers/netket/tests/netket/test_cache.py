@@ -0,0 +1,174 @@
+"""
+Simple tests for the NetKet Hamiltonian cache - keys, reuse, eviction and stored spectra.
+"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src" / "netket"))
+
+from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
+from netket_cache import HamiltonianCache, spec_key, spectrum_key, stored_spectrum
+
+
+def build(lattice_text, hilbert_text, hamiltonian_text):
+    """Build the NetKet objects of a specification given as text."""
+    lattice = LatticeSchema(text=lattice_text)
+    hilbert = HilbertSpaceSchema(text=hilbert_text)
+    hamiltonian = HamiltonianSchema(text=hamiltonian_text)
+    graph = lattice.to_netket_graph()
+    hi = hilbert.to_netket_hilbert(graph)
+    H = hamiltonian.build_netket_hamiltonian(hi, graph, system_hilbert=hilbert)
+    return spec_key(lattice, hilbert, hamiltonian), H, hi, graph
+
+
+class TestSpecKey:
+    """Test the canonical key of a specification."""
+
+    def test_equivalent_specs_share_key(self):
+        """Test that different spellings of the same system give the same key."""
+        key1 = spec_key(LatticeSchema(text="chain of 4 sites"),
+                        HilbertSpaceSchema(text="spin-1/2 on each site"),
+                        HamiltonianSchema(text="Ising model with Jz=1, hx=0.5"))
+        key2 = spec_key(LatticeSchema(lattice_type="chain", extent=[4]),
+                        HilbertSpaceSchema(space_type="spin", spin=0.5),
+                        HamiltonianSchema(model_type="ising", parameters={"hx": 0.5, "Jz": 1, "hz": 0},
+                                          parameter_ranges={"hx": [0.1, 0.2]}))
+        assert key1 == key2
+
+    def test_parameters_change_key(self):
+        """Test that a different parameter value gives a different key."""
+        lattice = LatticeSchema(text="chain of 4 sites")
+        hilbert = HilbertSpaceSchema(text="spin-1/2 on each site")
+        key1 = spec_key(lattice, hilbert, HamiltonianSchema(text="Ising model with hx=0.5"))
+        key2 = spec_key(lattice, hilbert, HamiltonianSchema(text="Ising model with hx=0.6"))
+        assert key1 != key2
+
+
+class TestStoredSpectrum:
+    """Test the keys under which spectra are stored."""
+
+    def test_spectrum_key(self):
+        """Test that the key follows the specification and the part of the spectrum."""
+        lattice = LatticeSchema(text="chain of 4 sites")
+        hilbert = HilbertSpaceSchema(text="spin-1/2 on each site")
+        hamiltonian = HamiltonianSchema(text="Ising model with hx=0.5")
+        key = spectrum_key(lattice, hilbert, hamiltonian, "SA")
+        assert key == spectrum_key(lattice, hilbert, HamiltonianSchema(text="Ising model with hx=0.5"), "SA")
+        assert key != spectrum_key(lattice, hilbert, hamiltonian, "LA")
+        assert key != spectrum_key(lattice, hilbert, HamiltonianSchema(text="Ising model with hx=0.6"), "SA")
+
+    def test_stored_spectrum(self):
+        """Test that only a spectrum stored under the same key is served."""
+        spectrum = {"key": "abc", "eigenvalues": [-1.0]}
+        assert stored_spectrum({"energy_spectrum": spectrum}, "abc") is spectrum
+        assert stored_spectrum({"energy_spectrum": spectrum}, "def") is None
+        # Spectra stored before keys were recorded are never served
+        assert stored_spectrum({"energy_spectrum": {"eigenvalues": [-1.0]}}, "abc") is None
+        assert stored_spectrum({}, "abc") is None
+
+
+class TestHamiltonianCache:
+    """Test caching of built Hamiltonians."""
+
+    def test_get_and_put(self):
+        """Test that a cached build is returned as is."""
+        cache = HamiltonianCache()
+        key, H, hi, graph = build("chain of 4 sites", "spin-1/2 on each site", "Ising model with hx=0.5")
+        assert cache.get(key) is None
+        cache.put(key, H, hi, graph)
+        cached = cache.get(key)
+        assert cached.hamiltonian is H
+        assert cached.hilbert is hi
+        assert cache.hits == 1 and cache.misses == 1
+
+    def test_sparse_is_reused(self):
+        """Test that the sparse matrix is built once and counted in the memory."""
+        cache = HamiltonianCache()
+        key, H, hi, graph = build("chain of 4 sites", "spin-1/2 on each site", "Ising model with hx=0.5")
+        cache.put(key, H, hi, graph)
+        matrix = cache.sparse(key, H)
+        assert cache.sparse(key, H) is matrix
+        assert cache.memory > 0
+        assert (matrix != H.to_sparse()).nnz == 0
+
+    def test_operators_are_reused(self):
+        """Test that operators are built once per entry and count towards the memory."""
+        key, H, hi, graph = build("chain of 6 sites", "spin-1/2 on each site", "Ising model with Jz=1, hx=0.5")
+        cache = HamiltonianCache()
+        cache.put(key, H, hi, graph)
+        builds = []
+        states = cache.operator(key, "states", lambda: builds.append(1) or np.asarray(hi.all_states()))
+        assert cache.operator(key, "states", lambda: builds.append(1)) is states
+        assert len(builds) == 1
+        assert cache.memory == states.nbytes
+
+        # Without an entry the operator is built every time
+        assert cache.operator("other", "states", lambda: 1) == 1
+        assert cache.operator("other", "states", lambda: 2) == 2
+
+    def test_max_entries(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = HamiltonianCache(max_entries=2)
+        keys = []
+        for hx in [0.1, 0.2, 0.3]:
+            key, H, hi, graph = build("chain of 4 sites", "spin-1/2 on each site", f"Ising model with hx={hx}")
+            cache.put(key, H, hi, graph)
+            keys.append(key)
+            if hx == 0.2:
+                cache.get(keys[0])
+        assert len(cache) == 2
+        assert keys[0] in cache
+        assert keys[1] not in cache
+
+    def test_max_memory(self):
+        """Test that sparse matrices beyond the memory bound are evicted."""
+        cache = HamiltonianCache(max_memory_mb=0)
+        key, H, hi, graph = build("chain of 4 sites", "spin-1/2 on each site", "Ising model with hx=0.5")
+        cache.put(key, H, hi, graph)
+        matrix = cache.sparse(key, H)
+        assert matrix is not None
+        assert key not in cache
+        assert cache.memory == 0
+
+
+class TestSpectrumReuse:
+    """Test reusing and extending stored spectra through the compute_energy_spectrum tool."""
+
+    @pytest.fixture(autouse=True)
+    def setup_server(self, tmp_path, monkeypatch):
+        """Point the server at a fresh storage directory with a transverse-field Ising chain."""
+        import mcp_server
+        from netket_jsons import NetKetJSONManager
+        monkeypatch.setattr(mcp_server, "json_manager", NetKetJSONManager(storage_dir=str(tmp_path)))
+        self.server = mcp_server
+        self.system_id = mcp_server.create_quantum_system("Ising chain")["system_id"]
+        mcp_server.set_lattice(self.system_id, "chain of 10 sites")
+        mcp_server.set_hilbert_space(self.system_id, "spin-1/2 on each site")
+        mcp_server.set_hamiltonian(self.system_id, "Ising model with Jz=1, hx=0.5")
+        _, H, _, _ = build("chain of 10 sites", "spin-1/2 on each site", "Ising model with Jz=1, hx=0.5")
+        self.exact = np.linalg.eigvalsh(H.to_dense())
+
+    @pytest.mark.parametrize("first, then", [("dense", "dense"), ("sparse", "sparse"), ("dense", "sparse")])
+    def test_extend_highest(self, first, then):
+        """Test that the highest eigenvalues stay the highest when they are reused and extended."""
+        spectrum = self.server.compute_energy_spectrum(self.system_id, num_eigenvalues=3, which="LA", solver=first)
+        np.testing.assert_allclose(spectrum["eigenvalues"], self.exact[-3:], atol=1e-10)
+
+        cached = self.server.compute_energy_spectrum(self.system_id, num_eigenvalues=2, which="LA", solver=then)
+        assert cached["solver"]["cached"]
+        np.testing.assert_allclose(cached["eigenvalues"], self.exact[-2:], atol=1e-10)
+
+        extended = self.server.compute_energy_spectrum(self.system_id, num_eigenvalues=6, which="LA", solver=then)
+        np.testing.assert_allclose(extended["eigenvalues"], self.exact[-6:], atol=1e-10)
+        assert extended["solver"]["extended_from"] == (3 if then == "sparse" else 0)
+
+    def test_lowest_kept_apart(self):
+        """Test that a stored highest spectrum is not served for the lowest eigenvalues."""
+        self.server.compute_energy_spectrum(self.system_id, num_eigenvalues=3, which="LA", solver="dense")
+        spectrum = self.server.compute_energy_spectrum(self.system_id, num_eigenvalues=3, which="SA", solver="sparse")
+        assert not spectrum["solver"].get("cached")
+        np.testing.assert_allclose(spectrum["eigenvalues"], self.exact[:3], atol=1e-10)
@@ -4,12 +4,15 @@ Simple tests for NetKet JSON Manager - basic system management functionality.
 
 import pytest
 import tempfile
+import json
+import shutil
+import numpy as np
 from pathlib import Path
 import sys
 
 # Import the modules to test
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src" / "netket"))
-from netket_jsons import NetKetJSONManager
+from netket_jsons import NetKetJSONManager, ARRAY_KEY, INDEX_FILE, HISTORY_FILE, atomic_write
 
 
 class TestNetKetJSONManager:
@@ -59,6 +62,95 @@ class TestNetKetJSONManager:
         assert loaded_system.system_id == system_id
         assert loaded_system.lattice is not None
 
+    def test_array_results(self):
+        """Test that numpy arrays in results are stored as .npy files and memory-mapped on load."""
+        system_id = self.manager.create_system("Test system")
+        system = self.manager.systems[system_id]
+        eigenvectors = np.random.default_rng(0).normal(size=(16, 3))
+        system.results["energy_spectrum"] = {"eigenvalues": [-1.0, 0.0, 1.0], "eigenvectors": eigenvectors}
+        self.manager.save_system(system_id)
+
+        with open(self.manager._system_file(system_id)) as f:
+            stored = json.load(f)["results"]["energy_spectrum"]
+        assert stored["eigenvalues"] == [-1.0, 0.0, 1.0]
+        assert stored["eigenvectors"]["shape"] == [16, 3]
+
+        loaded = NetKetJSONManager(storage_dir=self.manager.storage_dir).load_system(system_id)
+        loaded_vectors = loaded.results["energy_spectrum"]["eigenvectors"]
+        assert isinstance(loaded_vectors, np.memmap)
+        np.testing.assert_array_equal(loaded_vectors, eigenvectors)
+        assert ARRAY_KEY in loaded.to_dict()["results"]["energy_spectrum"]["eigenvectors"]
+
+    def test_array_results_replaced(self):
+        """Test saving over memory-mapped arrays and removing arrays that are no longer referenced."""
+        system_id = self.manager.create_system("Test system")
+        system = self.manager.systems[system_id]
+        system.results["energy_spectrum"] = {"eigenvectors": np.ones((4, 2))}
+        self.manager.save_system(system_id)
+        loaded = self.manager.load_system(system_id)
+        old_vectors = loaded.results["energy_spectrum"]["eigenvectors"]
+
+        # Saving again keeps the memory-mapped file; new arrays replace it
+        self.manager.save_system(system_id)
+        loaded.results["energy_spectrum"]["eigenvectors"] = np.zeros((4, 2))
+        self.manager.save_system(system_id)
+        np.testing.assert_array_equal(old_vectors, np.ones((4, 2)))
+        np.testing.assert_array_equal(self.manager.load_system(system_id).results["energy_spectrum"]["eigenvectors"],
+                                      np.zeros((4, 2)))
+
+        self.manager.systems[system_id].results = {}
+        self.manager.save_system(system_id)
+        assert not list(Path(self.manager.storage_dir).glob(f"{system_id}/arrays/*.npy"))
+
+    def test_unchanged_arrays_not_rewritten(self):
+        """Test that saves only write the arrays that changed since the last save."""
+        system_id = self.manager.create_system("Test system")
+        system = self.manager.systems[system_id]
+        system.results["energy_spectrum"] = {"eigenvectors": np.ones((4, 2))}
+        self.manager.save_system(system_id, system)
+        path = Path(self.manager.storage_dir) / system_id / "arrays" / "results.energy_spectrum.eigenvectors.npy"
+        inode = path.stat().st_ino
+
+        system.results["observables"] = {"density": [0.5, 0.5]}
+        self.manager.save_system(system_id, system)
+        assert path.stat().st_ino == inode
+
+        system.results["energy_spectrum"]["eigenvectors"] = np.zeros((4, 2))
+        self.manager.save_system(system_id, system)
+        assert path.stat().st_ino != inode
+        np.testing.assert_array_equal(np.load(path), np.zeros((4, 2)))
+
+        # A file removed with its result is written again when the result comes back
+        vectors = system.results.pop("energy_spectrum")
+        self.manager.save_system(system_id, system)
+        system.results["energy_spectrum"] = vectors
+        self.manager.save_system(system_id, system)
+        np.testing.assert_array_equal(np.load(path), np.zeros((4, 2)))
+
+    def test_update_drops_spectra(self):
+        """Test that changing a component drops the spectra of the previous specification."""
+        system_id = self.manager.create_system("Test system")
+        self.manager.update_component("lattice", "chain of 4 sites", system_id)
+        system = self.manager.systems[system_id]
+        system.results["energy_spectrum"] = {"eigenvectors": np.ones((4, 2))}
+        system.results["sector_spectrum"] = {"sectors": []}
+        system.results["model_type"] = "ising"
+        self.manager.save_system(system_id)
+
+        self.manager.update_component("lattice", "chain of 6 sites", system_id)
+        assert "energy_spectrum" not in system.results
+        assert "sector_spectrum" not in system.results
+        assert system.results["model_type"] == "ising"
+        assert not list(Path(self.manager.storage_dir).glob(f"{system_id}/arrays/*.npy"))
+
+    def test_legacy_list_results(self):
+        """Test that results saved as JSON lists still load."""
+        system_id = self.manager.create_system("Test system")
+        self.manager.systems[system_id].results["energy_spectrum"] = {"eigenvectors": [[1.0, 0.0], [0.0, 1.0]]}
+        self.manager.save_system(system_id)
+        loaded = NetKetJSONManager(storage_dir=self.manager.storage_dir).load_system(system_id)
+        assert loaded.results["energy_spectrum"]["eigenvectors"] == [[1.0, 0.0], [0.0, 1.0]]
+
     def test_list_systems(self):
         """Test listing all systems."""
         # Create multiple systems
@@ -71,6 +163,124 @@ class TestNetKetJSONManager:
         assert id1 in system_ids
         assert id2 in system_ids
 
+    def test_lazy_loading(self):
+        """Test that a new manager lists systems from the index and loads them on access."""
+        system_id = self.manager.create_system("Test system")
+        self.manager.update_component("lattice", "chain of 4 sites", system_id)
+
+        new_manager = NetKetJSONManager(storage_dir=self.manager.storage_dir)
+        assert new_manager.systems.loaded == []
+        assert new_manager.list_systems() == self.manager.list_systems()
+        assert new_manager.list_systems()[0]["lattice"] == "chain of 4 sites"
+        assert system_id in new_manager.systems
+        assert new_manager.systems[system_id].lattice is not None
+        assert new_manager.systems.loaded == [system_id]
+
+    def test_loaded_systems_bounded(self):
+        """Test that only the most recently used systems stay in memory."""
+        manager = NetKetJSONManager(storage_dir=self.manager.storage_dir, max_loaded_systems=2)
+        ids = [manager.create_system(f"System {i}") for i in range(3)]
+        assert manager.systems.loaded == ids[1:]
+        assert len(manager.systems) == 3
+
+        # Evicted systems are loaded again from disk
+        manager.update_component("lattice", "chain of 4 sites", ids[0])
+        assert manager.systems.loaded == [ids[2], ids[0]]
+        assert manager.systems[ids[0]].lattice is not None
+
+    def test_evicted_while_held(self):
+        """Test that saving a system evicted while it was held keeps the held changes."""
+        manager = NetKetJSONManager(storage_dir=self.manager.storage_dir, max_loaded_systems=2)
+        system_id = manager.create_system("Held system")
+        system = manager.systems[system_id]
+        others = [manager.create_system(f"System {i}") for i in range(2)]
+        assert system_id not in manager.systems.loaded
+        manager.systems[system_id]  # A copy is loaded again from disk meanwhile
+        manager.systems[others[0]]
+
+        system.results["energy_spectrum"] = {"eigenvalues": [-1.0, 0.0]}
+        manager.save_system(system_id, system)
+        assert manager.systems[system_id] is system
+        loaded = NetKetJSONManager(storage_dir=self.manager.storage_dir).load_system(system_id)
+        assert loaded.results["energy_spectrum"]["eigenvalues"] == [-1.0, 0.0]
+
+    def test_index_rebuilt(self):
+        """Test that systems missing from the index are found, and deleted ones dropped."""
+        id1 = self.manager.create_system("System 1")
+        id2 = self.manager.create_system("System 2")
+        (Path(self.manager.storage_dir) / INDEX_FILE).unlink()
+        self.manager.delete_system(id2)
+
+        new_manager = NetKetJSONManager(storage_dir=self.manager.storage_dir)
+        assert {s["system_id"] for s in new_manager.list_systems()} == {id1, id2}
+        shutil.rmtree(Path(self.manager.storage_dir) / id2)
+        new_manager = NetKetJSONManager(storage_dir=self.manager.storage_dir)
+        assert [s["system_id"] for s in new_manager.list_systems()] == [id1]
+
+    def test_history_log(self):
+        """Test that history is appended to its own log instead of the snapshot."""
+        system_id = self.manager.create_system("Test system")
+        self.manager.update_component("lattice", "chain of 4 sites", system_id)
+        self.manager.update_component("hilbert", "spin-1/2 on each site", system_id)
+
+        system_dir = Path(self.manager.storage_dir) / system_id
+        with open(system_dir / f"{system_id}.json") as f:
+            assert "history" not in json.load(f)
+        with open(system_dir / HISTORY_FILE) as f:
+            assert [json.loads(line)["action"] for line in f] == ["set_lattice", "set_hilbert"]
+
+        loaded = NetKetJSONManager(storage_dir=self.manager.storage_dir).load_system(system_id)
+        assert [entry["action"] for entry in loaded.history] == ["set_lattice", "set_hilbert"]
+        assert loaded.to_dict()["history"] == self.manager.systems[system_id].history
+
+    def test_legacy_inline_history(self):
+        """Test that history stored in old snapshots moves to the log on the next save."""
+        system_id = self.manager.create_system("Test system")
+        system_dir = Path(self.manager.storage_dir) / system_id
+        with open(system_dir / f"{system_id}.json") as f:
+            data = json.load(f)
+        data["history"] = [{"timestamp": data["created_at"], "action": "set_lattice", "data": "chain of 4 sites"}]
+        with open(system_dir / f"{system_id}.json", 'w') as f:
+            json.dump(data, f)
+
+        manager = NetKetJSONManager(storage_dir=self.manager.storage_dir)
+        manager.update_component("hilbert", "spin-1/2 on each site", system_id)
+        loaded = NetKetJSONManager(storage_dir=self.manager.storage_dir).load_system(system_id)
+        assert [entry["action"] for entry in loaded.history] == ["set_lattice", "set_hilbert"]
+
+    def test_delayed_saves_coalesce(self):
+        """Test that saves within the delay are written once, when flushed."""
+        manager = NetKetJSONManager(storage_dir=self.manager.storage_dir, save_delay=60)
+        writes = []
+        write_snapshot = manager._write_snapshot
+        manager._write_snapshot = lambda *args: (writes.append(args[0]), write_snapshot(*args))
+
+        system_id = manager.create_system("Test system")
+        manager.update_component("lattice", "chain of 4 sites", system_id)
+        manager.update_component("hilbert", "spin-1/2 on each site", system_id)
+        assert writes == []
+        assert manager.list_systems()[0]["hilbert"] == "spin-1/2 on each site"
+
+        manager.flush()
+        assert writes == [system_id]
+        loaded = NetKetJSONManager(storage_dir=self.manager.storage_dir).load_system(system_id)
+        assert loaded.hilbert.text == "spin-1/2 on each site"
+
+    def test_atomic_write(self, tmp_path):
+        """Test that a failed write leaves the previous file and no temporary file."""
+        (tmp_path / "atomic").mkdir()
+        path = tmp_path / "atomic" / "data.json"
+        atomic_write(path, lambda f: f.write("old"))
+
+        def fail(f):
+            f.write("partial")
+            raise RuntimeError("crash")
+
+        with pytest.raises(RuntimeError):
+            atomic_write(path, fail)
+        assert path.read_text() == "old"
+        assert [p.name for p in path.parent.iterdir()] == ["data.json"]
+
     def test_error_handling(self):
         """Test basic error handling."""
         # Try to update non-existent system
@@ -104,4 +314,34 @@ class TestNetKetJSONManager:
             assert hilbert is not None
             
         except (ImportError, TypeError) as e:
-            pytest.skip(f"NetKet integration failed: {e}") 
\ No newline at end of file
+            pytest.skip(f"NetKet integration failed: {e}") 
+
+class TestEvictionDuringToolCall:
+    """Test that tools keep their results when their system is evicted while they run."""
+
+    def test_compute_energy_spectrum(self, tmp_path, monkeypatch):
+        """Test a spectrum computed while other systems push the system out of memory."""
+        import mcp_server
+        manager = NetKetJSONManager(storage_dir=str(tmp_path), max_loaded_systems=2)
+        monkeypatch.setattr(mcp_server, "json_manager", manager)
+        system_id = mcp_server.create_quantum_system("Held system")["system_id"]
+        mcp_server.set_lattice(system_id, "chain of 4 sites")
+        mcp_server.set_hilbert_space(system_id, "spin-1/2 on each site")
+        mcp_server.set_hamiltonian(system_id, "Heisenberg model with J=1")
+
+        solve_spectrum = mcp_server._solve_spectrum
+
+        def solve_and_evict(*args, **kwargs):
+            # Other calls load two systems while this one solves
+            for i in range(2):
+                mcp_server.create_quantum_system(f"System {i}")
+            assert system_id not in manager.systems.loaded
+            return solve_spectrum(*args, **kwargs)
+
+        monkeypatch.setattr(mcp_server, "_solve_spectrum", solve_and_evict)
+        result = mcp_server.compute_energy_spectrum(system_id, num_eigenvalues=2)
+
+        loaded = NetKetJSONManager(storage_dir=str(tmp_path)).load_system(system_id)
+        assert loaded.results
+        assert mcp_server.get_system_details(system_id)["results"]
+        np.testing.assert_allclose(loaded.results["energy_spectrum"]["eigenvalues"][:2], result["eigenvalues"])
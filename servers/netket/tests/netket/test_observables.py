@@ -0,0 +1,176 @@
+"""
+Simple tests for eigenstate observables - site values, correlation maps and entanglement entropy.
+"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src" / "netket"))
+
+import netket as nk
+from netket.experimental.operator.fermion import number
+from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
+from netket_observables import ObservableEngine, default_observables, marshall_sublattice
+
+
+def build(lattice_text, hilbert_text, hamiltonian_text):
+    """Build the schemas, NetKet objects and lowest eigenvectors of a specification given as text."""
+    hilbert = HilbertSpaceSchema(text=hilbert_text)
+    hamiltonian = HamiltonianSchema(text=hamiltonian_text)
+    graph = LatticeSchema(text=lattice_text).to_netket_graph()
+    hi = hilbert.to_netket_hilbert(graph)
+    H = hamiltonian.build_netket_hamiltonian(hi, graph, system_hilbert=hilbert)
+    eig_vals, eig_vecs = np.linalg.eigh(H.to_dense())
+    return hilbert, hamiltonian, graph, hi, eig_vals[:3], eig_vecs[:, :3]
+
+
+def expectation(operator, vectors):
+    """<v|O|v> for every column v."""
+    return np.real(np.sum(vectors.conj() * (operator.to_sparse() @ vectors), axis=0))
+
+
+class TestSpinObservables:
+    """Test spin observables against NetKet operators."""
+
+    def test_heisenberg_correlations(self):
+        """Test S_i.S_j in the Marshall-rotated eigenvectors of the Heisenberg chain."""
+        hilbert, hamiltonian, graph, hi, eig_vals, vectors = build("chain of 6 sites", "spin-1/2 on each site",
+                                                                   "Heisenberg model with J=1")
+        engine = ObservableEngine(hi, hilbert, graph.n_nodes, sublattice=marshall_sublattice(hamiltonian, graph))
+        correlations = engine.evaluate(vectors, ["spin_correlations"])["spin_correlations"]
+
+        # The same states without the sign rule
+        physical = nk.operator.Heisenberg(hi, graph, sign_rule=False)
+        physical_vectors = np.linalg.eigh(physical.to_dense())[1][:, :1]
+        reference = ObservableEngine(hi, hilbert, graph.n_nodes).evaluate(physical_vectors, ["spin_correlations"])
+        np.testing.assert_allclose(correlations[0], reference["spin_correlations"][0], atol=1e-10)
+
+        # NetKet's Heisenberg model uses Pauli matrices, 4 S_i.S_j per bond
+        energy = sum(4 * correlations[0, i, j] for i, j in graph.edges())
+        assert energy == pytest.approx(eig_vals[0])
+        np.testing.assert_allclose(np.diagonal(correlations[0]), 0.75)
+
+    def test_ising(self):
+        """Test magnetizations and correlations against Pauli operators."""
+        hilbert, hamiltonian, graph, hi, _, vectors = build("chain of 5 sites", "spin-1/2 on each site",
+                                                            "Ising model with Jz=1, hx=0.5, hz=0.3")
+        assert marshall_sublattice(hamiltonian, graph) is None
+        values = ObservableEngine(hi, hilbert, graph.n_nodes).evaluate(vectors, default_observables(hilbert))
+        sx, sy, sz = nk.operator.spin.sigmax, nk.operator.spin.sigmay, nk.operator.spin.sigmaz
+        np.testing.assert_allclose(values["magnetization"][:, 1], expectation(sz(hi, 1), vectors) / 2, atol=1e-12)
+        exchange = sx(hi, 0) * sx(hi, 3) + sy(hi, 0) * sy(hi, 3) + sz(hi, 0) * sz(hi, 3)
+        np.testing.assert_allclose(values["spin_correlations"][:, 0, 3], expectation(exchange, vectors) / 4,
+                                   atol=1e-12)
+        assert values["entanglement_entropy"].shape == (3, 4)
+
+    def test_entanglement_entropy(self):
+        """Test the entropies of contiguous cuts against singular values of the reshaped state."""
+        hilbert, _, graph, hi, _, vectors = build("chain of 6 sites", "spin-1/2 on each site",
+                                                  "Ising model with Jz=1, hx=1.0")
+        entropies = ObservableEngine(hi, hilbert, 6).evaluate(vectors, ["entanglement_entropy"])
+        for l in range(1, 6):
+            schmidt = np.linalg.svd(vectors[:, 0].reshape(2**l, -1), compute_uv=False)**2
+            schmidt = schmidt[schmidt > 1e-14]
+            assert entropies["entanglement_entropy"][0, l - 1] == pytest.approx(-np.sum(schmidt * np.log(schmidt)))
+
+
+class TestFermionObservables:
+    """Test fermion observables against NetKet number operators."""
+
+    def test_hubbard(self):
+        """Test densities, density correlations and magnetizations of spin-1/2 fermions."""
+        hilbert, _, graph, hi, _, vectors = build("chain of 4 sites", "3 fermions with spin-1/2",
+                                                  "Hubbard model with t=1, U=4")
+        values = ObservableEngine(hi, hilbert, graph.n_nodes).evaluate(vectors, default_observables(hilbert))
+
+        def n(i):
+            return number(hi, i, 1) + number(hi, i, -1)
+
+        np.testing.assert_allclose(values["density"][:, 1], expectation(n(1), vectors), atol=1e-12)
+        np.testing.assert_allclose(values["density"].sum(axis=1), 3)
+        np.testing.assert_allclose(values["density_correlations"][:, 0, 2], expectation(n(0) * n(2), vectors),
+                                   atol=1e-12)
+        np.testing.assert_allclose(values["magnetization"][:, 2],
+                                   expectation(0.5 * (number(hi, 2, 1) - number(hi, 2, -1)), vectors), atol=1e-12)
+
+    def test_single_fermion_entropy(self):
+        """Test that a single fermion has the binary entropy of its weight on each side of a cut."""
+        hilbert, _, graph, hi, _, vectors = build("chain of 6 sites", "1 spinless fermion", "SSH model with t1=1, t2=0.2")
+        values = ObservableEngine(hi, hilbert, 6).evaluate(vectors[:, :1], ["density", "entanglement_entropy"])
+        weight = np.cumsum(values["density"][0])[:-1]
+        binary = -weight * np.log(weight) - (1 - weight) * np.log(1 - weight)
+        np.testing.assert_allclose(values["entanglement_entropy"][0], binary, atol=1e-12)
+
+
+class TestObservableEngine:
+    """Test the reuse of cached matrices and invalid requests."""
+
+    def test_cached(self):
+        """Test that states and matrices are built once and served from the cache afterwards."""
+        hilbert, _, graph, hi, _, vectors = build("chain of 4 sites", "spin-1/2 on each site",
+                                                  "Ising model with Jz=1, hx=0.5")
+        store, builds = {}, []
+
+        def cached(name, build):
+            if name not in store:
+                builds.append(name)
+                store[name] = build()
+            return store[name]
+
+        engine = ObservableEngine(hi, hilbert, graph.n_nodes, cached=cached)
+        first = engine.evaluate(vectors, default_observables(hilbert))
+        n_builds = len(builds)
+        second = engine.evaluate(vectors, default_observables(hilbert))
+        assert len(builds) == n_builds
+        assert "exchange_0_3" in store
+        np.testing.assert_array_equal(first["spin_correlations"], second["spin_correlations"])
+
+    def test_invalid(self):
+        """Test unknown observables, observables of another kind of particle and bad subsystems."""
+        hilbert, _, graph, hi, _, vectors = build("chain of 4 sites", "spin-1/2 on each site",
+                                                  "Ising model with Jz=1, hx=0.5")
+        engine = ObservableEngine(hi, hilbert, graph.n_nodes)
+        with pytest.raises(ValueError):
+            engine.evaluate(vectors, ["polarization"])
+        with pytest.raises(ValueError):
+            engine.evaluate(vectors, ["density"])
+        with pytest.raises(ValueError):
+            engine.evaluate(vectors, ["entanglement_entropy"], subsystems=[[0, 1, 2, 3]])
+        with pytest.raises(ValueError):
+            engine.evaluate(vectors, ["entanglement_entropy"], subsystems=[[4]])
+
+
+class TestComputeObservablesTool:
+    """Test the compute_observables tool against the reference calculation of task-set/analyze_ssh.py."""
+
+    @pytest.fixture(autouse=True)
+    def setup_server(self, tmp_path, monkeypatch):
+        """Point the server at a fresh storage directory."""
+        import mcp_server
+        from netket_jsons import NetKetJSONManager
+        monkeypatch.setattr(mcp_server, "json_manager", NetKetJSONManager(storage_dir=str(tmp_path), save_delay=0))
+        self.server = mcp_server
+
+    def test_ssh_edge_state(self):
+        """Test that the density of the zero mode is the |psi(i)|^2 profile computed by the task-set script."""
+        server, L = self.server, 24
+        sys_id = server.create_quantum_system("SSH Model Analysis")["system_id"]
+        server.set_lattice(sys_id, f"chain of {L} sites")
+        server.set_hilbert_space(sys_id, "1 spinless fermion")
+        server.set_hamiltonian(sys_id, "SSH model with t1=1.0, t2=0.2")
+        server.compute_energy_spectrum(sys_id, num_eigenvalues=L)
+
+        # As in the script: the zero mode from the stored eigenvectors, with one basis state per site
+        system = server.json_manager.systems[sys_id]
+        eigvals = np.array(system.results["energy_spectrum"]["eigenvalues"])
+        eigvecs = np.array(system.results["energy_spectrum"]["eigenvectors"])
+        zero_mode_idx = int(np.argmin(np.abs(eigvals)))
+        spatial_profile = np.abs(eigvecs[:, zero_mode_idx])**2
+
+        observables = server.compute_observables(sys_id, ["density"], eigenstate_indices=[zero_mode_idx])
+        np.testing.assert_allclose(observables["density"][0], spatial_profile, atol=1e-12)
+        # The edge state sits on the outer sites
+        assert spatial_profile[0] > 0.4 and spatial_profile[-1] > 0.4
@@ -0,0 +1,99 @@
+"""
+Simple tests for plot rendering - templates, formats and resolution.
+"""
+
+import io
+import threading
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src" / "netket"))
+
+from PIL import Image
+from netket_plots import Heatmap, Panel, PlotRenderer
+
+
+def spectrum(values):
+    return [Panel(range(len(values)), values, "Eigenvalue index", "Energy", "Energy Spectrum")]
+
+
+def grid(x, y):
+    values = np.add.outer(x, y)
+    return [Heatmap(x, y, values, "hx", "hz", "Energy"), Heatmap(x, y, -values, "hx", "hz", "Gap")]
+
+
+class TestPlotRenderer:
+    """Test rendering plots from cached templates."""
+
+    @pytest.fixture(autouse=True)
+    def setup_renderer(self):
+        """Set up a renderer without templates."""
+        self.renderer = PlotRenderer()
+
+    @pytest.mark.parametrize("fmt", ["png", "webp"])
+    def test_formats_and_dpi(self, fmt):
+        """Test that images have the requested format and a size proportional to the DPI."""
+        image = Image.open(io.BytesIO(self.renderer.render("spectrum", spectrum([-2.0, -1.0, 0.5]), fmt=fmt, dpi=50)))
+        assert image.format == fmt.upper()
+        assert image.size == (400, 300)
+        image = Image.open(io.BytesIO(self.renderer.render("spectrum", spectrum([-2.0, -1.0]), fmt=fmt, dpi=100)))
+        assert image.size == (800, 600)
+
+    def test_template_reused(self):
+        """Test that later plots update the lines of the same figure."""
+        self.renderer.render("spectrum", spectrum([-2.0, -1.0, 0.5]))
+        template = self.renderer._templates["spectrum"]
+        self.renderer.render("spectrum", spectrum([10.0, 20.0]))
+        assert self.renderer._templates["spectrum"] is template
+        assert list(template.lines[0].get_ydata()) == [10.0, 20.0]
+        assert template.axes[0].get_ylim()[1] >= 20.0
+
+        sweep = [Panel([0, 1], [1, 2], "t2", "E", "Energy"), Panel([0, 1], [0.5, 0.1], "t2", "Gap", "Gap")]
+        self.renderer.render("parameter_sweep", sweep, fmt="svg")
+        assert len(self.renderer._templates) == 2
+
+    def test_heatmaps(self):
+        """Test that heatmaps of grids of other shapes and spacings reuse the figure and its colorbars."""
+        self.renderer.render("grid_sweep", grid([0.0, 0.5, 1.0], [0.0, 0.2]))
+        template = self.renderer._templates["grid_sweep"]
+        colorbar = template.colorbars[0]
+        image = Image.open(io.BytesIO(self.renderer.render("grid_sweep", grid([2.0, 3.0, 5.0, 9.0], [1.0, 4.0]),
+                                                           dpi=50)))
+        assert image.size == (650, 250)
+        assert self.renderer._templates["grid_sweep"] is template
+        assert template.colorbars[0] is colorbar
+        assert len(template.axes[0].collections) == 1
+        # Cells are centered on the grid points
+        assert template.axes[0].get_xlim() == pytest.approx((1.5, 11.0))
+        assert (colorbar.vmin, colorbar.vmax) == pytest.approx((3.0, 13.0))
+        with pytest.raises(ValueError):
+            self.renderer.render("grid_sweep", [Heatmap([0, 1], [0, 1], np.zeros((3, 2)), "x", "y", "E")] * 2)
+
+    def test_threads(self):
+        """Test rendering from several threads at once."""
+        images = []
+
+        def render(values):
+            images.append(self.renderer.render("spectrum", spectrum(values), dpi=40))
+
+        threads = [threading.Thread(target=render, args=([float(i), float(i + 1)],)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(images) == 4
+        assert all(Image.open(io.BytesIO(image)).size == (320, 240) for image in images)
+
+    def test_invalid(self):
+        """Test unknown plot types and formats, bad DPI and the wrong number of panels."""
+        with pytest.raises(ValueError):
+            self.renderer.render("histogram", spectrum([1.0]))
+        with pytest.raises(ValueError):
+            self.renderer.render("spectrum", spectrum([1.0]), fmt="gif")
+        with pytest.raises(ValueError):
+            self.renderer.render("spectrum", spectrum([1.0]), dpi=-1)
+        with pytest.raises(ValueError):
+            self.renderer.render("parameter_sweep", spectrum([1.0]))
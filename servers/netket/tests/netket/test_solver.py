@@ -0,0 +1,116 @@
+"""
+Simple tests for the spectrum solvers - strategy choice, the matrix-free operator and extending a spectrum.
+"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src" / "netket"))
+
+from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
+from netket_solver import (MatrixFreeHamiltonian, choose_strategy, estimate_memory, select_eigenpairs,
+                           solve_spectrum)
+
+
+def build(lattice_text, hilbert_text, hamiltonian_text):
+    """Build the NetKet operator, Hilbert space and graph of a specification given as text."""
+    hilbert = HilbertSpaceSchema(text=hilbert_text)
+    graph = LatticeSchema(text=lattice_text).to_netket_graph()
+    hi = hilbert.to_netket_hilbert(graph)
+    H = HamiltonianSchema(text=hamiltonian_text).build_netket_hamiltonian(hi, graph, system_hilbert=hilbert)
+    return H, hi, graph
+
+
+class TestChooseStrategy:
+    """Test the strategy chosen from the estimated memory."""
+
+    def test_auto(self):
+        """Test dense for small systems, then sparse while it fits, then matrix-free."""
+        assert choose_strategy(500, 10, 9, 4, memory_limit_mb=1) == "dense"
+        sparse_mb = estimate_memory("sparse", 2**20, 21, 20, 4) / 1024**2
+        assert choose_strategy(2**20, 21, 20, 4, memory_limit_mb=2 * sparse_mb) == "sparse"
+        assert choose_strategy(2**20, 21, 20, 4, memory_limit_mb=sparse_mb / 2) == "matrix_free"
+        assert estimate_memory("matrix_free", 2**20, 21, 20, 4) < estimate_memory("sparse", 2**20, 21, 20, 4)
+
+    def test_explicit(self):
+        """Test that an explicit strategy is kept, and unknown ones rejected."""
+        assert choose_strategy(500, 10, 9, 4, memory_limit_mb=1, strategy="matrix_free") == "matrix_free"
+        with pytest.raises(ValueError):
+            choose_strategy(500, 10, 9, 4, memory_limit_mb=1, strategy="lanczos")
+
+
+class TestMatrixFree:
+    """Test the matrix-free operator against the sparse matrix."""
+
+    @pytest.mark.parametrize("lattice_text,hilbert_text,hamiltonian_text", [
+        ("chain of 8 sites", "spin-1/2 on each site", "Heisenberg model with J=1"),
+        ("chain of 4 sites", "spin-1/2 on each site", "Kitaev model with Jx=1, Jy=0.5, Jz=0.2"),
+        ("chain of 5 sites", "3 fermions with spin-1/2", "Hubbard model with t=1, U=4"),
+    ])
+    @pytest.mark.parametrize("jit", [True, False])
+    def test_matvec(self, lattice_text, hilbert_text, hamiltonian_text, jit):
+        """Test products with batches that do not divide the number of states."""
+        H, hi, _ = build(lattice_text, hilbert_text, hamiltonian_text)
+        operator = MatrixFreeHamiltonian(H, hi, batch_size=7, jit=jit)
+        x = np.random.default_rng(0).normal(size=hi.n_states)
+        np.testing.assert_allclose(operator @ x, H.to_sparse() @ x, atol=1e-12)
+        assert operator.matvecs == 1
+
+    def test_solve_spectrum(self):
+        """Test that the matrix-free and sparse strategies find the same spectrum."""
+        H, hi, graph = build("chain of 11 sites", "spin-1/2 on each site", "Ising model with Jz=1, hx=0.5")
+        sparse = solve_spectrum(H, hi, H.to_sparse, graph.n_nodes, k=4, strategy="sparse")
+        matrix_free = solve_spectrum(H, hi, H.to_sparse, graph.n_nodes, k=4, strategy="matrix_free")
+        np.testing.assert_allclose(matrix_free.eigenvalues, sparse.eigenvalues, atol=1e-10)
+        assert matrix_free.report()["strategy"] == "matrix_free"
+        # Resident memory of the whole process, including JAX, so well above the matrix-free arrays alone
+        assert matrix_free.peak_rss_mb > matrix_free.estimated_memory_mb
+
+    @pytest.mark.parametrize("strategy", ["dense", "sparse", "matrix_free"])
+    @pytest.mark.parametrize("which", ["SA", "LA", "LM"])
+    def test_which(self, strategy, which):
+        """Test that every strategy returns the part of the spectrum `which` asks for."""
+        # Unlike the Ising chain, the spectrum is not symmetric under E -> -E, so that "LM" has no ties
+        H, hi, graph = build("chain of 8 sites", "spin-1/2 on each site", "Heisenberg model with J=1")
+        solution = solve_spectrum(H, hi, H.to_sparse, graph.n_nodes, k=3, which=which, strategy=strategy)
+        exact = np.linalg.eigvalsh(H.to_dense())
+        np.testing.assert_allclose(solution.eigenvalues, exact[select_eigenpairs(exact, 3, which)], atol=1e-10)
+
+
+class TestExtendSpectrum:
+    """Test solving for more eigenpairs starting from known ones."""
+
+    @pytest.mark.parametrize("strategy", ["sparse", "matrix_free"])
+    @pytest.mark.parametrize("which", ["SA", "LA"])
+    def test_matches_dense(self, strategy, which):
+        """Test that extending 3 eigenpairs to 6 finds the exact eigenvalues."""
+        H, hi, graph = build("chain of 10 sites", "spin-1/2 on each site", "Ising model with Jz=1, hx=0.5")
+        known = solve_spectrum(H, hi, H.to_sparse, graph.n_nodes, k=3, which=which, strategy=strategy)
+        extended = solve_spectrum(H, hi, H.to_sparse, graph.n_nodes, k=6, which=which, strategy=strategy,
+                                  known=(known.eigenvalues, known.eigenvectors))
+        exact = np.linalg.eigvalsh(H.to_dense())
+        np.testing.assert_allclose(extended.eigenvalues, exact[:6] if which == "SA" else exact[-6:], atol=1e-10)
+        assert extended.report()["extended_from"] == 3
+
+    def test_degenerate_cut(self):
+        """Test extending known eigenpairs that split a degenerate multiplet."""
+        H, hi, graph = build("chain of 8 sites", "spin-1/2 on each site", "Heisenberg model with J=1")
+        S = H.to_sparse()
+        known = solve_spectrum(H, hi, H.to_sparse, graph.n_nodes, k=2, strategy="sparse")
+        extended = solve_spectrum(H, hi, H.to_sparse, graph.n_nodes, k=6, strategy="sparse",
+                                  known=(known.eigenvalues, known.eigenvectors))
+        vecs = extended.eigenvectors
+        np.testing.assert_allclose(S @ vecs, vecs * extended.eigenvalues, atol=1e-8)
+        np.testing.assert_allclose(vecs.conj().T @ vecs, np.eye(6), atol=1e-8)
+        assert extended.eigenvalues[0] == pytest.approx(np.linalg.eigvalsh(S.toarray())[0])
+
+    def test_select_eigenpairs(self):
+        """Test picking a part of a stored spectrum."""
+        eig_vals = np.array([-3.0, -1.0, 0.5, 2.0])
+        np.testing.assert_array_equal(eig_vals[select_eigenpairs(eig_vals, 2, "SA")], [-3.0, -1.0])
+        np.testing.assert_array_equal(eig_vals[select_eigenpairs(eig_vals, 2, "LA")], [0.5, 2.0])
+        np.testing.assert_array_equal(eig_vals[select_eigenpairs(eig_vals, 2, "SM")], [-1.0, 0.5])
+        np.testing.assert_array_equal(eig_vals[select_eigenpairs(eig_vals, 2, "LM")], [-3.0, 2.0])
@@ -0,0 +1,210 @@
+"""
+Simple tests for the parameter sweep engine - affine Hamiltonians and the sweep executor.
+"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src" / "netket"))
+
+from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
+from netket_sweep import (AffineHamiltonian, SweepCheckpoint, SweepExecutor, SweepPoint, excitation_gap,
+                          grid_arrays, grid_points, refinement_points, shutdown_pools)
+
+
+MODELS = [
+    ("chain of 6 sites", "2 spinless fermions", "SSH model with t1=1, t2=0.3"),
+    ("chain of 4 sites", "2 fermions with spin-1/2", "Hubbard model with t=1, U=4"),
+    ("chain of 5 sites", "2 spinless fermions", "fermion hopping with t=1, B=0.5"),
+    ("chain of 6 sites", "spin-1/2 on each site", "Heisenberg model with J=1.5"),
+    ("chain of 6 sites", "spin-1/2 on each site", "Ising model with Jz=1, hx=0.7, hz=0.2"),
+    ("chain of 4 sites", "spin-1/2 on each site", "Kitaev model with Jx=1, Jy=0.5, Jz=0.2"),
+]
+
+
+def build(lattice_text, hilbert_text, hamiltonian_text):
+    """Build the schemas and NetKet objects of a specification given as text."""
+    hilbert = HilbertSpaceSchema(text=hilbert_text)
+    hamiltonian = HamiltonianSchema(text=hamiltonian_text)
+    graph = LatticeSchema(text=lattice_text).to_netket_graph()
+    hi = hilbert.to_netket_hilbert(graph)
+    return hilbert, hamiltonian, hi, graph
+
+
+class TestAffineHamiltonian:
+    """Test that the sum of the parameter terms is the Hamiltonian."""
+
+    @pytest.mark.parametrize("lattice_text,hilbert_text,hamiltonian_text", MODELS)
+    def test_matches_build(self, lattice_text, hilbert_text, hamiltonian_text):
+        """Test against build_netket_hamiltonian at the specified parameters."""
+        hilbert, hamiltonian, hi, graph = build(lattice_text, hilbert_text, hamiltonian_text)
+        expected = hamiltonian.build_netket_hamiltonian(hi, graph, system_hilbert=hilbert).to_dense()
+        affine_h = AffineHamiltonian.from_schema(hamiltonian, hi, graph, hilbert)
+        np.testing.assert_allclose(affine_h.matrix(hamiltonian.get_parameters()).toarray(), expected, atol=1e-12)
+
+    def test_swept_parameter(self):
+        """Test a parameter value other than the one the terms were built from."""
+        hilbert, hamiltonian, hi, graph = build("chain of 6 sites", "spin-1/2 on each site",
+                                                "Ising model with Jz=1, hx=0.5")
+        affine_h = AffineHamiltonian.from_schema(hamiltonian, hi, graph, hilbert)
+        swept = HamiltonianSchema(model_type="ising", parameters={"Jz": 0.8, "hx": 1.3, "hz": 0.0})
+        expected = swept.build_netket_hamiltonian(hi, graph, system_hilbert=hilbert).to_dense()
+        np.testing.assert_allclose(affine_h.matrix(swept.get_parameters()).toarray(), expected, atol=1e-12)
+
+    def test_missing_parameter(self):
+        """Test that every parameter of the model needs a value."""
+        hilbert, hamiltonian, hi, graph = build("chain of 4 sites", "2 spinless fermions",
+                                                "SSH model with t1=1, t2=0.3")
+        affine_h = AffineHamiltonian.from_schema(hamiltonian, hi, graph, hilbert)
+        assert affine_h.parameter_names == ["t1", "t2"]
+        with pytest.raises(ValueError):
+            affine_h.matrix({"t1": 1.0})
+
+
+class TestSweepExecutor:
+    """Test diagonalizing many parameter points."""
+
+    @pytest.fixture(autouse=True)
+    def setup_hamiltonian(self):
+        """Build a transverse-field Ising chain large enough for the sparse solver."""
+        hilbert, hamiltonian, hi, graph = build("chain of 11 sites", "spin-1/2 on each site",
+                                                "Ising model with Jz=1, hx=0.5")
+        self.affine_h = AffineHamiltonian.from_schema(hamiltonian, hi, graph, hilbert)
+        self.points = [{"Jz": 1.0, "hx": hx, "hz": 0.0} for hx in np.linspace(0.2, 1.2, 6)]
+
+    def test_warm_start_matches_cold(self):
+        """Test that warm starts give the same spectra with fewer matrix-vector products."""
+        cold = SweepExecutor(self.affine_h, k=4).run(self.points)
+        warm = SweepExecutor(self.affine_h, k=4, warm_start=True).run(self.points)
+        for cold_point, warm_point in zip(cold, warm):
+            np.testing.assert_allclose(warm_point.eigenvalues, cold_point.eigenvalues, atol=1e-8)
+        assert sum(p.matvecs for p in warm) < sum(p.matvecs for p in cold)
+
+    def test_workers_keep_order(self):
+        """Test that parallel sweeps return the points in order."""
+        serial = SweepExecutor(self.affine_h, k=4).run(self.points)
+        try:
+            parallel = SweepExecutor(self.affine_h, k=4, workers=2).run(self.points)
+        finally:
+            shutdown_pools()
+        assert [p.parameters for p in parallel] == self.points
+        for serial_point, parallel_point in zip(serial, parallel):
+            np.testing.assert_allclose(parallel_point.eigenvalues, serial_point.eigenvalues, atol=1e-8)
+
+    def test_chunks(self):
+        """Test that points are split into chunks of at most chunk_size, solved in order by any workers."""
+        executor = SweepExecutor(self.affine_h, k=4, workers=2, chunk_size=4)
+        assert [len(chunk) for chunk in executor.chunks(self.points)] == [4, 2]
+        executor = SweepExecutor(self.affine_h, k=4, workers=4)
+        assert [len(chunk) for chunk in executor.chunks(self.points)] == [2, 2, 1, 1]
+
+        serial = SweepExecutor(self.affine_h, k=4).run(self.points)
+        seen = []
+        try:
+            chunked = SweepExecutor(self.affine_h, k=4, workers=2, chunk_size=1).run(self.points, on_point=seen.append)
+        finally:
+            shutdown_pools()
+        assert [p.parameters for p in chunked] == self.points
+        assert len(seen) == len(self.points)
+        for serial_point, chunked_point in zip(serial, chunked):
+            np.testing.assert_allclose(chunked_point.eigenvalues, serial_point.eigenvalues, atol=1e-8)
+
+    def test_invalid_workers(self):
+        """Test that at least one worker and one point per chunk are required."""
+        with pytest.raises(ValueError):
+            SweepExecutor(self.affine_h, k=4, workers=0)
+        with pytest.raises(ValueError):
+            SweepExecutor(self.affine_h, k=4, chunk_size=0)
+
+    def test_on_point(self):
+        """Test that every solved point is reported, also from workers."""
+        seen = []
+        SweepExecutor(self.affine_h, k=4).run(self.points, on_point=seen.append)
+        assert [p.parameters for p in seen] == self.points
+        seen = []
+        try:
+            SweepExecutor(self.affine_h, k=4, workers=2).run(self.points, on_point=seen.append)
+        finally:
+            shutdown_pools()
+        assert sorted(p.parameters["hx"] for p in seen) == [p["hx"] for p in self.points]
+
+
+class TestSweepCheckpoint:
+    """Test the log of computed sweep points."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that points are read back by a new checkpoint of the same key only."""
+        path = tmp_path / "checkpoint.jsonl"
+        checkpoint = SweepCheckpoint(path, "key")
+        checkpoint.add(SweepPoint(parameters={"t1": 1.0, "t2": 0.5}, eigenvalues=np.array([-2.0, -1.0]), matvecs=7))
+
+        resumed = SweepCheckpoint(path, "key")
+        assert len(resumed) == 1
+        point = resumed.get({"t2": 0.5, "t1": 1})
+        np.testing.assert_allclose(point.eigenvalues, [-2.0, -1.0])
+        assert point.matvecs == 7
+        assert resumed.get({"t1": 1.0, "t2": 0.6}) is None
+        assert len(SweepCheckpoint(path, "other key")) == 0
+
+        resumed.remove()
+        assert not path.exists()
+        assert len(resumed) == 0
+
+    def test_truncated_line(self, tmp_path):
+        """Test that a record cut short by a crash is skipped."""
+        path = tmp_path / "checkpoint.jsonl"
+        checkpoint = SweepCheckpoint(path, "key")
+        checkpoint.add(SweepPoint(parameters={"t": 1.0}, eigenvalues=np.array([-1.0]), matvecs=0))
+        with open(path, 'a') as f:
+            f.write('{"key": "key", "parameters": {"t": 2.')
+        assert len(SweepCheckpoint(path, "key")) == 1
+
+
+class TestGrid:
+    """Test the points and arrays of grid sweeps."""
+
+    def test_grid_points(self):
+        """Test that the last parameter varies fastest and the others keep their values."""
+        points = grid_points({"t": 1.0, "U": 4.0, "V": 0.5}, {"t": [0.5, 1], "U": [0, 2, 4]})
+        assert [(p["t"], p["U"]) for p in points] == [(0.5, 0.0), (0.5, 2.0), (0.5, 4.0),
+                                                      (1.0, 0.0), (1.0, 2.0), (1.0, 4.0)]
+        assert all(p["V"] == 0.5 for p in points)
+
+    def test_grid_arrays(self):
+        """Test that energies and gaps are arrays over the grid."""
+        points = [SweepPoint(parameters={}, eigenvalues=np.array([-float(i), 1.0 - i, 2.0]), matvecs=0)
+                  for i in range(6)]
+        arrays = grid_arrays(points, (2, 3))
+        assert arrays["eigenvalues"].shape == (2, 3, 3)
+        np.testing.assert_allclose(arrays["ground_state_energies"], [[0, -1, -2], [-3, -4, -5]])
+        np.testing.assert_allclose(arrays["energy_gaps"], np.ones((2, 3)))
+
+
+class TestRefinementPoints:
+    """Test where refinement adds points."""
+
+    def test_largest_changes_first(self):
+        """Test that the intervals with the largest gap changes are split, in any input order."""
+        values = [0.0, 1.0, 0.5, 1.5]
+        gaps = [2.0, 0.1, 1.8, 0.0]
+        assert refinement_points(values, gaps, 2) == [0.75, 0.25]
+        assert refinement_points(values, gaps, 10) == [0.75, 0.25, 1.25]
+
+    def test_flat_and_narrow_intervals(self):
+        """Test that intervals without a gap change or too narrow are not split."""
+        assert refinement_points([0.0, 1.0, 2.0], [1.0, 1.0, 1.0], 3) == []
+        assert refinement_points([0.0, 1e-9, 1.0], [1.0, 0.0, 0.0], 3) == []
+
+
+class TestExcitationGap:
+    """Test the degeneracy-aware gap."""
+
+    def test_gap(self):
+        """Test gaps above degenerate and unique ground states."""
+        assert excitation_gap(np.array([-1.0, -1.0, 0.5])) == pytest.approx(1.5)
+        assert excitation_gap(np.array([-1.0, 0.0])) == pytest.approx(1.0)
+        assert excitation_gap(np.array([-1.0, -1.0])) == 0.0
+        assert excitation_gap(np.array([-1.0])) == 0.0
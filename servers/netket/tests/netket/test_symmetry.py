@@ -0,0 +1,128 @@
+"""
+Simple tests for symmetry sectors - block diagonalization against the full spectrum.
+"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src" / "netket"))
+
+from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
+from netket_symmetry import basis_states, parse_sectors, sector_hilbert, sector_matrices, sector_sparse
+
+
+def schemas(lattice_text, hilbert_text, hamiltonian_text):
+    """Create the schemas of a specification given as text."""
+    return (LatticeSchema(text=lattice_text), HilbertSpaceSchema(text=hilbert_text),
+            HamiltonianSchema(text=hamiltonian_text))
+
+
+def full_spectrum(lattice, hilbert, hamiltonian):
+    """All eigenvalues of the Hamiltonian on the full Hilbert space."""
+    graph = lattice.to_netket_graph()
+    hi = hilbert.to_netket_hilbert(graph)
+    return np.linalg.eigvalsh(hamiltonian.build_netket_hamiltonian(hi, graph, system_hilbert=hilbert).to_dense())
+
+
+def sector_spectrum(lattice, hilbert, hamiltonian, sectors):
+    """All eigenvalues of all requested sector blocks, sorted."""
+    sector_list = parse_sectors(sectors, lattice, hilbert, hamiltonian)
+    blocks = sector_matrices(lattice, hilbert, hamiltonian, sector_list, max_states=1e6)
+    return np.sort(np.concatenate([np.linalg.eigvalsh(block.toarray()) for _, block in blocks]))
+
+
+class TestSectorSpectra:
+    """Test that the sector blocks together hold the full spectrum."""
+
+    @pytest.mark.parametrize("sectors", [
+        {"total_sz": "all"},
+        {"momentum": "all"},
+        {"total_sz": "all", "momentum": "all"},
+    ])
+    def test_heisenberg_chain(self, sectors):
+        """Test total Sz and momentum sectors of a periodic Heisenberg chain."""
+        specs = schemas("chain of 8 sites", "spin-1/2 on each site", "Heisenberg model with J=1")
+        np.testing.assert_allclose(sector_spectrum(*specs, sectors), full_spectrum(*specs), atol=1e-10)
+
+    def test_hubbard_total_sz(self):
+        """Test total Sz sectors of spin-1/2 fermions."""
+        specs = schemas("chain of 4 sites", "3 fermions with spin-1/2", "Hubbard model with t=1, U=4")
+        np.testing.assert_allclose(sector_spectrum(*specs, {"total_sz": "all"}), full_spectrum(*specs), atol=1e-10)
+
+    def test_sector_sparse(self):
+        """Test the sector matrix against NetKet on the constrained Hilbert space."""
+        lattice, hilbert, hamiltonian = schemas("chain of 8 sites", "spin-1/2 on each site",
+                                                "Heisenberg model with J=1")
+        graph = lattice.to_netket_graph()
+        hi = sector_hilbert(hilbert, graph, total_sz=1.0)
+        operator = hamiltonian.build_netket_hamiltonian(hi, graph, system_hilbert=hilbert)
+        states = basis_states(hi, hilbert, total_sz=1.0)
+        assert len(states) == hi.n_states
+        np.testing.assert_allclose(np.linalg.eigvalsh(sector_sparse(operator, states, hi.local_states).toarray()),
+                                   np.linalg.eigvalsh(operator.to_dense()), atol=1e-10)
+
+
+class TestSectorSpectrumTool:
+    """Test the sector path of the compute_energy_spectrum tool."""
+
+    @pytest.fixture(autouse=True)
+    def setup_server(self, tmp_path, monkeypatch):
+        """Point the server at a fresh storage directory with a Heisenberg chain."""
+        import mcp_server
+        from netket_jsons import NetKetJSONManager
+        monkeypatch.setattr(mcp_server, "json_manager", NetKetJSONManager(storage_dir=str(tmp_path)))
+        self.server = mcp_server
+        self.system_id = mcp_server.create_quantum_system("Heisenberg chain")["system_id"]
+        mcp_server.set_lattice(self.system_id, "chain of 8 sites")
+        mcp_server.set_hilbert_space(self.system_id, "spin-1/2 on each site")
+        mcp_server.set_hamiltonian(self.system_id, "Heisenberg model with J=1")
+        self.specs = schemas("chain of 8 sites", "spin-1/2 on each site", "Heisenberg model with J=1")
+
+    @pytest.mark.parametrize("which", ["SA", "LA"])
+    def test_which(self, which):
+        """Test that every sector and the merged levels hold the part of the spectrum `which` asks for."""
+        result = self.server.compute_energy_spectrum(self.system_id, num_eigenvalues=3, which=which,
+                                                     sectors={"total_sz": [0, 1]})
+        for sector in result["sectors"]:
+            block = sector_spectrum(*self.specs, {"total_sz": [sector["total_sz"]]})
+            expected = block[:3] if which == "SA" else block[-3:]
+            np.testing.assert_allclose(sector["eigenvalues"], expected, atol=1e-10)
+        merged = np.sort(np.concatenate([sector["eigenvalues"] for sector in result["sectors"]]))
+        np.testing.assert_allclose(result["eigenvalues"], merged[:3] if which == "SA" else merged[-3:], atol=1e-10)
+
+    def test_size_limit(self):
+        """Test that the size limit applies before momentum blocks are projected out, and says so."""
+        sector_list = parse_sectors({"total_sz": [0], "momentum": "all"}, *self.specs)
+        with pytest.raises(ValueError, match="do not lower its size; consider reducing system size"):
+            list(sector_matrices(*self.specs, sector_list, max_states=50))
+        sector_list = parse_sectors({"momentum": "all"}, *self.specs)
+        with pytest.raises(ValueError, match="consider adding total_sz sectors"):
+            list(sector_matrices(*self.specs, sector_list, max_states=50))
+
+
+class TestSectorValidation:
+    """Test that sectors are only used for conserved quantities."""
+
+    def test_transverse_field_breaks_total_sz(self):
+        """Test that a transverse field rules out total Sz sectors."""
+        specs = schemas("chain of 4 sites", "spin-1/2 on each site", "Ising model with Jz=1, hx=0.5")
+        with pytest.raises(ValueError):
+            parse_sectors({"total_sz": [0]}, *specs)
+
+    def test_local_field_breaks_translation(self):
+        """Test that the single-site hz term is detected as breaking translation invariance."""
+        specs = schemas("chain of 4 sites", "spin-1/2 on each site", "Ising model with Jz=1, hz=0.5")
+        sector_list = parse_sectors({"momentum": [0]}, *specs)
+        with pytest.raises(ValueError):
+            list(sector_matrices(*specs, sector_list, max_states=1e6))
+
+    def test_invalid_sectors(self):
+        """Test unknown sector kinds and impossible values."""
+        specs = schemas("chain of 4 sites", "spin-1/2 on each site", "Heisenberg model with J=1")
+        with pytest.raises(ValueError):
+            parse_sectors({"parity": [1]}, *specs)
+        with pytest.raises(ValueError):
+            parse_sectors({"total_sz": [0.5]}, *specs)
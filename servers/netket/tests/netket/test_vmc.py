@@ -0,0 +1,114 @@
+"""
+Simple tests for variational Monte Carlo - convergence, checkpoints and settings.
+"""
+
+import asyncio
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src" / "netket"))
+
+from netket_schemas import LatticeSchema, HilbertSpaceSchema, HamiltonianSchema
+from netket_vmc import VMC_CHECKPOINT, VMCSettings, build_sampler, run_vmc
+
+
+def build(lattice_text, hilbert_text, hamiltonian_text):
+    """Build the NetKet operator, Hilbert space and graph of a specification given as text."""
+    hilbert = HilbertSpaceSchema(text=hilbert_text)
+    graph = LatticeSchema(text=lattice_text).to_netket_graph()
+    hi = hilbert.to_netket_hilbert(graph)
+    H = HamiltonianSchema(text=hamiltonian_text).build_netket_hamiltonian(hi, graph, system_hilbert=hilbert)
+    return H, hi, graph
+
+
+class TestRunVMC:
+    """Test the VMC optimization on a small transverse-field Ising chain."""
+
+    @pytest.fixture(autouse=True)
+    def setup_system(self):
+        """Build a chain small enough to compare with exact diagonalization."""
+        self.H, self.hi, self.graph = build("chain of 6 sites", "spin-1/2 on each site",
+                                            "Ising model with Jz=1, hx=1.0")
+
+    def test_converges(self):
+        """Test that the variational energy approaches the exact ground state energy."""
+        progress = []
+        result = run_vmc(self.H, self.hi, self.graph, VMCSettings(n_iter=60, n_samples=512), "spec",
+                         progress=lambda *args: progress.append(args))
+        exact = np.linalg.eigvalsh(self.H.to_dense())[0]
+        assert result.energy == pytest.approx(exact, rel=1e-2)
+        assert result.iterations == 60
+        assert [args[0] for args in progress] == list(range(1, 61))
+        assert result.curves.energy[-1] < result.curves.energy[0]
+
+    def test_resume(self, tmp_path):
+        """Test that a run continues from the checkpoint of the same system and model."""
+        checkpoint = tmp_path / VMC_CHECKPOINT
+        first = run_vmc(self.H, self.hi, self.graph, VMCSettings(n_iter=10, n_samples=128), "spec",
+                        checkpoint_path=checkpoint, checkpoint_every=5)
+        assert checkpoint.exists()
+
+        resumed = run_vmc(self.H, self.hi, self.graph, VMCSettings(n_iter=15, n_samples=128), "spec",
+                          checkpoint_path=checkpoint)
+        assert resumed.resumed_from == 10
+        assert resumed.curves.iteration == list(range(1, 16))
+        assert resumed.curves.energy[:10] == first.curves.energy
+
+        # Another model or system starts over
+        other = run_vmc(self.H, self.hi, self.graph, VMCSettings(n_iter=5, n_samples=128, model="jastrow"),
+                        "spec", checkpoint_path=checkpoint)
+        assert other.resumed_from == 0
+        other = run_vmc(self.H, self.hi, self.graph, VMCSettings(n_iter=5, n_samples=128), "other spec",
+                        checkpoint_path=checkpoint)
+        assert other.resumed_from == 0
+
+
+class TestVMCSettings:
+    """Test the validation of VMC settings."""
+
+    def test_invalid_settings(self):
+        """Test unknown models and samplers and non-positive sizes."""
+        with pytest.raises(ValueError):
+            VMCSettings(model="transformer")
+        with pytest.raises(ValueError):
+            VMCSettings(sampler="gibbs")
+        with pytest.raises(ValueError):
+            VMCSettings(n_samples=0)
+
+    def test_fermion_sampler(self):
+        """Test that fermions are only moved by hopping."""
+        H, hi, graph = build("chain of 4 sites", "2 spinless fermions", "SSH model with t1=1, t2=0.3")
+        assert build_sampler("auto", hi, graph, H, n_chains=4).rule.__class__.__name__ == "FermionHopRule"
+        with pytest.raises(ValueError):
+            build_sampler("local", hi, graph, H, n_chains=4)
+
+
+class TestVariationalGroundStateTool:
+    """Test the variational_ground_state tool of the server."""
+
+    def test_evicted_during_run(self, tmp_path, monkeypatch):
+        """Test that the results are kept when other calls evict the system while VMC runs."""
+        import mcp_server
+        from netket_jsons import NetKetJSONManager
+        manager = NetKetJSONManager(storage_dir=str(tmp_path), max_loaded_systems=2)
+        monkeypatch.setattr(mcp_server, "json_manager", manager)
+        system_id = mcp_server.create_quantum_system("VMC system")["system_id"]
+        mcp_server.set_lattice(system_id, "chain of 6 sites")
+        mcp_server.set_hilbert_space(system_id, "spin-1/2 on each site")
+        mcp_server.set_hamiltonian(system_id, "Ising model with Jz=1, hx=1.0")
+
+        def run_and_evict(*args, **kwargs):
+            for i in range(2):
+                mcp_server.create_quantum_system(f"System {i}")
+            assert system_id not in manager.systems.loaded
+            return run_vmc(*args, **kwargs)
+
+        monkeypatch.setattr(mcp_server, "run_vmc", run_and_evict)
+        result = asyncio.run(mcp_server.variational_ground_state(system_id, n_iter=5, n_samples=128))
+
+        loaded = NetKetJSONManager(storage_dir=str(tmp_path)).load_system(system_id)
+        assert loaded.results["vmc_ground_state"]["energy"] == result["energy"]
+        assert len(loaded.results["vmc_ground_state"]["curves"]["energy"]) == 5
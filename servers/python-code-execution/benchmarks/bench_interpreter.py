@@ -0,0 +1,100 @@
+"""
+Micro-benchmarks for the sandboxed AST interpreter.
+
+Each snippet stays below MAX_OPERATIONS so that it measures the interpreter itself rather than the limit check.
+
+Usage:
+    python benchmarks/bench_interpreter.py [--repeat 20]
+"""
+import argparse
+import time
+
+from python_code_execution.local_python_executor import evaluate_python_code
+
+SNIPPETS = {
+    "numeric_loop": """
+total = 0
+for i in range(600):
+    total += i * i % 7
+print(total)
+""",
+    "while_loop": """
+n = 0
+x = 1.0
+while n < 500:
+    x = x * 1.0001 + 0.5
+    n += 1
+print(x)
+""",
+    "list_comprehension": """
+squares = [i * i for i in range(1500) if i % 3 == 0]
+print(len(squares))
+""",
+    "nested_comprehension": """
+grid = [[i + j for j in range(30)] for i in range(30)]
+print(sum(sum(row) for row in grid))
+""",
+    "function_calls": """
+def poly(x, a=1.0, b=2.0):
+    return a * x * x + b * x + 1
+
+values = [poly(i) for i in range(400)]
+print(sum(values))
+""",
+    "scientific_imports": """
+import numpy as np
+import matplotlib.pyplot as plt
+from numpy import linalg
+print(np.pi, linalg.norm([3, 4]))
+""",
+    "recursion": """
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+print(fib(13))
+""",
+}
+
+
+# Snippets run against a pre-populated state, to check that calls and comprehensions do not scale with its size
+LARGE_STATE_SNIPPETS = {
+    "large_state_comprehension": """
+values = [i * 2 for i in range(1500)]
+print(len(values))
+""",
+    "large_state_function_calls": """
+def inc(x):
+    return x + 1
+
+print(sum(inc(i) for i in range(800)))
+""",
+}
+LARGE_STATE_SIZE = 20000
+
+
+def bench(code: str, repeat: int, state_size: int = 0) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        state = {f"var_{i}": i for i in range(state_size)}
+        start = time.perf_counter()
+        output, _ = evaluate_python_code(code, state=state)
+        best = min(best, time.perf_counter() - start)
+    assert "failed" not in output, output
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sandboxed interpreter")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per snippet (best time is reported)")
+    args = parser.parse_args()
+
+    print(f"{'snippet':<28}{'best (ms)':>12}")
+    for name, code in SNIPPETS.items():
+        print(f"{name:<28}{bench(code, args.repeat) * 1000:>12.2f}")
+    for name, code in LARGE_STATE_SNIPPETS.items():
+        print(f"{name:<28}{bench(code, args.repeat, LARGE_STATE_SIZE) * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
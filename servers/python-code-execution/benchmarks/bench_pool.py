@@ -0,0 +1,92 @@
+"""
+Benchmarks for the latency of a call on a fresh subprocess against a call on a warm pool worker.
+
+The cold path starts `python -m python_code_execution.safe_execute`, as the server does per call with `--pool-size 0`
+(without the overhead of `uv run`), so every call pays for the interpreter start-up and the imports. The warm path
+sends the job to a worker of a `WorkerPool` that has already imported the heavy libraries.
+
+Usage:
+    python benchmarks/bench_pool.py [--repeat 5]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from python_code_execution.schemas import BASE_BUILTIN_MODULES, DEFAULT_MAX_LEN_OUTPUT, EXECUTION_TIMEOUT_SEC
+from python_code_execution.worker_pool import WorkerPool
+
+SNIPPETS = {
+    "print": """
+print(sum(i * i for i in range(100)))
+""",
+    "numpy": """
+import numpy as np
+a = np.random.rand(200, 200)
+print(float(np.linalg.norm(np.dot(a, a))))
+""",
+    "matplotlib": """
+import numpy as np
+import matplotlib.pyplot as plt
+fig, ax = plt.subplots()
+x = np.linspace(0, 10, 200)
+ax.plot(x, np.sin(x))
+send_image_to_client(fig)
+""",
+}
+
+
+async def cold_call(code: str) -> float:
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "python_code_execution.safe_execute", "--code", code,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await asyncio.wait_for(process.communicate(), EXECUTION_TIMEOUT_SEC)
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0 or "Error" in stdout.decode():
+        raise RuntimeError(f"safe-execute failed: {stdout.decode()}{stderr.decode()}")
+    return elapsed
+
+
+async def warm_call(pool: WorkerPool, code: str) -> float:
+    job = {
+        "code": code,
+        "authorized_imports": BASE_BUILTIN_MODULES,
+        "max_print_length": DEFAULT_MAX_LEN_OUTPUT,
+        "max_memory_mb": 100,
+        "max_cpu_time_sec": 15,
+    }
+    start = time.perf_counter()
+    reply = await pool.execute(job, EXECUTION_TIMEOUT_SEC)
+    elapsed = time.perf_counter() - start
+    if "Error" in reply["text"]:
+        raise RuntimeError(f"Warm worker failed: {reply['text']}")
+    return elapsed
+
+
+async def run(repeat: int) -> None:
+    pool = await WorkerPool.start(1)
+    try:
+        # The first job of a worker waits for its warm-up imports; the pool is ready before the server takes calls
+        await warm_call(pool, "print(1)")
+
+        print(f"{'snippet':<14}{'cold (ms)':>12}{'warm (ms)':>12}{'speedup':>10}")
+        for name, code in SNIPPETS.items():
+            cold = min([await cold_call(code) for _ in range(repeat)])
+            warm = min([await warm_call(pool, code) for _ in range(repeat)])
+            print(f"{name:<14}{cold * 1000:>12.1f}{warm * 1000:>12.1f}{cold / warm:>10.1f}")
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold subprocess calls against warm pool workers")
+    parser.add_argument("--repeat", type=int, default=5, help="Calls per case (best time is reported)")
+    args = parser.parse_args()
+    asyncio.run(run(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmarks for moving large figures from a sandbox worker to the MCP boundary.
+
+Compares the JSON-with-base64 output of safe-execute with the framed binary messages used by the worker pool, for
+figures of several megabytes, then runs a large matplotlib figure end to end through a warm worker.
+
+Usage:
+    python benchmarks/bench_protocol.py [--repeat 10]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+import uuid
+
+from mcp.types import EmbeddedResource, TextResourceContents
+
+from python_code_execution.protocol import decode_result, encode_result, read_message, write_message
+from python_code_execution.safe_execute import build_output
+from python_code_execution.schemas import EXECUTION_TIMEOUT_SEC, FigureImage
+from python_code_execution.server import to_mcp_content
+from python_code_execution.worker_pool import WorkerPool
+
+FIGURE_SIZES_MB = [1, 4, 16]
+
+LARGE_FIGURE_CODE = """
+import numpy as np
+import matplotlib.pyplot as plt
+fig, ax = plt.subplots(figsize=(20, 20), dpi=100)
+ax.imshow(np.random.rand(1000, 1000))
+send_image_to_client(fig)
+"""
+
+
+def make_images(size_mb: int) -> list:
+    # Random bytes do not compress, like the noisy parts of real figures
+    return [
+        EmbeddedResource(
+            type="resource",
+            resource=TextResourceContents(
+                uri=f"project://{uuid.uuid4()}",
+                text="[" + "0.123456789," * (size_mb * 1024 * 1024 // 12) + "0]",
+                mimeType="application/json"
+            ),
+            extra_type="plotly",
+        ),
+        FigureImage(data=os.urandom(size_mb * 1024 * 1024)),
+    ]
+
+
+def json_round_trip(images: list) -> list:
+    message = json.dumps(build_output("done", images))
+    return to_mcp_content(json.loads(message))
+
+
+def framed_round_trip(images: list) -> list:
+    stream = io.BytesIO()
+    header, payloads = encode_result("done", images)
+    write_message(stream, header, payloads)
+    stream.seek(0)
+    return to_mcp_content(decode_result(*read_message(stream)))
+
+
+def best_of(repeat: int, func, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def end_to_end(repeat: int) -> float:
+    pool = await WorkerPool.start(1)
+    try:
+        best = float("inf")
+        for _ in range(repeat):
+            job = {
+                "code": LARGE_FIGURE_CODE,
+                "authorized_imports": ["numpy", "matplotlib"],
+                "max_print_length": 1000,
+                "max_memory_mb": 100,
+                "max_cpu_time_sec": 15,
+            }
+            start = time.perf_counter()
+            content = to_mcp_content(await pool.execute(job, EXECUTION_TIMEOUT_SEC))
+            best = min(best, time.perf_counter() - start)
+        assert any(item.type == "image" for item in content), content
+        return best
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the worker result channel")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per case (best time is reported)")
+    args = parser.parse_args()
+
+    print(f"{'figure size':<16}{'json (ms)':>12}{'framed (ms)':>14}")
+    for size_mb in FIGURE_SIZES_MB:
+        images = make_images(size_mb)
+        json_time = best_of(args.repeat, json_round_trip, images)
+        framed_time = best_of(args.repeat, framed_round_trip, images)
+        print(f"{f'{size_mb} MB':<16}{json_time * 1000:>12.2f}{framed_time * 1000:>14.2f}")
+
+    print(f"\nlarge matplotlib figure through a warm worker: {asyncio.run(end_to_end(args.repeat)) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,50 @@
 from .server import serve
+from .schemas import (
+    DEFAULT_CACHE_SIZE_MB,
+    DEFAULT_MAX_CONCURRENT_EXECUTIONS,
+    DEFAULT_MAX_JOBS_PER_WORKER,
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_SESSION_IDLE_TIMEOUT_SEC,
+    DEFAULT_SESSION_MEMORY_MB,
+    DEFAULT_WARM_IMPORTS,
+)
+import argparse
 import asyncio
 
 def main() -> None:
-    asyncio.run(serve())
+    parser = argparse.ArgumentParser(description="Python code execution MCP server")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help="Number of warm sandbox workers (0 runs every call in a fresh process)")
+    parser.add_argument("--max-jobs-per-worker", type=int, default=DEFAULT_MAX_JOBS_PER_WORKER,
+                        help="Recycle a worker after this many jobs")
+    parser.add_argument("--warm-imports", type=str, nargs="*", default=DEFAULT_WARM_IMPORTS,
+                        help="Modules every worker imports before accepting jobs")
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS,
+                        help="Maximum number of persistent sessions (0 disables sessions)")
+    parser.add_argument("--session-idle-timeout", type=float, default=DEFAULT_SESSION_IDLE_TIMEOUT_SEC,
+                        help="Discard a session after this many seconds without calls")
+    parser.add_argument("--session-memory-mb", type=float, default=DEFAULT_SESSION_MEMORY_MB,
+                        help="Reset a session whose worker grows beyond this many MB")
+    parser.add_argument("--max-concurrent-executions", type=int, default=DEFAULT_MAX_CONCURRENT_EXECUTIONS,
+                        help="Maximum number of executions running at the same time")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help="Cache the results of deterministic executions in this directory (disabled by default)")
+    parser.add_argument("--cache-size-mb", type=float, default=DEFAULT_CACHE_SIZE_MB,
+                        help="Evict the least recently used cached results beyond this size")
+    args = parser.parse_args()
+
+    asyncio.run(serve(
+        pool_size=args.pool_size,
+        max_jobs_per_worker=args.max_jobs_per_worker,
+        warm_imports=args.warm_imports,
+        max_sessions=args.max_sessions,
+        session_idle_timeout_sec=args.session_idle_timeout,
+        session_memory_mb=args.session_memory_mb,
+        max_concurrent_executions=args.max_concurrent_executions,
+        cache_dir=args.cache_dir,
+        cache_size_mb=args.cache_size_mb,
+    ))
 
 if __name__ == "__main__":
     main()
@@ -8,16 +8,18 @@ import builtins
 import difflib
 import inspect
 import logging
+import operator
 import resource
 import sys
 import re
+from collections import deque
 from collections.abc import Mapping
 from functools import wraps
 from importlib import import_module
 from types import BuiltinFunctionType, FunctionType, ModuleType
 from typing import Any, Callable, Dict, List, Optional, Set
-from .schemas import MAX_LENGTH_TRUNCATE_CONTENT, MAX_OPERATIONS, MAX_WHILE_ITERATIONS, BASE_BUILTIN_MODULES, DEFAULT_MAX_LEN_OUTPUT, DANGEROUS_FUNCTIONS, BASE_PYTHON_TOOLS, send_image_to_client
-from mcp.types import ImageContent, EmbeddedResource
+from .schemas import MAX_LENGTH_TRUNCATE_CONTENT, MAX_OPERATIONS, MAX_WHILE_ITERATIONS, BASE_BUILTIN_MODULES, DEFAULT_MAX_LEN_OUTPUT, DANGEROUS_FUNCTIONS, BASE_PYTHON_TOOLS, FigureImage, send_image_to_client
+from mcp.types import EmbeddedResource
 logger = logging.getLogger(__name__)
 
 
@@ -37,30 +39,142 @@ ERRORS = {
 }
 
 
+BINARY_OPERATORS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.FloorDiv: operator.floordiv,
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+}
+
+INPLACE_OPERATORS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.iadd,
+    ast.Sub: operator.isub,
+    ast.Mult: operator.imul,
+    ast.Div: operator.itruediv,
+    ast.Mod: operator.imod,
+    ast.Pow: operator.ipow,
+    ast.FloorDiv: operator.ifloordiv,
+    ast.BitAnd: operator.iand,
+    ast.BitOr: operator.ior,
+    ast.BitXor: operator.ixor,
+    ast.LShift: operator.ilshift,
+    ast.RShift: operator.irshift,
+}
+
+UNARY_OPERATORS: Dict[type, Callable[[Any], Any]] = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+    ast.Invert: operator.invert,
+}
+
+COMPARISON_OPERATORS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+}
+
+
+def truncation_notice(max_length: int) -> str:
+    return f"\n..._This content has been truncated to stay below {max_length} characters_...\n"
+
+
 def truncate_content(content: str, max_length: int = MAX_LENGTH_TRUNCATE_CONTENT) -> str:
     if len(content) <= max_length:
         return content
     else:
         return (
             content[: max_length // 2]
-            + f"\n..._This content has been truncated to stay below {max_length} characters_...\n"
+            + truncation_notice(max_length)
             + content[-max_length // 2:]
         )
 
 
+def resource_limit_message(error: str) -> str:
+    return (
+        f"\n⚠️ RESOURCE LIMIT EXCEEDED ⚠️\n"
+        f"This tool is meant for basic scientific calculations only.\n"
+        f"Attempting to bypass resource limits or execute malicious code may result in account termination.\n"
+        f"Error: {error}"
+    )
+
+
 class PrintContainer:
-    def __init__(self):
-        self.value = ""
-        self.images: list[ImageContent] = []
+    """
+    Print outputs of an evaluation, truncated like truncate_content as they are written.
+
+    Only the first `max_length // 2` characters and a ring buffer with the last ones are retained, so memory stays
+    flat however much a loop prints.
+    """
+
+    def __init__(
+        self,
+        on_write: Optional[Callable[[str], None]] = None,
+        max_length: int = DEFAULT_MAX_LEN_OUTPUT,
+    ):
+        self.max_length = max_length
+        self.head = ""
+        self.tail: deque[str] = deque()
+        self.tail_length = 0
+        self.total_length = 0
+        self.images: list[FigureImage | EmbeddedResource] = []
+        # Called with every piece of text as it is printed, e.g. to stream it to the client
+        self.on_write = on_write
+
+    def write(self, text: str) -> None:
+        """Retain text without passing it to on_write."""
+        self.total_length += len(text)
+        room = self.max_length // 2 - len(self.head)
+        if room > 0:
+            self.head += text[:room]
+            text = text[room:]
+        if not text:
+            return
+        self.tail.append(text)
+        self.tail_length += len(text)
+        # Drop the oldest text beyond the (max_length + 1) // 2 characters kept at the end
+        excess = self.tail_length - (self.max_length + 1) // 2
+        while excess > 0:
+            oldest = self.tail[0]
+            if len(oldest) <= excess:
+                self.tail.popleft()
+                self.tail_length -= len(oldest)
+                excess -= len(oldest)
+            else:
+                self.tail[0] = oldest[excess:]
+                self.tail_length -= excess
+                excess = 0
 
     def append(self, text):
-        self.value += text
+        self.write(text)
+        if self.on_write is not None:
+            self.on_write(text)
         return self
 
     def __iadd__(self, other):
         """Implements the += operator"""
-        self.value += str(other)
-        return self
+        return self.append(str(other))
+
+    @property
+    def value(self) -> str:
+        if self.total_length <= self.max_length:
+            return self.head + "".join(self.tail)
+        return self.head + truncation_notice(self.max_length) + "".join(self.tail)
 
     def __str__(self):
         """String representation"""
@@ -72,7 +186,65 @@ class PrintContainer:
 
     def __len__(self):
         """Implements len() function support"""
-        return len(self.value)
+        return self.total_length
+
+
+class Scope(dict):
+    """
+    A variable scope layered on top of its enclosing scope, used for function calls, lambdas and comprehensions.
+
+    Names assigned in the scope are stored locally while reads fall through to the enclosing scopes, so creating a
+    scope costs O(1) instead of copying the whole enclosing state. Deleting a name only removes a local binding.
+    """
+
+    # Interpreter bookkeeping shared by every scope, bound locally so that the per-node lookups stay O(1)
+    SHARED_KEYS = ("_print_outputs", "_operations_count")
+
+    def __init__(self, parent: Dict[str, Any]):
+        super().__init__()
+        self.parent = parent
+        for key in self.SHARED_KEYS:
+            if key in parent:
+                dict.__setitem__(self, key, parent[key])
+
+    def _find(self, key) -> Optional[Dict[str, Any]]:
+        """Return the innermost scope binding the name, or None."""
+        scope = self
+        while isinstance(scope, Scope):
+            if dict.__contains__(scope, key):
+                return scope
+            scope = scope.parent
+        return scope if key in scope else None
+
+    def __missing__(self, key):
+        scope = self._find(key)
+        if scope is None:
+            raise KeyError(key)
+        return dict.__getitem__(scope, key) if isinstance(scope, Scope) else scope[key]
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __delitem__(self, key):
+        if not self.defines(key):
+            raise InterpreterError(
+                f"Cannot delete name '{key}': it is not defined in the current scope")
+        dict.__delitem__(self, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def keys(self):
+        return set(dict.keys(self)) | set(self.parent.keys())
+
+    def defines(self, key) -> bool:
+        """Whether the name is bound in this scope itself rather than in an enclosing one."""
+        return dict.__contains__(self, key)
 
 
 class BreakException(Exception):
@@ -195,17 +367,11 @@ def evaluate_unaryop(
 ) -> Any:
     operand = evaluate_ast(expression.operand, state,
                            static_tools, custom_tools, authorized_imports)
-    if isinstance(expression.op, ast.USub):
-        return -operand
-    elif isinstance(expression.op, ast.UAdd):
-        return operand
-    elif isinstance(expression.op, ast.Not):
-        return not operand
-    elif isinstance(expression.op, ast.Invert):
-        return ~operand
-    else:
+    unary_operator = UNARY_OPERATORS.get(type(expression.op))
+    if unary_operator is None:
         raise InterpreterError(
             f"Unary operation {expression.op.__class__.__name__} is not supported.")
+    return unary_operator(operand)
 
 
 def evaluate_lambda(
@@ -216,11 +382,19 @@ def evaluate_lambda(
     authorized_imports: List[str],
 ) -> Callable:
     args = [arg.arg for arg in lambda_expression.args.args]
+    # Default values are evaluated once, when the lambda is created, as in Python
+    default_values = [
+        evaluate_ast(d, state, static_tools, custom_tools, authorized_imports) for d in lambda_expression.args.defaults
+    ]
+    defaults = dict(zip(args[len(args) - len(default_values):], default_values))
 
     def lambda_func(*values: Any) -> Any:
-        new_state = state.copy()
+        new_state = Scope(state)
         for arg, value in zip(args, values):
             new_state[arg] = value
+        for arg, value in defaults.items():
+            if not new_state.defines(arg):
+                new_state[arg] = value
         return evaluate_ast(
             lambda_expression.body,
             new_state,
@@ -264,16 +438,15 @@ def create_function(
     authorized_imports: List[str],
 ) -> Callable:
     source_code = ast.unparse(func_def)
+    arg_names = [arg.arg for arg in func_def.args.args]
+    # Default values are evaluated once, when the function is defined, as in Python
+    default_values = [
+        evaluate_ast(d, state, static_tools, custom_tools, authorized_imports) for d in func_def.args.defaults
+    ]
+    defaults = dict(zip(arg_names[len(arg_names) - len(default_values):], default_values))
 
     def new_func(*args: Any, **kwargs: Any) -> Any:
-        func_state = state.copy()
-        arg_names = [arg.arg for arg in func_def.args.args]
-        default_values = [
-            evaluate_ast(d, state, static_tools, custom_tools, authorized_imports) for d in func_def.args.defaults
-        ]
-
-        # Apply default values
-        defaults = dict(zip(arg_names[-len(default_values):], default_values))
+        func_state = Scope(state)
 
         # Set positional arguments
         for name, value in zip(arg_names, args):
@@ -294,7 +467,7 @@ def create_function(
 
         # Set default values for arguments that were not provided
         for name, value in defaults.items():
-            if name not in func_state:
+            if not func_state.defines(name):
                 func_state[name] = value
 
         # Update function state with self and __class__
@@ -411,39 +584,14 @@ def evaluate_augassign(
     value_to_add = evaluate_ast(
         expression.value, state, static_tools, custom_tools, authorized_imports)
 
-    if isinstance(expression.op, ast.Add):
-        if isinstance(current_value, list):
-            if not isinstance(value_to_add, list):
-                raise InterpreterError(
-                    f"Cannot add non-list value {value_to_add} to a list.")
-            current_value += value_to_add
-        else:
-            current_value += value_to_add
-    elif isinstance(expression.op, ast.Sub):
-        current_value -= value_to_add
-    elif isinstance(expression.op, ast.Mult):
-        current_value *= value_to_add
-    elif isinstance(expression.op, ast.Div):
-        current_value /= value_to_add
-    elif isinstance(expression.op, ast.Mod):
-        current_value %= value_to_add
-    elif isinstance(expression.op, ast.Pow):
-        current_value **= value_to_add
-    elif isinstance(expression.op, ast.FloorDiv):
-        current_value //= value_to_add
-    elif isinstance(expression.op, ast.BitAnd):
-        current_value &= value_to_add
-    elif isinstance(expression.op, ast.BitOr):
-        current_value |= value_to_add
-    elif isinstance(expression.op, ast.BitXor):
-        current_value ^= value_to_add
-    elif isinstance(expression.op, ast.LShift):
-        current_value <<= value_to_add
-    elif isinstance(expression.op, ast.RShift):
-        current_value >>= value_to_add
-    else:
+    inplace_operator = INPLACE_OPERATORS.get(type(expression.op))
+    if inplace_operator is None:
         raise InterpreterError(
             f"Operation {type(expression.op).__name__} is not supported.")
+    if isinstance(expression.op, ast.Add) and isinstance(current_value, list) and not isinstance(value_to_add, list):
+        raise InterpreterError(
+            f"Cannot add non-list value {value_to_add} to a list.")
+    current_value = inplace_operator(current_value, value_to_add)
 
     # Update the state: current_value has been updated in-place
     set_value(
@@ -491,33 +639,11 @@ def evaluate_binop(
         binop.right, state, static_tools, custom_tools, authorized_imports)
 
     # Determine the operation based on the type of the operator in the BinOp
-    if isinstance(binop.op, ast.Add):
-        return left_val + right_val
-    elif isinstance(binop.op, ast.Sub):
-        return left_val - right_val
-    elif isinstance(binop.op, ast.Mult):
-        return left_val * right_val
-    elif isinstance(binop.op, ast.Div):
-        return left_val / right_val
-    elif isinstance(binop.op, ast.Mod):
-        return left_val % right_val
-    elif isinstance(binop.op, ast.Pow):
-        return left_val**right_val
-    elif isinstance(binop.op, ast.FloorDiv):
-        return left_val // right_val
-    elif isinstance(binop.op, ast.BitAnd):
-        return left_val & right_val
-    elif isinstance(binop.op, ast.BitOr):
-        return left_val | right_val
-    elif isinstance(binop.op, ast.BitXor):
-        return left_val ^ right_val
-    elif isinstance(binop.op, ast.LShift):
-        return left_val << right_val
-    elif isinstance(binop.op, ast.RShift):
-        return left_val >> right_val
-    else:
+    binary_operator = BINARY_OPERATORS.get(type(binop.op))
+    if binary_operator is None:
         raise NotImplementedError(
             f"Binary operation {type(binop.op).__name__} is not implemented.")
+    return binary_operator(left_val, right_val)
 
 
 def evaluate_assign(
@@ -667,8 +793,8 @@ def evaluate_call(
         state["_print_outputs"] += " ".join(map(str, args)) + "\n"
         return None
     elif func_name == "send_image_to_client":
-        image_content: list[ImageContent |
-                            EmbeddedResource] = send_image_to_client(args[0])
+        image_content: list[FigureImage |
+                            EmbeddedResource] = send_image_to_client(*args, **kwargs)
         state["_print_outputs"].images.extend(image_content)
         return None
     else:  # Assume it's a callable object
@@ -709,9 +835,11 @@ def evaluate_name(
     custom_tools: Dict[str, Callable],
     authorized_imports: List[str],
 ) -> Any:
-    if name.id in state:
+    try:
         return state[name.id]
-    elif name.id in static_tools:
+    except KeyError:
+        pass
+    if name.id in static_tools:
         return static_tools[name.id]
     elif name.id in custom_tools:
         return custom_tools[name.id]
@@ -734,31 +862,12 @@ def evaluate_condition(
     left = evaluate_ast(condition.left, state, static_tools,
                         custom_tools, authorized_imports)
     for i, (op, comparator) in enumerate(zip(condition.ops, condition.comparators)):
-        op = type(op)
         right = evaluate_ast(comparator, state, static_tools,
                              custom_tools, authorized_imports)
-        if op == ast.Eq:
-            current_result = left == right
-        elif op == ast.NotEq:
-            current_result = left != right
-        elif op == ast.Lt:
-            current_result = left < right
-        elif op == ast.LtE:
-            current_result = left <= right
-        elif op == ast.Gt:
-            current_result = left > right
-        elif op == ast.GtE:
-            current_result = left >= right
-        elif op == ast.Is:
-            current_result = left is right
-        elif op == ast.IsNot:
-            current_result = left is not right
-        elif op == ast.In:
-            current_result = left in right
-        elif op == ast.NotIn:
-            current_result = left not in right
-        else:
-            raise InterpreterError(f"Unsupported comparison operator: {op}")
+        comparison_operator = COMPARISON_OPERATORS.get(type(op))
+        if comparison_operator is None:
+            raise InterpreterError(f"Unsupported comparison operator: {type(op)}")
+        current_result = comparison_operator(left, right)
 
         if current_result is False:
             return False
@@ -827,24 +936,23 @@ def evaluate_for(
     return result
 
 
-def evaluate_listcomp(
-    listcomp: ast.ListComp,
+def iterate_comprehension(
+    generators: List[ast.comprehension],
     state: Dict[str, Any],
     static_tools: Dict[str, Callable],
     custom_tools: Dict[str, Callable],
     authorized_imports: List[str],
-) -> List[Any]:
-    def inner_evaluate(generators: List[ast.comprehension], index: int, current_state: Dict[str, Any]) -> List[Any]:
+):
+    """
+    Yield the scope of every combination of the comprehension targets that passes all `if` clauses.
+
+    Each generator level gets a single scope layered on top of the enclosing one and rebinds its target in place,
+    so iterating does not copy the enclosing state.
+    """
+    def inner_iterate(index: int, current_state: Dict[str, Any]):
         if index >= len(generators):
-            return [
-                evaluate_ast(
-                    listcomp.elt,
-                    current_state,
-                    static_tools,
-                    custom_tools,
-                    authorized_imports,
-                )
-            ]
+            yield current_state
+            return
         generator = generators[index]
         iter_value = evaluate_ast(
             generator.iter,
@@ -853,23 +961,38 @@ def evaluate_listcomp(
             custom_tools,
             authorized_imports,
         )
-        result = []
+        new_state = Scope(current_state)
         for value in iter_value:
-            new_state = current_state.copy()
-            if isinstance(generator.target, ast.Tuple):
-                for idx, elem in enumerate(generator.target.elts):
-                    new_state[elem.id] = value[idx]
-            else:
-                new_state[generator.target.id] = value
+            set_value(
+                generator.target,
+                value,
+                new_state,
+                static_tools,
+                custom_tools,
+                authorized_imports,
+            )
             if all(
                 evaluate_ast(if_clause, new_state, static_tools,
                              custom_tools, authorized_imports)
                 for if_clause in generator.ifs
             ):
-                result.extend(inner_evaluate(generators, index + 1, new_state))
-        return result
+                yield from inner_iterate(index + 1, new_state)
 
-    return inner_evaluate(listcomp.generators, 0, state)
+    return inner_iterate(0, state)
+
+
+def evaluate_listcomp(
+    listcomp: ast.ListComp,
+    state: Dict[str, Any],
+    static_tools: Dict[str, Callable],
+    custom_tools: Dict[str, Callable],
+    authorized_imports: List[str],
+) -> List[Any]:
+    return [
+        evaluate_ast(listcomp.elt, scope, static_tools,
+                     custom_tools, authorized_imports)
+        for scope in iterate_comprehension(listcomp.generators, state, static_tools, custom_tools, authorized_imports)
+    ]
 
 
 def evaluate_setcomp(
@@ -879,34 +1002,11 @@ def evaluate_setcomp(
     custom_tools: Dict[str, Callable],
     authorized_imports: List[str],
 ) -> Set[Any]:
-    result = set()
-    for gen in setcomp.generators:
-        iter_value = evaluate_ast(
-            gen.iter, state, static_tools, custom_tools, authorized_imports)
-        for value in iter_value:
-            new_state = state.copy()
-            set_value(
-                gen.target,
-                value,
-                new_state,
-                static_tools,
-                custom_tools,
-                authorized_imports,
-            )
-            if all(
-                evaluate_ast(if_clause, new_state, static_tools,
-                             custom_tools, authorized_imports)
-                for if_clause in gen.ifs
-            ):
-                element = evaluate_ast(
-                    setcomp.elt,
-                    new_state,
-                    static_tools,
-                    custom_tools,
-                    authorized_imports,
-                )
-                result.add(element)
-    return result
+    return {
+        evaluate_ast(setcomp.elt, scope, static_tools,
+                     custom_tools, authorized_imports)
+        for scope in iterate_comprehension(setcomp.generators, state, static_tools, custom_tools, authorized_imports)
+    }
 
 
 def evaluate_try(
@@ -1027,42 +1127,55 @@ def evaluate_with(
             context.__exit__(None, None, None)
 
 
-def get_safe_module(raw_module, authorized_imports, visited=None):
-    """Creates a safe copy of a module or returns the original if it's a function"""
-    # If it's a function or non-module object, return it directly
-    if not isinstance(raw_module, ModuleType):
-        return raw_module
+class SafeModule(ModuleType):
+    """
+    A lazy, read-only view of a module.
 
-    # Handle circular references: Initialize visited set for the first call
-    if visited is None:
-        visited = set()
+    Attributes are fetched from the wrapped module on first access and remembered on the view, and nested modules
+    are returned as views themselves. Views are shared by every piece of code run in the process, so assigning or
+    deleting attributes is refused instead of leaking into later executions.
+    """
 
-    module_id = id(raw_module)
-    if module_id in visited:
-        return raw_module  # Return original for circular refs
+    def __init__(self, raw_module: ModuleType, authorized_imports: List[str]):
+        super().__init__(raw_module.__name__, raw_module.__doc__)
+        object.__setattr__(self, "_raw_module", raw_module)
+        object.__setattr__(self, "_authorized_imports", authorized_imports)
 
-    visited.add(module_id)
+    def __getattr__(self, attr_name):
+        # Only called when the attribute has not been resolved on the view yet
+        value = getattr(self._raw_module, attr_name)
+        if isinstance(value, ModuleType):
+            value = get_safe_module(value, self._authorized_imports)
+        self.__dict__[attr_name] = value
+        return value
 
-    # Create new module for actual modules
-    safe_module = ModuleType(raw_module.__name__)
+    def __setattr__(self, attr_name, value):
+        raise InterpreterError(
+            f"Cannot assign attribute {attr_name} of module {self.__name__}")
 
-    # Copy all attributes by reference, recursively checking modules
-    for attr_name in dir(raw_module):
-        try:
-            attr_value = getattr(raw_module, attr_name)
-        except (ImportError, AttributeError) as e:
-            # lazy / dynamic loading module -> INFO log and skip
-            logger.info(
-                f"Skipping import error while copying {raw_module.__name__}.{attr_name}: {type(e).__name__} - {e}"
-            )
-            continue
-        # Recursively process nested modules, passing visited set
-        if isinstance(attr_value, ModuleType):
-            attr_value = get_safe_module(
-                attr_value, authorized_imports, visited=visited)
+    def __delattr__(self, attr_name):
+        raise InterpreterError(
+            f"Cannot delete attribute {attr_name} of module {self.__name__}")
+
+    def __dir__(self):
+        return dir(self._raw_module)
 
-        setattr(safe_module, attr_name, attr_value)
 
+# Process-wide cache of module views keyed by module name and authorized imports
+SAFE_MODULE_CACHE: Dict[tuple, SafeModule] = {}
+
+
+def get_safe_module(raw_module, authorized_imports):
+    """Returns a cached safe view of a module or returns the original if it's a function"""
+    # If it's a function or non-module object, return it directly
+    if not isinstance(raw_module, ModuleType) or isinstance(raw_module, SafeModule):
+        return raw_module
+
+    cache_key = (raw_module.__name__, frozenset(authorized_imports))
+    safe_module = SAFE_MODULE_CACHE.get(cache_key)
+    if safe_module is None or safe_module._raw_module is not raw_module:
+        safe_module = SafeModule(raw_module, authorized_imports)
+        SAFE_MODULE_CACHE[cache_key] = safe_module
     return safe_module
 
 
@@ -1138,39 +1251,11 @@ def evaluate_dictcomp(
     authorized_imports: List[str],
 ) -> Dict[Any, Any]:
     result = {}
-    for gen in dictcomp.generators:
-        iter_value = evaluate_ast(
-            gen.iter, state, static_tools, custom_tools, authorized_imports)
-        for value in iter_value:
-            new_state = state.copy()
-            set_value(
-                gen.target,
-                value,
-                new_state,
-                static_tools,
-                custom_tools,
-                authorized_imports,
-            )
-            if all(
-                evaluate_ast(if_clause, new_state, static_tools,
-                             custom_tools, authorized_imports)
-                for if_clause in gen.ifs
-            ):
-                key = evaluate_ast(
-                    dictcomp.key,
-                    new_state,
-                    static_tools,
-                    custom_tools,
-                    authorized_imports,
-                )
-                val = evaluate_ast(
-                    dictcomp.value,
-                    new_state,
-                    static_tools,
-                    custom_tools,
-                    authorized_imports,
-                )
-                result[key] = val
+    for scope in iterate_comprehension(dictcomp.generators, state, static_tools, custom_tools, authorized_imports):
+        key = evaluate_ast(dictcomp.key, scope, static_tools,
+                           custom_tools, authorized_imports)
+        result[key] = evaluate_ast(
+            dictcomp.value, scope, static_tools, custom_tools, authorized_imports)
     return result
 
 
@@ -1214,6 +1299,97 @@ def evaluate_delete(
                 f"Deletion of {type(target).__name__} targets is not supported")
 
 
+def evaluate_constant(expression: ast.Constant, *_) -> Any:
+    # Constant -> just return the value
+    return expression.value
+
+
+def evaluate_tuple(expression: ast.Tuple, *common_params) -> tuple:
+    return tuple(evaluate_ast(elt, *common_params) for elt in expression.elts)
+
+
+def evaluate_list(expression: ast.List, *common_params) -> List[Any]:
+    # List -> evaluate all elements
+    return [evaluate_ast(elt, *common_params) for elt in expression.elts]
+
+
+def evaluate_set(expression: ast.Set, *common_params) -> Set[Any]:
+    return set(evaluate_ast(elt, *common_params) for elt in expression.elts)
+
+
+def evaluate_dict(expression: ast.Dict, *common_params) -> Dict[Any, Any]:
+    # Dict -> evaluate all keys and values
+    keys = (evaluate_ast(k, *common_params) for k in expression.keys)
+    values = (evaluate_ast(v, *common_params) for v in expression.values)
+    return dict(zip(keys, values))
+
+
+def evaluate_wrapped_value(expression: ast.Expr | ast.Starred, *common_params) -> Any:
+    # Expression / starred -> evaluate the content
+    return evaluate_ast(expression.value, *common_params)
+
+
+def evaluate_formatted_value(expression: ast.FormattedValue, *common_params) -> Any:
+    # Formatted value (part of f-string) -> evaluate the content and format it
+    value = evaluate_ast(expression.value, *common_params)
+    # Early return if no format spec
+    if not expression.format_spec:
+        return value
+    # Apply format specification
+    format_spec = evaluate_ast(expression.format_spec, *common_params)
+    return format(value, format_spec)
+
+
+def evaluate_joined_str(expression: ast.JoinedStr, *common_params) -> str:
+    return "".join([str(evaluate_ast(v, *common_params)) for v in expression.values])
+
+
+def evaluate_ifexp(expression: ast.IfExp, *common_params) -> Any:
+    test_val = evaluate_ast(expression.test, *common_params)
+    if test_val:
+        return evaluate_ast(expression.body, *common_params)
+    else:
+        return evaluate_ast(expression.orelse, *common_params)
+
+
+def evaluate_slice(expression: ast.Slice, *common_params) -> slice:
+    return slice(
+        evaluate_ast(
+            expression.lower, *common_params) if expression.lower is not None else None,
+        evaluate_ast(
+            expression.upper, *common_params) if expression.upper is not None else None,
+        evaluate_ast(
+            expression.step, *common_params) if expression.step is not None else None,
+    )
+
+
+def evaluate_break(expression: ast.Break, *_) -> None:
+    raise BreakException()
+
+
+def evaluate_continue(expression: ast.Continue, *_) -> None:
+    raise ContinueException()
+
+
+def evaluate_return(expression: ast.Return, *common_params) -> None:
+    raise ReturnException(evaluate_ast(
+        expression.value, *common_params) if expression.value else None)
+
+
+def evaluate_pass(expression: ast.Pass, *_) -> None:
+    return None
+
+
+def evaluate_import_statement(
+    expression: ast.Import | ast.ImportFrom,
+    state: Dict[str, Any],
+    static_tools: Dict[str, Callable],
+    custom_tools: Dict[str, Callable],
+    authorized_imports: List[str],
+) -> None:
+    return evaluate_import(expression, state, authorized_imports)
+
+
 @safer_eval
 def evaluate_ast(
     expression: ast.AST,
@@ -1242,133 +1418,108 @@ def evaluate_ast(
             The list of modules that can be imported by the code. By default, only a few safe modules are allowed.
             If it contains "*", it will authorize any import. Use this at your own risk!
     """
-    if state.setdefault("_operations_count", {"counter": 0})["counter"] >= MAX_OPERATIONS:
+    try:
+        operations_count = state["_operations_count"]
+    except KeyError:
+        operations_count = state["_operations_count"] = {"counter": 0}
+    if operations_count["counter"] >= MAX_OPERATIONS:
         raise InterpreterError(
             f"Reached the max number of operations of {MAX_OPERATIONS}. Maybe there is an infinite loop somewhere in the code, or you're just asking too many calculations."
         )
-    state["_operations_count"]["counter"] += 1
-    common_params = (state, static_tools, custom_tools, authorized_imports)
-    if isinstance(expression, ast.Assign):
-        # Assignment -> we evaluate the assignment which should update the state
-        # We return the variable assigned as it may be used to determine the final result.
-        return evaluate_assign(expression, *common_params)
-    elif isinstance(expression, ast.AugAssign):
-        return evaluate_augassign(expression, *common_params)
-    elif isinstance(expression, ast.Call):
-        # Function call -> we return the value of the function call
-        return evaluate_call(expression, *common_params)
-    elif isinstance(expression, ast.Constant):
-        # Constant -> just return the value
-        return expression.value
-    elif isinstance(expression, ast.Tuple):
-        return tuple((evaluate_ast(elt, *common_params) for elt in expression.elts))
-    elif isinstance(expression, (ast.ListComp, ast.GeneratorExp)):
-        return evaluate_listcomp(expression, *common_params)
-    elif isinstance(expression, ast.DictComp):
-        return evaluate_dictcomp(expression, *common_params)
-    elif isinstance(expression, ast.SetComp):
-        return evaluate_setcomp(expression, *common_params)
-    elif isinstance(expression, ast.UnaryOp):
-        return evaluate_unaryop(expression, *common_params)
-    elif isinstance(expression, ast.Starred):
-        return evaluate_ast(expression.value, *common_params)
-    elif isinstance(expression, ast.BoolOp):
-        # Boolean operation -> evaluate the operation
-        return evaluate_boolop(expression, *common_params)
-    elif isinstance(expression, ast.Break):
-        raise BreakException()
-    elif isinstance(expression, ast.Continue):
-        raise ContinueException()
-    elif isinstance(expression, ast.BinOp):
-        # Binary operation -> execute operation
-        return evaluate_binop(expression, *common_params)
-    elif isinstance(expression, ast.Compare):
-        # Comparison -> evaluate the comparison
-        return evaluate_condition(expression, *common_params)
-    elif isinstance(expression, ast.Lambda):
-        return evaluate_lambda(expression, *common_params)
-    elif isinstance(expression, ast.FunctionDef):
-        return evaluate_function_def(expression, *common_params)
-    elif isinstance(expression, ast.Dict):
-        # Dict -> evaluate all keys and values
-        keys = (evaluate_ast(k, *common_params) for k in expression.keys)
-        values = (evaluate_ast(v, *common_params) for v in expression.values)
-        return dict(zip(keys, values))
-    elif isinstance(expression, ast.Expr):
-        # Expression -> evaluate the content
-        return evaluate_ast(expression.value, *common_params)
-    elif isinstance(expression, ast.For):
-        # For loop -> execute the loop
-        return evaluate_for(expression, *common_params)
-    elif isinstance(expression, ast.FormattedValue):
-        # Formatted value (part of f-string) -> evaluate the content and format it
-        value = evaluate_ast(expression.value, *common_params)
-        # Early return if no format spec
-        if not expression.format_spec:
-            return value
-        # Apply format specification
-        format_spec = evaluate_ast(expression.format_spec, *common_params)
-        return format(value, format_spec)
-    elif isinstance(expression, ast.If):
-        # If -> execute the right branch
-        return evaluate_if(expression, *common_params)
-    elif hasattr(ast, "Index") and isinstance(expression, ast.Index):
-        return evaluate_ast(expression.value, *common_params)
-    elif isinstance(expression, ast.JoinedStr):
-        return "".join([str(evaluate_ast(v, *common_params)) for v in expression.values])
-    elif isinstance(expression, ast.List):
-        # List -> evaluate all elements
-        return [evaluate_ast(elt, *common_params) for elt in expression.elts]
-    elif isinstance(expression, ast.Name):
-        # Name -> pick up the value in the state
-        return evaluate_name(expression, *common_params)
-    elif isinstance(expression, ast.Subscript):
-        # Subscript -> return the value of the indexing
-        return evaluate_subscript(expression, *common_params)
-    elif isinstance(expression, ast.IfExp):
-        test_val = evaluate_ast(expression.test, *common_params)
-        if test_val:
-            return evaluate_ast(expression.body, *common_params)
-        else:
-            return evaluate_ast(expression.orelse, *common_params)
-    elif isinstance(expression, ast.Attribute):
-        return evaluate_attribute(expression, *common_params)
-    elif isinstance(expression, ast.Slice):
-        return slice(
-            evaluate_ast(
-                expression.lower, *common_params) if expression.lower is not None else None,
-            evaluate_ast(
-                expression.upper, *common_params) if expression.upper is not None else None,
-            evaluate_ast(
-                expression.step, *common_params) if expression.step is not None else None,
-        )
-    elif isinstance(expression, ast.While):
-        return evaluate_while(expression, *common_params)
-    elif isinstance(expression, (ast.Import, ast.ImportFrom)):
-        return evaluate_import(expression, state, authorized_imports)
-    elif isinstance(expression, ast.ClassDef):
-        return evaluate_class_def(expression, *common_params)
-    elif isinstance(expression, ast.Try):
-        return evaluate_try(expression, *common_params)
-    elif isinstance(expression, ast.Raise):
-        return evaluate_raise(expression, *common_params)
-    elif isinstance(expression, ast.Assert):
-        return evaluate_assert(expression, *common_params)
-    elif isinstance(expression, ast.With):
-        return evaluate_with(expression, *common_params)
-    elif isinstance(expression, ast.Set):
-        return set((evaluate_ast(elt, *common_params) for elt in expression.elts))
-    elif isinstance(expression, ast.Return):
-        raise ReturnException(evaluate_ast(
-            expression.value, *common_params) if expression.value else None)
-    elif isinstance(expression, ast.Pass):
-        return None
-    elif isinstance(expression, ast.Delete):
-        return evaluate_delete(expression, *common_params)
-    else:
+    operations_count["counter"] += 1
+    evaluator = EVALUATORS.get(type(expression))
+    if evaluator is None:
         # For now we refuse anything else. Let's add things as we need them.
         raise InterpreterError(
             f"{expression.__class__.__name__} is not supported.")
+    return evaluator(expression, state, static_tools, custom_tools, authorized_imports)
+
+
+# Node type -> evaluator, so that evaluate_ast dispatches in O(1) instead of walking an isinstance chain.
+EVALUATORS: Dict[type, Callable[..., Any]] = {
+    # Assignment -> we evaluate the assignment which should update the state
+    # We return the variable assigned as it may be used to determine the final result.
+    ast.Assign: evaluate_assign,
+    ast.AugAssign: evaluate_augassign,
+    # Function call -> we return the value of the function call
+    ast.Call: evaluate_call,
+    ast.Constant: evaluate_constant,
+    ast.Tuple: evaluate_tuple,
+    ast.ListComp: evaluate_listcomp,
+    ast.GeneratorExp: evaluate_listcomp,
+    ast.DictComp: evaluate_dictcomp,
+    ast.SetComp: evaluate_setcomp,
+    ast.UnaryOp: evaluate_unaryop,
+    ast.Starred: evaluate_wrapped_value,
+    # Boolean operation -> evaluate the operation
+    ast.BoolOp: evaluate_boolop,
+    ast.Break: evaluate_break,
+    ast.Continue: evaluate_continue,
+    # Binary operation -> execute operation
+    ast.BinOp: evaluate_binop,
+    # Comparison -> evaluate the comparison
+    ast.Compare: evaluate_condition,
+    ast.Lambda: evaluate_lambda,
+    ast.FunctionDef: evaluate_function_def,
+    ast.Dict: evaluate_dict,
+    ast.Expr: evaluate_wrapped_value,
+    # For loop -> execute the loop
+    ast.For: evaluate_for,
+    ast.FormattedValue: evaluate_formatted_value,
+    # If -> execute the right branch
+    ast.If: evaluate_if,
+    ast.JoinedStr: evaluate_joined_str,
+    ast.List: evaluate_list,
+    # Name -> pick up the value in the state
+    ast.Name: evaluate_name,
+    # Subscript -> return the value of the indexing
+    ast.Subscript: evaluate_subscript,
+    ast.IfExp: evaluate_ifexp,
+    ast.Attribute: evaluate_attribute,
+    ast.Slice: evaluate_slice,
+    ast.While: evaluate_while,
+    ast.Import: evaluate_import_statement,
+    ast.ImportFrom: evaluate_import_statement,
+    ast.ClassDef: evaluate_class_def,
+    ast.Try: evaluate_try,
+    ast.Raise: evaluate_raise,
+    ast.Assert: evaluate_assert,
+    ast.With: evaluate_with,
+    ast.Set: evaluate_set,
+    ast.Return: evaluate_return,
+    ast.Pass: evaluate_pass,
+    ast.Delete: evaluate_delete,
+}
+if hasattr(ast, "Index"):
+    EVALUATORS[ast.Index] = evaluate_wrapped_value
+
+
+def set_resource_limits(max_memory_mb: int, max_cpu_time_sec: int, authorized_imports: List[str]) -> None:
+    """
+    Limit the CPU time and memory of the current process (only for linux).
+
+    The CPU limit is counted from the CPU time the process has already used, so a long-lived worker that has
+    spent time importing libraries or running earlier jobs still gets the full budget for the next job. Only
+    the soft limits are lowered, which lets the same process be granted a fresh budget for its next job.
+    """
+    if sys.platform != "linux":
+        return
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_limit = int(usage.ru_utime + usage.ru_stime) + max_cpu_time_sec
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if cpu_hard != resource.RLIM_INFINITY:
+        cpu_limit = min(cpu_limit, cpu_hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_hard))
+
+    # Increase memory limit to 500MB to accommodate numpy
+    if any(lib in authorized_imports for lib in ["numpy", "matplotlib", "plotly"]):
+        max_memory_mb = 1000
+    memory_limit = max_memory_mb * 1024 * 1024
+    _, memory_hard = resource.getrlimit(resource.RLIMIT_AS)
+    if memory_hard != resource.RLIM_INFINITY:
+        memory_limit = min(memory_limit, memory_hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_hard))
 
 
 def evaluate_python_code(
@@ -1381,7 +1532,8 @@ def evaluate_python_code(
     # Resource limits
     max_memory_mb: int = 100,  # Maximum memory usage in MB
     max_cpu_time_sec: int = 15,  # Maximum CPU time in seconds
-) -> tuple[str, list[ImageContent | EmbeddedResource]]:
+    on_print: Optional[Callable[[str], None]] = None,
+) -> tuple[str, list[FigureImage | EmbeddedResource]]:
     """
     Evaluate a python expression using the content of the variables stored in a state and only evaluating a given set
     of functions.
@@ -1401,6 +1553,8 @@ def evaluate_python_code(
             A dictionary mapping variable names to values. The `state` should contain the initial inputs but will be
             updated by this function to contain all variables as they are evaluated.
             The print outputs will be stored in the state under the key "_print_outputs".
+        on_print (`Callable[[str], None]`, *optional*):
+            Called with the text of every print as soon as it happens, before the evaluation finishes.
 
     Returns:
         str: Either the print outputs if successful, or print outputs + error message if failed
@@ -1415,19 +1569,10 @@ def evaluate_python_code(
             static_tools[name] = tool
 
     custom_tools = custom_tools if custom_tools is not None else {}
-    state["_print_outputs"] = PrintContainer()
+    state["_print_outputs"] = PrintContainer(on_print, max_print_outputs_length)
     state["_operations_count"] = {"counter": 0}
 
-    # only for linux
-    if sys.platform == "linux":
-        resource.setrlimit(resource.RLIMIT_CPU,
-                           (max_cpu_time_sec, max_cpu_time_sec))
-        # Increase memory limit to 500MB to accommodate numpy
-        if any(lib in authorized_imports for lib in ["numpy", "matplotlib", "plotly"]):
-            max_memory_mb = 1000
-        memory_limit = max_memory_mb * 1024 * 1024
-        resource.setrlimit(resource.RLIMIT_AS, (memory_limit *
-                           1024 * 1024, memory_limit * 2 * 1024 * 1024))
+    set_resource_limits(max_memory_mb, max_cpu_time_sec, authorized_imports)
 
     try:
         expression = ast.parse(code)
@@ -1446,18 +1591,13 @@ def evaluate_python_code(
             evaluate_ast(node, state, static_tools,
                          custom_tools, authorized_imports)
 
-        return truncate_content(str(state["_print_outputs"]), max_length=max_print_outputs_length), state["_print_outputs"].images
+        return str(state["_print_outputs"]), state["_print_outputs"].images
     except (MemoryError, OSError, BlockingIOError) as e:
         # These exceptions are likely due to resource limits being hit
-        current_output = str(state["_print_outputs"])
-        resource_error_msg = (
-            f"\n⚠️ RESOURCE LIMIT EXCEEDED ⚠️\n"
-            f"This tool is meant for basic scientific calculations only.\n"
-            f"Attempting to bypass resource limits or execute malicious code may result in account termination.\n"
-            f"Error: {type(e).__name__}: {e}"
-        )
-        return truncate_content(current_output + resource_error_msg, max_length=max_print_outputs_length), state["_print_outputs"].images
+        state["_resource_limit_exceeded"] = True
+        state["_print_outputs"].write(resource_limit_message(f"{type(e).__name__}: {e}"))
+        return str(state["_print_outputs"]), state["_print_outputs"].images
     except Exception as e:
-        current_output = str(state["_print_outputs"])
         error_msg = f"\nCode execution failed at line '{ast.get_source_segment(code, node)}' due to: {type(e).__name__}: {e}"
-        return truncate_content(current_output + error_msg, max_length=max_print_outputs_length), state["_print_outputs"].images
+        state["_print_outputs"].write(error_msg)
+        return str(state["_print_outputs"]), state["_print_outputs"].images
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import struct
+from typing import Any, BinaryIO, Optional, Sequence
+
+from mcp.types import EmbeddedResource
+
+from .schemas import FigureImage
+
+# Framed binary messages exchanged between the server and its sandbox workers. A message is a small JSON header
+# followed by zero or more binary payloads:
+#
+#     [header length: 4 bytes][payload count: 4 bytes][header JSON]
+#     ([payload length: 8 bytes][payload bytes]) * payload count
+#
+# Figures and resources travel as raw payloads instead of base64 strings inside the JSON, so they never go through
+# the JSON encoder and decoder and are only base64 encoded once, at the MCP boundary.
+FRAME_HEADER = struct.Struct(">II")
+PAYLOAD_HEADER = struct.Struct(">Q")
+
+
+def encode_message(header: dict[str, Any], payloads: Sequence[bytes] = ()) -> list[bytes]:
+    """Encode a message into the parts to write, without joining the payloads into one buffer."""
+    header_bytes = json.dumps(header).encode()
+    parts = [FRAME_HEADER.pack(len(header_bytes), len(payloads)), header_bytes]
+    for payload in payloads:
+        parts.append(PAYLOAD_HEADER.pack(len(payload)))
+        parts.append(payload)
+    return parts
+
+
+def write_message(stream: BinaryIO, header: dict[str, Any], payloads: Sequence[bytes] = ()) -> None:
+    stream.writelines(encode_message(header, payloads))
+    stream.flush()
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    """Read `size` bytes, or fewer if the stream ends first."""
+    data = stream.read(size)
+    if len(data) == size:
+        return data
+    # Pipes may return short reads
+    chunks = [data]
+    received = len(data)
+    while received < size:
+        chunk = stream.read(size - received)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        received += len(chunk)
+    return b"".join(chunks)
+
+
+def _read_part(stream: BinaryIO, size: int) -> bytes:
+    data = _read_exactly(stream, size)
+    if len(data) < size:
+        raise EOFError("Stream ended within a message")
+    return data
+
+
+def read_message(stream: BinaryIO) -> Optional[tuple[dict[str, Any], list[bytes]]]:
+    """
+    Read one message from a blocking binary stream. Returns None at end of stream, and raises EOFError if the stream
+    ends within a message.
+    """
+    frame_header = _read_exactly(stream, FRAME_HEADER.size)
+    if not frame_header:
+        return None
+    if len(frame_header) < FRAME_HEADER.size:
+        raise EOFError("Stream ended within a message")
+    header_length, payload_count = FRAME_HEADER.unpack(frame_header)
+    header = json.loads(_read_part(stream, header_length))
+    payloads = []
+    for _ in range(payload_count):
+        (payload_length,) = PAYLOAD_HEADER.unpack(_read_part(stream, PAYLOAD_HEADER.size))
+        payloads.append(_read_part(stream, payload_length))
+    return header, payloads
+
+
+async def read_message_async(reader: asyncio.StreamReader) -> tuple[dict[str, Any], list[bytes]]:
+    """Read one message from an asyncio stream. Raises asyncio.IncompleteReadError at end of stream."""
+    header_length, payload_count = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    header = json.loads(await reader.readexactly(header_length))
+    payloads = []
+    for _ in range(payload_count):
+        (payload_length,) = PAYLOAD_HEADER.unpack(await reader.readexactly(PAYLOAD_HEADER.size))
+        payloads.append(await reader.readexactly(payload_length))
+    return header, payloads
+
+
+def encode_result(result: str, images: list[FigureImage | EmbeddedResource]) -> tuple[dict[str, Any], list[bytes]]:
+    """
+    Split the result of evaluate_python_code into a message header and the payloads of its figures and resources.
+    """
+    header = {"text": result, "content": []}
+    payloads = []
+    for obj in images:
+        if isinstance(obj, FigureImage):
+            header["content"].append({
+                "type": "image",
+                "mimeType": obj.mimeType,
+                "payload": len(payloads)
+            })
+            payloads.append(obj.data)
+        elif isinstance(obj, EmbeddedResource):
+            header["content"].append({
+                "type": "resource",
+                "resource": {
+                    "uri": str(obj.resource.uri),
+                    "mimeType": obj.resource.mimeType
+                },
+                "extra_type": obj.extra_type,
+                "payload": len(payloads)
+            })
+            payloads.append(obj.resource.text.encode())
+    return header, payloads
+
+
+def decode_result(header: dict[str, Any], payloads: list[bytes]) -> dict[str, Any]:
+    """
+    Inverse of encode_result: put the payloads back into the content entries. Images keep their raw bytes in
+    "data"; resources get their text back.
+    """
+    for item in header.get("content", []):
+        payload = payloads[item.pop("payload")]
+        if item["type"] == "image":
+            item["data"] = payload
+        elif item["type"] == "resource":
+            item["resource"]["text"] = payload.decode()
+    return header
+
+
+def split_result(reply: dict[str, Any]) -> tuple[dict[str, Any], list[bytes]]:
+    """
+    Inverse of decode_result: move the image bytes and resource texts of a decoded reply back into payloads. The
+    reply itself is left untouched.
+    """
+    header = {**reply, "content": []}
+    payloads = []
+    for item in reply.get("content", []):
+        item = {**item, "payload": len(payloads)}
+        if item["type"] == "image":
+            payloads.append(item.pop("data"))
+        elif item["type"] == "resource":
+            item["resource"] = dict(item["resource"])
+            payloads.append(item["resource"].pop("text").encode())
+        header["content"].append(item)
+    return header, payloads
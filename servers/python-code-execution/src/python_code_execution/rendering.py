@@ -0,0 +1,229 @@
+import io
+import math
+import uuid
+from typing import Any, Optional
+
+import plotly.io
+import numpy as np
+from matplotlib.collections import PathCollection
+from matplotlib.figure import Figure
+from mcp.types import EmbeddedResource, TextResourceContents
+from plotly.graph_objects import Figure as PlotlyFigure
+
+from .schemas import (
+    DEFAULT_IMAGE_FORMAT,
+    FigureImage,
+    MAX_FIGURE_DPI,
+    MAX_FIGURE_PIXELS,
+    MAX_RENDER_POINTS,
+)
+
+IMAGE_MIME_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+# Per-point properties of plotly scatter traces, thinned out together with x and y
+PLOTLY_POINT_KEYS = ("x", "y", "text", "hovertext", "customdata", "ids")
+PLOTLY_MARKER_POINT_KEYS = ("color", "size", "symbol", "opacity")
+
+# Plotly's own default image size, used when the layout does not set one
+PLOTLY_DEFAULT_WIDTH = 700
+PLOTLY_DEFAULT_HEIGHT = 500
+
+
+def normalize_format(image_format: Optional[str]) -> str:
+    image_format = (image_format or DEFAULT_IMAGE_FORMAT).lower()
+    if image_format == "jpg":
+        image_format = "jpeg"
+    if image_format not in IMAGE_MIME_TYPES:
+        raise ValueError(
+            f"Unsupported image format '{image_format}', use one of {', '.join(IMAGE_MIME_TYPES)}")
+    return image_format
+
+
+def _kaleido_scope():
+    # plotly keeps a single kaleido scope per process, whose subprocess stays alive between figures
+    return plotly.io.kaleido.scope
+
+
+def warm_up_kaleido() -> None:
+    """Start the kaleido subprocess ahead of the first plotly figure."""
+    _kaleido_scope().transform({"data": [], "layout": {}}, format="png", width=10, height=10)
+
+
+def _stride(length: int, max_points: int) -> int:
+    return math.ceil(length / max_points) if length > max_points else 1
+
+
+def _line_indices(y: Any, max_points: int) -> np.ndarray:
+    """
+    Indices of the points to draw of a line of more than `max_points` points: the endpoints, and the lowest and
+    highest point of each run of consecutive points, so that peaks and the envelope of oscillations survive. Lines
+    with non-numeric y values are thinned out with a stride instead.
+    """
+    length = len(y)
+    try:
+        y = np.asarray(y, dtype=float)
+    except (TypeError, ValueError):
+        return np.arange(0, length, _stride(length, max_points))
+    # Two points per bucket
+    size = math.ceil(2 * length / max_points)
+    buckets = math.ceil(length / size)
+    starts = np.arange(buckets) * size
+    padded = np.full(buckets * size, np.inf)
+    padded[:length] = y
+    lows = starts + np.argmin(padded.reshape(buckets, size), axis=1)
+    padded[length:] = -np.inf
+    highs = starts + np.argmax(padded.reshape(buckets, size), axis=1)
+    return np.unique(np.concatenate([[0, length - 1], lows, highs]))
+
+
+def _take(value: Any, indices: np.ndarray) -> Any:
+    if isinstance(value, np.ndarray):
+        return value[indices]
+    return [value[i] for i in indices]
+
+
+def downsample_plotly(fig_dict: dict[str, Any], max_points: int = MAX_RENDER_POINTS) -> dict[str, Any]:
+    """
+    Return a copy of a plotly figure dict whose scatter traces keep at most about `max_points` points each. Traces
+    drawn with lines keep the extremes of every run of points (see _line_indices), marker-only traces keep every
+    n-th point. The input is not modified.
+    """
+    data = []
+    for trace in fig_dict.get("data", []):
+        if trace.get("type", "scatter") not in ("scatter", "scattergl"):
+            data.append(trace)
+            continue
+        length = max(_length(trace.get("x")), _length(trace.get("y")))
+        if length <= max_points:
+            data.append(trace)
+            continue
+        # Plotly draws lines by default once a trace has 20 points or more
+        if "lines" in trace.get("mode", "lines") and _is_per_point(trace.get("y"), length):
+            indices = _line_indices(trace["y"], max_points)
+        else:
+            indices = np.arange(0, length, _stride(length, max_points))
+        trace = dict(trace)
+        for key in PLOTLY_POINT_KEYS:
+            if _is_per_point(trace.get(key), length):
+                trace[key] = _take(trace[key], indices)
+        if isinstance(trace.get("marker"), dict):
+            trace["marker"] = dict(trace["marker"])
+            for key in PLOTLY_MARKER_POINT_KEYS:
+                if _is_per_point(trace["marker"].get(key), length):
+                    trace["marker"][key] = _take(trace["marker"][key], indices)
+        data.append(trace)
+    return {**fig_dict, "data": data}
+
+
+def _length(value: Any) -> int:
+    # Plotly data may be lists, tuples or numpy arrays, while strings and dicts are scalar settings
+    if value is None or isinstance(value, (str, dict)) or not hasattr(value, "__len__"):
+        return 0
+    return len(value)
+
+
+def _is_per_point(value: Any, length: int) -> bool:
+    return _length(value) == length
+
+
+def render_plotly(
+    fig: PlotlyFigure,
+    image_format: str,
+    include_image: bool = True,
+    max_pixels: int = MAX_FIGURE_PIXELS,
+    max_points: int = MAX_RENDER_POINTS,
+) -> list[FigureImage | EmbeddedResource]:
+    # Convert the figure once, for both the JSON resource and the image
+    fig_dict = fig.to_dict()
+    result: list[FigureImage | EmbeddedResource] = [
+        EmbeddedResource(
+            type="resource",
+            resource=TextResourceContents(
+                uri=f"project://{uuid.uuid4()}",
+                text=plotly.io.to_json(fig_dict, validate=False),
+                mimeType="application/json"
+            ),
+            # EmbeddedResource has enabled extra fields, so add an extra_type to indicate it's a plotly figure
+            extra_type="plotly",
+        )
+    ]
+    if not include_image:
+        return result
+
+    layout = fig_dict.get("layout", {})
+    width = layout.get("width") or PLOTLY_DEFAULT_WIDTH
+    height = layout.get("height") or PLOTLY_DEFAULT_HEIGHT
+    scale = min(1.0, math.sqrt(max_pixels / (width * height)))
+    img_data = _kaleido_scope().transform(
+        downsample_plotly(fig_dict, max_points), format=image_format, width=width, height=height, scale=scale)
+    result.append(FigureImage(data=img_data, mimeType=IMAGE_MIME_TYPES[image_format]))
+    return result
+
+
+def render_matplotlib(
+    fig: Figure,
+    image_format: str,
+    dpi: Optional[float] = None,
+    max_pixels: int = MAX_FIGURE_PIXELS,
+    max_points: int = MAX_RENDER_POINTS,
+) -> list[FigureImage | EmbeddedResource]:
+    width, height = fig.get_size_inches()
+    dpi = min(dpi or fig.dpi, MAX_FIGURE_DPI, math.sqrt(max_pixels / (width * height)))
+
+    # Thin out large lines and scatter plots for the rendering only, then put the data back
+    restore = []
+    try:
+        for ax in fig.axes:
+            for line in ax.lines:
+                xdata, ydata = line.get_xdata(orig=True), line.get_ydata(orig=True)
+                if len(xdata) > max_points and len(ydata) == len(xdata):
+                    indices = _line_indices(ydata, max_points)
+                    restore.append((line.set_data, (xdata, ydata)))
+                    line.set_data(np.asarray(xdata)[indices], np.asarray(ydata)[indices])
+            for collection in ax.collections:
+                if not isinstance(collection, PathCollection):
+                    continue
+                offsets = collection.get_offsets()
+                stride = _stride(len(offsets), max_points)
+                if stride == 1:
+                    continue
+                restore.append((collection.set_offsets, (offsets,)))
+                collection.set_offsets(offsets[::stride])
+                values = collection.get_array()
+                if values is not None and len(values) == len(offsets):
+                    restore.append((collection.set_array, (values,)))
+                    collection.set_array(values[::stride])
+                sizes = collection.get_sizes()
+                if len(sizes) == len(offsets):
+                    restore.append((collection.set_sizes, (sizes,)))
+                    collection.set_sizes(sizes[::stride])
+
+        with io.BytesIO() as buf:
+            fig.savefig(buf, format=image_format, dpi=dpi)
+            img_data = buf.getvalue()
+    finally:
+        for setter, args in reversed(restore):
+            setter(*args)
+
+    return [FigureImage(data=img_data, mimeType=IMAGE_MIME_TYPES[image_format])]
+
+
+def render_figure(
+    fig: Figure | PlotlyFigure,
+    image_format: Optional[str] = None,
+    dpi: Optional[float] = None,
+    include_image: bool = True,
+) -> list[FigureImage | EmbeddedResource]:
+    """
+    Render a matplotlib or plotly figure for the client, within the size limits of MAX_FIGURE_PIXELS and
+    MAX_FIGURE_DPI. Lines and scatter plots beyond MAX_RENDER_POINTS points per trace are thinned out before
+    rasterizing; lines keep their peaks.
+    """
+    image_format = normalize_format(image_format)
+    if isinstance(fig, PlotlyFigure):
+        return render_plotly(fig, image_format, include_image)
+    return render_matplotlib(fig, image_format, dpi)
@@ -0,0 +1,178 @@
+import ast
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .protocol import decode_result, read_message, split_result, write_message
+from .schemas import DEFAULT_CACHE_SIZE_MB
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached format or the meaning of a key changes
+CACHE_VERSION = 1
+
+# Code importing these modules, or using these names, may print something different on every run
+NONDETERMINISTIC_MODULES = {"random", "time", "datetime", "uuid", "secrets"}
+NONDETERMINISTIC_NAMES = {
+    "random",
+    "default_rng",
+    "now",
+    "today",
+    "utcnow",
+    "time",
+    "time_ns",
+    "perf_counter",
+    "monotonic",
+    "process_time",
+    "uuid4",
+    # Could reach any of the above by name
+    "getattr",
+}
+
+
+def normalize_code(code: str) -> str:
+    """Normalize the parts of the code that cannot change its output."""
+    return code.replace("\r\n", "\n").rstrip()
+
+
+def is_deterministic(code: str) -> bool:
+    """
+    Whether running the code twice gives the same output, as far as a static check can tell.
+
+    Code that imports a source of randomness or time, or refers to one by name, is not deterministic. Libraries
+    drawing from the global random generators escape this check; the worker reports those runs instead, see
+    ResultCache.put.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        # Reported the same way every time
+        return True
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            # The imported names may be modules or functions themselves, e.g. from numpy import random as r
+            modules = [node.module or ""]
+            if any(alias.name in NONDETERMINISTIC_MODULES | NONDETERMINISTIC_NAMES for alias in node.names):
+                return False
+        elif isinstance(node, ast.Name):
+            if node.id in NONDETERMINISTIC_NAMES:
+                return False
+            continue
+        elif isinstance(node, ast.Attribute):
+            if node.attr in NONDETERMINISTIC_NAMES:
+                return False
+            continue
+        else:
+            continue
+        for module in modules:
+            # e.g. random, numpy.random, datetime
+            if any(part in NONDETERMINISTIC_MODULES for part in module.split(".")):
+                return False
+    return True
+
+
+class ResultCache:
+    """
+    A content-addressed cache of execution results on disk.
+
+    Results are keyed on the normalized code, the authorized imports and the resource limits of the job, and stored
+    in the framed message format of the protocol module, one file per result. The least recently used results are
+    evicted once the cache grows beyond `max_size_mb`.
+    """
+
+    def __init__(self, directory: str, max_size_mb: float = DEFAULT_CACHE_SIZE_MB):
+        self.directory = directory
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        os.makedirs(directory, exist_ok=True)
+
+        # key -> file size, least recently used first (by modification time, which is refreshed on every hit)
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        files = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(".msg"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-len(".msg")], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+        self._evict()
+
+    @staticmethod
+    def key(job: dict[str, Any]) -> str:
+        material = json.dumps({
+            "version": CACHE_VERSION,
+            "code": normalize_code(job["code"]),
+            "authorized_imports": sorted(job["authorized_imports"]),
+            "max_print_length": job["max_print_length"],
+            "max_memory_mb": job["max_memory_mb"],
+            "max_cpu_time_sec": job["max_cpu_time_sec"],
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.msg")
+
+    def get(self, job: dict[str, Any]) -> Optional[dict[str, Any]]:
+        """Return the cached reply for the job, or None."""
+        key = self.key(job)
+        if key not in self._entries:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                message = read_message(f)
+            os.utime(path)
+        except (OSError, EOFError) as e:
+            logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+            self._remove(key)
+            return None
+        if message is None:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return decode_result(*message)
+
+    def put(self, job: dict[str, Any], reply: dict[str, Any]) -> bool:
+        """
+        Store the reply of the job if its code is deterministic and the run did not draw from the global random
+        generators. Returns whether it was stored.
+        """
+        if reply.get("used_random") or not is_deterministic(job["code"]):
+            return False
+        key = self.key(job)
+        header, payloads = split_result(reply)
+        # Write to a temporary file first so that readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write_message(f, header, payloads)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+        self._size -= self._entries.pop(key, 0)
+        self._entries[key] = os.path.getsize(self._path(key))
+        self._size += self._entries[key]
+        self._evict()
+        return True
+
+    def _remove(self, key: str) -> None:
+        self._size -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        while self._size > self.max_size and self._entries:
+            self._remove(next(iter(self._entries)))
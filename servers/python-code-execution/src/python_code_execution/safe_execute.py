@@ -1,9 +1,37 @@
 import argparse
-import json
 import base64
-from .local_python_executor import evaluate_python_code
-from .schemas import BASE_BUILTIN_MODULES, DEFAULT_MAX_LEN_OUTPUT
-from mcp.types import ImageContent, EmbeddedResource
+import json
+from .local_python_executor import evaluate_python_code, resource_limit_message
+from .schemas import BASE_BUILTIN_MODULES, DEFAULT_MAX_LEN_OUTPUT, FigureImage
+from mcp.types import EmbeddedResource
+
+
+def build_output(result: str, images: list[FigureImage | EmbeddedResource]) -> dict:
+    """
+    Convert the result of evaluate_python_code into the JSON-serialisable dict understood by the server.
+    """
+    output = {
+        "text": result,
+        "content": []
+    }
+    for obj in images:
+        if isinstance(obj, FigureImage):
+            output["content"].append({
+                "type": "image",
+                "data": base64.b64encode(obj.data).decode('utf-8'),
+                "mimeType": obj.mimeType
+            })
+        elif isinstance(obj, EmbeddedResource):
+            output["content"].append({
+                "type": "resource",
+                "resource": {
+                    "uri": str(obj.resource.uri),
+                    "text": obj.resource.text,
+                    "mimeType": obj.resource.mimeType
+                },
+                "extra_type": obj.extra_type
+            })
+    return output
 
 
 def main():
@@ -40,42 +68,13 @@ def main():
 
         # If there are response objects (images or embedded resources), format the output as JSON
         if images:
-            output = {
-                "text": result,
-                "content": []
-            }
-            for obj in images:
-                if isinstance(obj, ImageContent):
-                    output["content"].append({
-                        "type": "image",
-                        "data": obj.data,
-                        "mimeType": obj.mimeType
-                    })
-                elif isinstance(obj, EmbeddedResource):
-                    output["content"].append({
-                        "type": "resource",
-                        "resource": {
-                            "uri": str(obj.resource.uri),
-                            "text": obj.resource.text,
-                            "mimeType": obj.resource.mimeType
-                        },
-                        "extra_type": obj.extra_type
-                    })
-
-            print(json.dumps(output))
+            print(json.dumps(build_output(result, images)))
         else:
             # If no response objects, just print the text result
             print(result)
 
     except Exception as e:
-        resource_error_msg = (
-            f"\n⚠️ RESOURCE LIMIT EXCEEDED ⚠️\n"
-            f"This tool is meant for basic scientific calculations only.\n"
-            f"Attempting to bypass resource limits or execute malicious code may result in account termination.\n"
-            f"Error: {type(e).__name__}: {e}"
-        )
-        print(resource_error_msg)
-
+        print(resource_limit_message(f"{type(e).__name__}: {e}"))
 
 if __name__ == "__main__":
     main()
@@ -1,18 +1,50 @@
 import math
-import io
-import base64
-from typing import cast
-import uuid
-from mcp.types import ImageContent
+from dataclasses import dataclass
+from typing import Optional
 from matplotlib.figure import Figure
 from plotly.graph_objects import Figure as PlotlyFigure
-from mcp.types import EmbeddedResource, TextResourceContents, ImageContent
-import plotly.io
+from mcp.types import EmbeddedResource
 
 DEFAULT_MAX_LEN_OUTPUT = 50000
 MAX_OPERATIONS = 10000
 MAX_WHILE_ITERATIONS = 10000
 MAX_LENGTH_TRUNCATE_CONTENT = 20000
+EXECUTION_TIMEOUT_SEC = 100
+
+# Warm worker pool defaults
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_JOBS_PER_WORKER = 50
+# A worker that fails to start is retried this many times, waiting twice as long after every failure
+WORKER_START_RETRIES = 5
+WORKER_START_BACKOFF_SEC = 0.5
+DEFAULT_WARM_IMPORTS = [
+    "numpy",
+    "matplotlib",
+    "matplotlib.pyplot",
+    "plotly",
+    "plotly.graph_objects",
+]
+
+# Prints are streamed to the client in chunks of at most this many characters, at most once per interval
+STREAM_CHUNK_SIZE = 4096
+STREAM_INTERVAL_SEC = 0.5
+
+# Figure rendering limits
+DEFAULT_IMAGE_FORMAT = "png"
+MAX_FIGURE_DPI = 200
+MAX_FIGURE_PIXELS = 2000 * 2000
+MAX_RENDER_POINTS = 20000
+
+# Maximum number of executions running at the same time
+DEFAULT_MAX_CONCURRENT_EXECUTIONS = 4
+
+# Size cap of the opt-in result cache
+DEFAULT_CACHE_SIZE_MB = 256
+
+# Persistent session defaults
+DEFAULT_MAX_SESSIONS = 4
+DEFAULT_SESSION_IDLE_TIMEOUT_SEC = 1800
+DEFAULT_SESSION_MEMORY_MB = 1024
 
 
 BASE_BUILTIN_MODULES = [
@@ -33,53 +65,36 @@ BASE_BUILTIN_MODULES = [
 ]
 
 
-def send_image_to_client(fig: Figure | PlotlyFigure) -> list[ImageContent | EmbeddedResource]:
+@dataclass
+class FigureImage:
     """
-    Convert a matplotlib or plotly figure to an ImageContent object.
+    A rendered figure. The image is kept as raw bytes and only base64 encoded when it is handed to the MCP client.
+    """
+    data: bytes
+    mimeType: str = "image/png"
+
+
+def send_image_to_client(
+    fig: Figure | PlotlyFigure,
+    format: Optional[str] = None,
+    dpi: Optional[float] = None,
+    image: bool = True,
+) -> list[FigureImage | EmbeddedResource]:
+    """
+    Render a matplotlib or plotly figure for the client.
 
     Args:
         fig (Figure | PlotlyFigure): A matplotlib or plotly figure object
+        format (str, optional): "png" (default), "jpeg" or "webp"
+        dpi (float, optional): Resolution of matplotlib figures, capped at MAX_FIGURE_DPI
+        image (bool): For plotly figures, whether to render an image besides the figure JSON
 
     Returns:
-        ImageContent: An ImageContent object
+        list[FigureImage | EmbeddedResource]: The rendered image, preceded by the figure JSON for plotly figures
     """
-    # Create a buffer
-    buf = io.BytesIO()
-    result = []
-    # Handle different figure types
-    if isinstance(fig, PlotlyFigure):
-        # For Plotly figures
-        img_data = plotly.io.to_image(fig, format="png")
-        img_str = base64.b64encode(img_data).decode('utf-8')
-        result.append(
-            EmbeddedResource(
-                type="resource",
-                resource=TextResourceContents(
-                    uri=f"project://{uuid.uuid4()}",
-                    text=cast(str, fig.to_json()),
-                    mimeType="application/json"
-                ),
-                # EmbeddedResource has enabled extra fields, so add an extra_type to indicate it's a plotly figure
-                extra_type="plotly",
-            )
-        )
-    else:
-        # For Matplotlib figures
-        fig.savefig(buf, format='png')
-        buf.seek(0)
-        img_str = base64.b64encode(buf.getvalue()).decode('utf-8')
-
-    # Create an ImageContent object
-    image_content = ImageContent(
-        type="image",
-        data=img_str,
-        mimeType="image/png"
-    )
-    result.append(image_content)
-    # Clean up
-    buf.close()
-
-    return result
+    from .rendering import render_figure
+
+    return render_figure(fig, format, dpi, image)
 
 
 BASE_PYTHON_TOOLS = {
@@ -1,31 +1,150 @@
 
+import asyncio
+import base64
 import logging
 import os
 import json
 from typing import Any, Callable, List, Optional, Union, cast
 
 import re
-import subprocess
 from mcp.server.lowlevel import Server as McpServer
 from mcp.server.stdio import stdio_server
 from mcp.shared.exceptions import McpError
 from mcp.types import INTERNAL_ERROR, ErrorData, TextContent, ImageContent, Tool, EmbeddedResource, TextResourceContents
 from pydantic import BaseModel, ValidationError
-from python_code_execution.schemas import BASE_BUILTIN_MODULES
+from python_code_execution.local_python_executor import resource_limit_message
+from python_code_execution.schemas import (
+    BASE_BUILTIN_MODULES,
+    DEFAULT_CACHE_SIZE_MB,
+    DEFAULT_MAX_CONCURRENT_EXECUTIONS,
+    DEFAULT_MAX_JOBS_PER_WORKER,
+    DEFAULT_MAX_LEN_OUTPUT,
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_SESSION_IDLE_TIMEOUT_SEC,
+    DEFAULT_SESSION_MEMORY_MB,
+    DEFAULT_WARM_IMPORTS,
+    EXECUTION_TIMEOUT_SEC,
+    MAX_FIGURE_DPI,
+)
+from python_code_execution.result_cache import ResultCache
+from python_code_execution.sessions import SessionManager
+from python_code_execution.worker_pool import WorkerError, WorkerPool
 logger = logging.getLogger(__name__)
 
 
 class PythonCodeExecutionArgs(BaseModel):
     code: str
+    session_id: Optional[str] = None
+
+
+class ResetPythonSessionArgs(BaseModel):
+    session_id: str
 
 # General Search Function
 
 
-async def python_code_execution(code: str) -> list[Union[TextContent, ImageContent]]:
+def to_mcp_content(output: dict[str, Any]) -> list[Union[TextContent, ImageContent, EmbeddedResource]]:
+    """Convert the JSON output of safe-execute or the decoded reply of a pool worker into MCP content."""
+    result = []
+
+    # Add text content
+    if "text" in output:
+        result.append(TextContent(
+            text=output["text"],
+            type="text"
+        ))
+
+    # Add image and embedded resource content
+    if "content" in output:
+        for content_item in output["content"]:
+            if content_item["type"] == "image":
+                data = content_item["data"]
+                # Pool workers send raw image bytes, which are encoded here and only here
+                if isinstance(data, bytes):
+                    data = base64.b64encode(data).decode('utf-8')
+                result.append(ImageContent(
+                    type="image",
+                    data=data,
+                    mimeType=content_item["mimeType"]
+                ))
+            elif content_item["type"] == "resource":
+                result.append(EmbeddedResource(
+                    type="resource",
+                    resource=TextResourceContents(
+                        uri=content_item["resource"]["uri"],
+                        text=content_item["resource"]["text"],
+                        mimeType=content_item["resource"]["mimeType"]
+                    ),
+                    extra_type=content_item.get("extra_type")
+                ))
+
+    return result
+
+
+def progress_reporter(server: McpServer) -> Optional[Callable[[str], Any]]:
+    """
+    Return an on_output callback that streams printed text to the client as progress notifications, or None when
+    the client did not ask for progress.
+    """
+    ctx = server.request_context
+    progress_token = ctx.meta.progressToken if ctx.meta is not None else None
+    if progress_token is None:
+        return None
+    streamed = 0
+
+    async def report(text: str) -> None:
+        nonlocal streamed
+        # Progress counts the characters printed so far, and the message carries the new ones
+        streamed += len(text)
+        await ctx.session.send_progress_notification(progress_token, streamed, message=text)
+
+    return report
+
+
+async def python_code_execution(
+    code: str,
+    pool: Optional[WorkerPool] = None,
+    sessions: Optional[SessionManager] = None,
+    session_id: Optional[str] = None,
+    on_output: Optional[Callable[[str], Any]] = None,
+    cache: Optional[ResultCache] = None,
+) -> list[Union[TextContent, ImageContent]]:
     # Clean the code by removing markdown code blocks if present
     cleaned_code = re.sub(r'```(?:python|py)?\s*\n|```\s*$', '', code)
 
+    if pool is not None or (sessions is not None and session_id is not None):
+        job = {
+            "code": cleaned_code,
+            "authorized_imports": BASE_BUILTIN_MODULES,
+            "max_print_length": DEFAULT_MAX_LEN_OUTPUT,
+            "max_memory_mb": 100,
+            "max_cpu_time_sec": 15,
+        }
+        try:
+            if sessions is not None and session_id is not None:
+                # Run the code in the session's own worker, keeping its variables for the next call
+                reply = await sessions.execute(session_id, job, EXECUTION_TIMEOUT_SEC, on_output)
+            else:
+                # Session results depend on earlier calls, so only stateless runs are cached
+                reply = cache.get(job) if cache is not None else None
+                if reply is None:
+                    # Run the code on a warm worker of the pool
+                    reply = await pool.execute(job, EXECUTION_TIMEOUT_SEC, on_output)
+                    if cache is not None and not reply.get("recycle"):
+                        cache.put(job, reply)
+            return to_mcp_content(reply)
+        except TimeoutError:
+            output = "Execution timed out. The code took too long to run."
+        except WorkerError as e:
+            output = resource_limit_message(str(e))
+        except Exception as e:
+            output = f"An error occurred while executing the code: {str(e)}"
+        return [TextContent(text=output, type="text")]
+
     # Run the code evaluation by calling safe_execute.py with a subprocess
+    # (prints are only available once it exits, so on_output is not used here)
+    process = None
     try:
         # Construct the command with proper escaping
         cmd = [
@@ -35,64 +154,36 @@ async def python_code_execution(code: str) -> list[Union[TextContent, ImageConte
             "--code", cleaned_code
         ]
 
-        process = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=100
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
+        stdout, stderr = await asyncio.wait_for(process.communicate(), EXECUTION_TIMEOUT_SEC)
 
         # Get the output
-        if process.returncode == 0:
-            output = process.stdout
-        else:
-            output = process.stdout
-            if process.stderr:
-                output += f"\nError: {process.stderr}"
-
-    except subprocess.TimeoutExpired:
+        output = stdout.decode()
+        if process.returncode != 0 and stderr:
+            output += f"\nError: {stderr.decode()}"
+
+    except asyncio.TimeoutError:
         output = "Execution timed out. The code took too long to run."
         return [TextContent(text=output, type="text")]
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         output = f"An error occurred while executing the code: {str(e)}"
         return [TextContent(text=output, type="text")]
+    finally:
+        # Do not leave the child running after a timeout or a cancelled call
+        if process is not None and process.returncode is None:
+            process.kill()
 
     # Try to parse the output as JSON (for image content)
     try:
         # Check if the output is in JSON format (from images)
-        json_output = json.loads(output)
-
-        result = []
-
-        # Add text content
-        if "text" in json_output:
-            result.append(TextContent(
-                text=json_output["text"],
-                type="text"
-            ))
-
-        # Add image and embedded resource content
-        if "content" in json_output:
-            for content_item in json_output["content"]:
-                if content_item["type"] == "image":
-                    result.append(ImageContent(
-                        type="image",
-                        data=content_item["data"],
-                        mimeType=content_item["mimeType"]
-                    ))
-                elif content_item["type"] == "resource":
-                    result.append(EmbeddedResource(
-                        type="resource",
-                        resource=TextResourceContents(
-                            uri=content_item["resource"]["uri"],
-                            text=content_item["resource"]["text"],
-                            mimeType=content_item["resource"]["mimeType"]
-                        ),
-                        extra_type=content_item.get("extra_type")
-                    ))
-
-        return result
-    except (json.JSONDecodeError, KeyError):
+        return to_mcp_content(json.loads(output))
+    except (json.JSONDecodeError, KeyError, TypeError):
         # If not JSON or missing required keys, just return as text
         return [TextContent(
             text=output,
@@ -108,14 +199,26 @@ python_code_execution.__doc__ = """Execute the generated python code in a sandbo
 
     You can use matplotlib or plotly to create images, However, you must use the send_image_to_client function to send the image to the client.
 
-    def send_image_to_client(fig: matplotlib.figure.Figure | plotly.graph_objects.Figure) -> None:
+    def send_image_to_client(fig: matplotlib.figure.Figure | plotly.graph_objects.Figure,
+                             format: str = "png", dpi: float | None = None, image: bool = True) -> None:
     '''
     send the figure to the client
+    format: "png", "jpeg" or "webp"; jpeg and webp make much smaller images
+    dpi: resolution of matplotlib figures (capped at {max_dpi})
+    image: for plotly figures, False sends only the figure JSON without rendering an image
     '''
 
     Allowed imports (standard library only):
     {}
 
+    Printed output is streamed as progress notifications while the code runs, when the request has a progress token.
+
+    Sessions:
+    Pass a `session_id` to keep variables, functions and imports between calls that use the same id. Open matplotlib
+    figures, matplotlib settings and random generator states are kept as well.
+    Without it every call starts from scratch. Sessions are discarded after a period of inactivity, when they
+    exceed their memory cap or hit a resource limit, and when reset with the reset_python_session tool.
+
     Limitations:
     - No file system access, network operations, or system calls
     - Limited computation time and memory usage
@@ -173,7 +276,7 @@ python_code_execution.__doc__ = """Execute the generated python code in a sandbo
     # Send the figure to the chat
     send_image_to_client(gcf())
     ```
-    """.format("\n".join(f"- {module}" for module in BASE_BUILTIN_MODULES))
+    """.format("\n".join(f"- {module}" for module in BASE_BUILTIN_MODULES), max_dpi=MAX_FIGURE_DPI)
 
 python_code_execution_tool = Tool(
     name="python_code_execution",
@@ -182,17 +285,60 @@ python_code_execution_tool = Tool(
 )
 
 
-async def serve():
+async def reset_python_session(session_id: str, sessions: Optional[SessionManager]) -> list[TextContent]:
+    """Discard a python_code_execution session and all of its variables."""
+    if sessions is not None and sessions.reset(session_id):
+        output = f"Session {session_id} has been reset."
+    else:
+        output = f"No active session {session_id}."
+    return [TextContent(text=output, type="text")]
+
+reset_python_session_tool = Tool(
+    name="reset_python_session",
+    description=reset_python_session.__doc__,
+    inputSchema=ResetPythonSessionArgs.model_json_schema()
+)
+
+
+async def serve(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER,
+    warm_imports: List[str] = DEFAULT_WARM_IMPORTS,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+    session_idle_timeout_sec: float = DEFAULT_SESSION_IDLE_TIMEOUT_SEC,
+    session_memory_mb: float = DEFAULT_SESSION_MEMORY_MB,
+    max_concurrent_executions: int = DEFAULT_MAX_CONCURRENT_EXECUTIONS,
+    cache_dir: Optional[str] = None,
+    cache_size_mb: float = DEFAULT_CACHE_SIZE_MB,
+):
     server = McpServer(name="mcp-python_code_execution")
+    # A pool size of 0 falls back to a fresh `uv run safe-execute` process per call
+    pool = await WorkerPool.start(pool_size, max_jobs_per_worker,
+                                  warm_imports) if pool_size > 0 else None
+    # With max_sessions set to 0, session ids are ignored and every call starts from scratch
+    sessions = SessionManager(max_sessions, session_idle_timeout_sec, session_memory_mb,
+                              warm_imports) if max_sessions > 0 else None
+    # Results are only cached when a cache directory is given, and only for runs on the pool
+    cache = ResultCache(cache_dir, cache_size_mb) if cache_dir is not None and pool is not None else None
+    # Executions run concurrently up to this limit; further calls wait for a slot
+    execution_slots = asyncio.Semaphore(max_concurrent_executions)
 
     @server.list_tools()
     async def list_tools() -> list[Tool]:
-        return [python_code_execution_tool]
+        if sessions is None:
+            return [python_code_execution_tool]
+        return [python_code_execution_tool, reset_python_session_tool]
 
     @server.call_tool()
     async def call_tool(tool_name: str, arguments: dict[str, Any]) -> list[Union[TextContent, ImageContent]]:
         try:
-            args = PythonCodeExecutionArgs(**arguments)
+            match tool_name:
+                case python_code_execution_tool.name:
+                    args = PythonCodeExecutionArgs(**arguments)
+                case reset_python_session_tool.name:
+                    args = ResetPythonSessionArgs(**arguments)
+                case _:
+                    args = None
         except ValidationError as e:
             raise McpError(ErrorData(
                 code=INTERNAL_ERROR,
@@ -200,18 +346,28 @@ async def serve():
             ))
         match tool_name:
             case python_code_execution_tool.name:
-                return await python_code_execution(args.code)
+                async with execution_slots:
+                    return await python_code_execution(args.code, pool, sessions, args.session_id,
+                                                       on_output=progress_reporter(server), cache=cache)
+            case reset_python_session_tool.name:
+                return await reset_python_session(args.session_id, sessions)
             case _:
                 raise McpError(ErrorData(
                     code=INTERNAL_ERROR,
                     message=f"Invalid tool name: {tool_name}"
                 ))
 
-    async with stdio_server() as (read_stream, write_stream):
-        logger.info("Starting LocalPython Code Execution Server...")
-        await server.run(
-            read_stream,
-            write_stream,
-            initialization_options=server.create_initialization_options(),
-            raise_exceptions=False
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            logger.info("Starting LocalPython Code Execution Server...")
+            await server.run(
+                read_stream,
+                write_stream,
+                initialization_options=server.create_initialization_options(),
+                raise_exceptions=False
+            )
+    finally:
+        if pool is not None:
+            pool.close()
+        if sessions is not None:
+            sessions.close()
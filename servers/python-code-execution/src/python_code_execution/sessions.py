@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from .schemas import (
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_SESSION_IDLE_TIMEOUT_SEC,
+    DEFAULT_SESSION_MEMORY_MB,
+    DEFAULT_WARM_IMPORTS,
+)
+from .worker_pool import SandboxWorker, WorkerError
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBusyError(RuntimeError):
+    """
+    Raised when a new session is needed but every open session is running a job, so none can be evicted.
+    """
+
+    pass
+
+
+@dataclass
+class Session:
+    # Started by the first call of the session
+    worker: Optional[SandboxWorker] = None
+    last_used: float = field(default_factory=time.monotonic)
+    # Calls to the same session run one after the other
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Calls running or waiting in the session; a session is only evicted when it has none
+    users: int = 0
+
+
+class SessionManager:
+    """
+    Long-lived sandbox workers that keep their variables and functions between calls, one per session id.
+
+    A session is discarded when it has been idle for `idle_timeout_sec`, when its worker grows beyond
+    `memory_limit_mb`, when a job crashes it, hits a resource limit or is cancelled, and when it is reset explicitly.
+    When `max_sessions` sessions are open, starting a new one evicts the least recently used session that has no call
+    running or waiting; if every session is busy, the new one is refused with SessionBusyError.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_timeout_sec: float = DEFAULT_SESSION_IDLE_TIMEOUT_SEC,
+        memory_limit_mb: float = DEFAULT_SESSION_MEMORY_MB,
+        warm_imports: list[str] = DEFAULT_WARM_IMPORTS,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout_sec = idle_timeout_sec
+        self.memory_limit_mb = memory_limit_mb
+        self.warm_imports = warm_imports
+        # Least recently used first
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def _open(self, session_id: str) -> Session:
+        """
+        Return the session, registering it first if it is new. This does not wait, so concurrent first calls with the
+        same id get the same session, and its lock makes them share one worker.
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            return session
+        while len(self._sessions) >= self.max_sessions:
+            idle = [sid for sid, s in self._sessions.items() if s.users == 0]
+            if not idle:
+                raise SessionBusyError(
+                    f"All {self.max_sessions} sessions are running code. Try again later or reset a session.")
+            logger.info(f"Evicting least recently used session {idle[0]}")
+            self.reset(idle[0])
+        session = self._sessions[session_id] = Session()
+        return session
+
+    def _discard(self, session_id: str, session: Session) -> None:
+        if session.worker is not None:
+            session.worker.kill()
+        if self._sessions.get(session_id) is session:
+            del self._sessions[session_id]
+
+    async def execute(
+        self,
+        session_id: str,
+        job: dict[str, Any],
+        timeout: float,
+        on_output: Optional[Callable[[str], Any]] = None,
+    ) -> dict[str, Any]:
+        """
+        Run a job in the session, starting the session if needed, and return the worker's reply.
+
+        Raises TimeoutError and WorkerError like WorkerPool.execute; the session is discarded in both cases and when
+        the call is cancelled. Raises SessionBusyError if the session is new and no session can make room for it.
+        """
+        if self.max_sessions <= 0:
+            raise ValueError("Sessions are disabled on this server")
+        self.evict_idle()
+
+        session = self._open(session_id)
+        session.users += 1
+        try:
+            async with session.lock:
+                if self._sessions.get(session_id) is not session:
+                    # An earlier call of the session crashed it, or it was reset, while this one waited
+                    raise RuntimeError(f"Session {session_id} was reset while this call was waiting for it")
+                try:
+                    if session.worker is None:
+                        session.worker = await SandboxWorker.start(self.warm_imports)
+                    reply = await session.worker.run({**job, "keep_state": True}, timeout, on_output)
+                except BaseException:
+                    self._discard(session_id, session)
+                    raise
+                session.last_used = time.monotonic()
+
+                if reply.pop("recycle", False) or not session.worker.alive():
+                    self._discard(session_id, session)
+                    reply["text"] += f"\n[Session {session_id} hit a resource limit and was reset]"
+                elif session.worker.memory_mb() > self.memory_limit_mb:
+                    self._discard(session_id, session)
+                    reply["text"] += (
+                        f"\n[Session {session_id} exceeded its {self.memory_limit_mb:g} MB memory cap and was reset]")
+        finally:
+            session.users -= 1
+        return reply
+
+    def reset(self, session_id: str) -> bool:
+        """Discard a session and its state. Returns whether the session existed."""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        if session.worker is not None:
+            session.worker.kill()
+        return True
+
+    def evict_idle(self) -> None:
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if session.users == 0 and now - session.last_used > self.idle_timeout_sec:
+                logger.info(f"Evicting idle session {session_id}")
+                self.reset(session_id)
+
+    def close(self) -> None:
+        for session_id in list(self._sessions):
+            self.reset(session_id)
@@ -0,0 +1,180 @@
+import argparse
+import logging
+import os
+import random
+import sys
+import threading
+from importlib import import_module
+
+from .local_python_executor import evaluate_python_code, resource_limit_message
+from .protocol import encode_result, read_message, write_message
+from .rendering import warm_up_kaleido
+from .schemas import BASE_BUILTIN_MODULES, DEFAULT_WARM_IMPORTS, STREAM_CHUNK_SIZE, STREAM_INTERVAL_SEC
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(modules: list[str]) -> None:
+    """
+    Import the given modules once so that later jobs only pay for their own code. Listing "kaleido" also starts the
+    kaleido process used to render plotly figures, which is then shared by all the jobs of the worker.
+    """
+    for module_name in [*BASE_BUILTIN_MODULES, *modules]:
+        try:
+            import_module(module_name)
+        except ImportError as e:
+            logger.warning(f"Could not pre-import {module_name}: {e}")
+    # Starting kaleido takes about a second, so it is only done up front when asked for
+    if "kaleido" in modules:
+        try:
+            warm_up_kaleido()
+        except Exception as e:
+            logger.warning(f"Could not start kaleido: {e}")
+
+
+def reset_shared_state(saved_rc_params) -> None:
+    """
+    Undo the process-wide side effects a job may have left behind, so the next job starts like a fresh process.
+    """
+    if "matplotlib.pyplot" in sys.modules:
+        sys.modules["matplotlib.pyplot"].close("all")
+    if saved_rc_params is not None:
+        sys.modules["matplotlib"].rcParams.update(saved_rc_params)
+    random.seed()
+    if "numpy" in sys.modules:
+        sys.modules["numpy"].random.seed()
+
+
+def random_state() -> tuple:
+    """
+    State of the global random generators. Jobs that draw from them, directly or through a library (e.g.
+    scipy.stats or pandas sampling), advance it, and since the generators are reseeded from the OS between jobs
+    their output differs from run to run.
+    """
+    numpy_state = None
+    if "numpy" in sys.modules:
+        name, keys, position, has_gauss, cached_gaussian = sys.modules["numpy"].random.get_state()
+        numpy_state = (name, keys.tobytes(), position, has_gauss, cached_gaussian)
+    return random.getstate(), numpy_state
+
+
+class OutputStream:
+    """
+    Forwards the prints of a job to the server as {"output": ...} messages.
+
+    Prints are batched into chunks of at most `chunk_size` characters, sent when a chunk is full or `interval`
+    seconds after the first pending print, so a chatty loop does not produce one message per print. At most
+    `max_length` characters are streamed per job; the reply still carries the truncated output.
+    """
+
+    def __init__(self, protocol, lock: threading.Lock, max_length: int,
+                 chunk_size: int = STREAM_CHUNK_SIZE, interval: float = STREAM_INTERVAL_SEC):
+        self.protocol = protocol
+        self.lock = lock
+        self.max_length = max_length
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self._pending = ""
+        self._streamed = 0
+        self._timer: threading.Timer | None = None
+
+    def write(self, text: str) -> None:
+        with self.lock:
+            text = text[:self.max_length - self._streamed - len(self._pending)]
+            if not text:
+                return
+            self._pending += text
+            while len(self._pending) >= self.chunk_size:
+                self._send(self.chunk_size)
+            if self._pending and self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self._pending:
+                self._send(self.chunk_size)
+
+    def _send(self, size: int) -> None:
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        self._streamed += len(chunk)
+        write_message(self.protocol, {"output": chunk})
+
+
+def main():
+    """
+    Entry point of a warm sandbox worker.
+
+    The worker reads one job message at a time on stdin and answers with one reply message on stdout, using the
+    framed messages of the protocol module. Resource limits are applied per job by evaluate_python_code. A reply with
+    "recycle" set asks the pool to replace this worker. A reply with "used_random" set drew from the global random
+    generators, so its result is not cached. Jobs with "keep_state" set share their variables and functions, which is
+    how sessions retain state; the state of the process (open figures, matplotlib settings, random generators) is
+    only reset after other jobs. Jobs with "stream_output" set also get their prints in {"output": ...} messages
+    before the reply, see OutputStream.
+    """
+    parser = argparse.ArgumentParser(
+        description='Long-lived worker executing Python code in a sandboxed environment')
+    parser.add_argument('--warm-imports', type=str, nargs='*', default=DEFAULT_WARM_IMPORTS,
+                        help='Modules to import before accepting jobs')
+    args = parser.parse_args()
+
+    # Keep the real stdout for the protocol; anything else written to it (e.g. by native code) goes to stderr
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    warm_up(args.warm_imports)
+    saved_rc_params = sys.modules["matplotlib"].rcParams.copy() if "matplotlib" in sys.modules else None
+
+    write_message(protocol, {"ready": True})
+
+    # Variables and functions kept between the jobs of a session
+    session_state, session_tools = {}, {}
+    # Output chunks may be sent from a timer thread
+    protocol_lock = threading.Lock()
+
+    while (message := read_message(sys.stdin.buffer)) is not None:
+        job, _ = message
+        if job.get("keep_state"):
+            state, custom_tools = session_state, session_tools
+        else:
+            state, custom_tools = {}, {}
+        stream = OutputStream(protocol, protocol_lock, job["max_print_length"]) if job.get("stream_output") else None
+        initial_random_state = random_state()
+        try:
+            result, images = evaluate_python_code(
+                code=job["code"],
+                custom_tools=custom_tools,
+                state=state,
+                authorized_imports=job["authorized_imports"],
+                max_print_outputs_length=job["max_print_length"],
+                max_memory_mb=job["max_memory_mb"],
+                max_cpu_time_sec=job["max_cpu_time_sec"],
+                on_print=stream.write if stream is not None else None
+            )
+            reply, payloads = encode_result(result, images)
+            reply["recycle"] = state.get("_resource_limit_exceeded", False)
+            reply["used_random"] = random_state() != initial_random_state
+        except Exception as e:
+            reply, payloads = {
+                "text": resource_limit_message(f"{type(e).__name__}: {e}"),
+                "content": [],
+                "recycle": True
+            }, []
+
+        if stream is not None:
+            stream.flush()
+        with protocol_lock:
+            write_message(protocol, reply, payloads)
+        # A session's worker is its own, so its open figures, settings and random state carry over to its next job
+        if not job.get("keep_state"):
+            reset_shared_state(saved_rc_params)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Any, Callable, Optional
+
+import psutil
+
+from .protocol import decode_result, encode_message, read_message_async
+from .schemas import (
+    DEFAULT_MAX_JOBS_PER_WORKER,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_WARM_IMPORTS,
+    WORKER_START_BACKOFF_SEC,
+    WORKER_START_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerError(RuntimeError):
+    """
+    Raised when a sandbox worker dies or breaks the protocol while running a job.
+    """
+
+    pass
+
+
+class SandboxWorker:
+    """
+    A pre-forked `python -m python_code_execution.worker` process with the heavy libraries already imported.
+
+    Create workers with `await SandboxWorker.start(...)`.
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.jobs_done = 0
+        self._ready = False
+
+    @classmethod
+    async def start(cls, warm_imports: list[str]) -> "SandboxWorker":
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "python_code_execution.worker",
+            "--warm-imports", *warm_imports,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env={**os.environ, "MPLBACKEND": "Agg"},
+        )
+        return cls(process)
+
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    def memory_mb(self) -> float:
+        """Resident memory of the worker process in MB."""
+        try:
+            return psutil.Process(self.process.pid).memory_info().rss / (1024 * 1024)
+        except psutil.NoSuchProcess:
+            return 0.0
+
+    def kill(self) -> None:
+        """Kill the worker without waiting; the event loop reaps the process."""
+        if self.alive():
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def _read_message(self, deadline: float) -> dict[str, Any]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Sandbox worker did not answer in time")
+        try:
+            header, payloads = await asyncio.wait_for(read_message_async(self.process.stdout), remaining)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Sandbox worker did not answer in time")
+        except asyncio.IncompleteReadError:
+            raise WorkerError(
+                f"Sandbox worker exited unexpectedly (exit code {await self.process.wait()})")
+        return decode_result(header, payloads)
+
+    async def run(
+        self,
+        job: dict[str, Any],
+        timeout: float,
+        on_output: Optional[Callable[[str], Any]] = None,
+    ) -> dict[str, Any]:
+        """
+        Run a job and return the worker's reply, with the raw bytes of its figures. If `on_output` is given, it is
+        called with the text of every print while the job is running; it may be a coroutine function.
+
+        Cancelling the call kills the worker, since the job cannot be interrupted otherwise.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            # The first job waits for the warm-up imports to finish
+            if not self._ready:
+                await self._read_message(deadline)
+                self._ready = True
+            try:
+                self.process.stdin.writelines(
+                    encode_message({**job, "stream_output": on_output is not None}))
+                await self.process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError) as e:
+                raise WorkerError("Sandbox worker is not accepting jobs") from e
+
+            while True:
+                message = await self._read_message(deadline)
+                if "output" not in message:
+                    break
+                result = on_output(message["output"])
+                if asyncio.iscoroutine(result):
+                    await result
+        except asyncio.CancelledError:
+            self.kill()
+            raise
+        self.jobs_done += 1
+        return message
+
+
+class WorkerPool:
+    """
+    A fixed-size pool of warm sandbox workers.
+
+    Each worker runs one job at a time, so at most `size` jobs run in parallel and later ones wait for a free worker.
+    A worker is replaced by a fresh one after `max_jobs_per_worker` jobs, after a job hit a resource limit, and
+    whenever it dies, times out or is cancelled, so no job can leak into the next one for long. A replacement that
+    fails to start is retried with backoff; if it keeps failing, the pool shrinks, and once no worker is left,
+    `execute` raises WorkerError instead of waiting.
+
+    Create pools with `await WorkerPool.start(...)`.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER,
+        warm_imports: list[str] = DEFAULT_WARM_IMPORTS,
+    ):
+        if size <= 0:
+            raise ValueError(f"Pool size must be positive, got {size}")
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.warm_imports = warm_imports
+        # None is put in the queue to wake up waiting calls once the last worker is lost
+        self._idle: asyncio.Queue[Optional[SandboxWorker]] = asyncio.Queue()
+        self._spawning: set[asyncio.Task] = set()
+        # Workers that are idle, running a job or being replaced
+        self._slots = size
+
+    @classmethod
+    async def start(
+        cls,
+        size: int = DEFAULT_POOL_SIZE,
+        max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER,
+        warm_imports: list[str] = DEFAULT_WARM_IMPORTS,
+    ) -> "WorkerPool":
+        pool = cls(size, max_jobs_per_worker, warm_imports)
+        for _ in range(size):
+            pool._idle.put_nowait(await SandboxWorker.start(warm_imports))
+        return pool
+
+    async def execute(
+        self,
+        job: dict[str, Any],
+        timeout: float,
+        on_output: Optional[Callable[[str], Any]] = None,
+    ) -> dict[str, Any]:
+        """
+        Run a job on the next idle worker and return its reply ({"text": ..., "content": [...], "recycle": ...}).
+
+        Raises TimeoutError if the job runs longer than `timeout` seconds and WorkerError if the worker died,
+        e.g. because it exceeded its CPU time limit, or if no worker could be started.
+        """
+        worker = await self._idle.get()
+        if worker is None:
+            self._idle.put_nowait(None)
+            raise WorkerError("No sandbox workers are left: new workers failed to start")
+        recycle = True
+        try:
+            reply = await worker.run(job, timeout, on_output)
+            recycle = reply.get("recycle", False) or worker.jobs_done >= self.max_jobs_per_worker
+            return reply
+        finally:
+            if recycle or not worker.alive():
+                worker.kill()
+                # Spawn the replacement in the background so a cancelled call does not leave the pool short
+                task = asyncio.ensure_future(self._replace())
+                self._spawning.add(task)
+                task.add_done_callback(self._spawning.discard)
+            else:
+                self._idle.put_nowait(worker)
+
+    async def _replace(self) -> None:
+        delay = WORKER_START_BACKOFF_SEC
+        for attempt in range(1, WORKER_START_RETRIES + 1):
+            try:
+                self._idle.put_nowait(await SandboxWorker.start(self.warm_imports))
+                return
+            except Exception as e:
+                logger.warning(f"Could not start a sandbox worker (attempt {attempt}/{WORKER_START_RETRIES}): {e}")
+            if attempt < WORKER_START_RETRIES:
+                await asyncio.sleep(delay)
+                delay *= 2
+        self._slots -= 1
+        logger.error(f"Giving up on replacing a sandbox worker; {self._slots} of {self.size} workers left")
+        if self._slots == 0:
+            self._idle.put_nowait(None)
+
+    def close(self) -> None:
+        for task in self._spawning:
+            task.cancel()
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            if worker is not None:
+                worker.kill()
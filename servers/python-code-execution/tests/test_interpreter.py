@@ -0,0 +1,193 @@
+"""
+Simple tests for the sandboxed interpreter - scopes of calls, closures and comprehensions.
+"""
+
+import contextlib
+import io
+import pytest
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from python_code_execution import local_python_executor
+from python_code_execution.local_python_executor import Scope, evaluate_python_code
+
+
+@pytest.fixture(autouse=True)
+def no_resource_limits(monkeypatch):
+    """Keep the per-job CPU and memory limits off the test process."""
+    monkeypatch.setattr(local_python_executor, "set_resource_limits", lambda *args: None)
+
+
+def interpret(code):
+    """Printed output of the code run by the sandboxed interpreter."""
+    output, _ = evaluate_python_code(code, authorized_imports=["math"])
+    return output
+
+
+def python(code):
+    """Printed output of the code run by Python itself."""
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        exec(code, {})
+    return stdout.getvalue()
+
+
+RECURSION = {
+    "factorial": """
+def factorial(n):
+    return 1 if n <= 1 else n * factorial(n - 1)
+print(factorial(10))
+""",
+    "fibonacci": """
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+print([fib(i) for i in range(12)])
+""",
+    "mutual": """
+def is_even(n):
+    return True if n == 0 else is_odd(n - 1)
+def is_odd(n):
+    return False if n == 0 else is_even(n - 1)
+print(is_even(10), is_odd(7), is_even(3))
+""",
+    "locals_per_call": """
+def depth(n):
+    x = n
+    if n > 0:
+        depth(n - 1)
+    print(n, x)
+depth(3)
+""",
+}
+
+CLOSURES = {
+    "late_binding": """
+functions = [lambda: i for i in range(3)]
+print([f() for f in functions])
+""",
+    "default_capture": """
+functions = [lambda i=i: i * 10 for i in range(3)]
+print([f() for f in functions])
+""",
+    "loop_variable": """
+functions = []
+for i in range(3):
+    def show(k=i):
+        return k
+    functions.append(show)
+print([f() for f in functions], i)
+""",
+    "factory": """
+def make_adder(n):
+    def add(x):
+        return x + n
+    return add
+adders = [make_adder(n) for n in range(4)]
+print([add(100) for add in adders])
+""",
+    "outer_name": """
+scale = 2
+def f(x):
+    return scale * x
+scale = 3
+print(f(5))
+""",
+    "no_leak": """
+x = 1
+def f():
+    x = 2
+    y = 3
+    return x + y
+print(f(), x)
+""",
+}
+
+COMPREHENSIONS = {
+    "nested_outer_names": """
+offset = 100
+n = 3
+grid = [[offset + i * n + j for j in range(n)] for i in range(n)]
+print(grid)
+""",
+    "nested_filters": """
+limit = 5
+pairs = [(i, j) for i in range(limit) if i % 2 == 0 for j in range(i) if j != limit - 4]
+print(pairs)
+""",
+    "inner_uses_outer_variable": """
+words = ['ab', 'cde']
+print([[c * k for c in w] for k, w in enumerate(words, 1)])
+print({w: {c: w.index(c) for c in w} for w in words})
+print(sorted({len(w) + k for k in range(2) for w in words}))
+""",
+    "variable_does_not_leak": """
+i = 'outer'
+squares = [i * i for i in range(4)]
+print(squares, i)
+""",
+    "inside_function": """
+def table(n):
+    base = 10
+    return [[base * i + j for j in range(n)] for i in range(n)]
+print(table(3))
+""",
+    "generator": """
+total = 7
+print(sum(x + total for x in range(5)))
+""",
+}
+
+
+class TestScopes:
+    """Test that calls, lambdas and comprehensions see the same names as in Python."""
+
+    @pytest.mark.parametrize("code", RECURSION.values(), ids=RECURSION.keys())
+    def test_recursion(self, code):
+        """Test recursive and mutually recursive functions, with locals kept per call."""
+        assert interpret(code) == python(code)
+
+    @pytest.mark.parametrize("code", CLOSURES.values(), ids=CLOSURES.keys())
+    def test_closures(self, code):
+        """Test closures capturing loop variables and names of enclosing scopes."""
+        assert interpret(code) == python(code)
+
+    @pytest.mark.parametrize("code", COMPREHENSIONS.values(), ids=COMPREHENSIONS.keys())
+    def test_comprehensions(self, code):
+        """Test nested comprehensions that reference outer names."""
+        assert interpret(code) == python(code)
+
+    def test_state_kept(self):
+        """Test that only top-level names end up in the state."""
+        state = {}
+        evaluate_python_code("def f(a):\n    b = a\n    return b\nc = [f(k) for k in range(3)]", state=state)
+        assert state["c"] == [0, 1, 2]
+        assert "a" not in state and "b" not in state and "k" not in state
+
+
+class TestScope:
+    """Test the layered scope itself."""
+
+    def test_reads_fall_through(self):
+        """Test that reads reach enclosing scopes and writes stay local."""
+        outer = {"x": 1, "y": 2}
+        inner = Scope(Scope(outer))
+        inner["x"] = 10
+        assert inner["x"] == 10 and inner["y"] == 2
+        assert outer["x"] == 1
+        assert "y" in inner and "z" not in inner
+        assert inner.get("z", 5) == 5
+        assert inner.keys() == {"x", "y"}
+
+    def test_delete_local_only(self):
+        """Test that only names bound in the scope itself can be deleted."""
+        inner = Scope({"x": 1})
+        inner["y"] = 2
+        del inner["y"]
+        assert "y" not in inner
+        with pytest.raises(local_python_executor.InterpreterError):
+            del inner["x"]
@@ -0,0 +1,111 @@
+"""
+Simple tests for print output - streaming to the server in chunks and the ring buffer of printed text.
+"""
+
+import io
+import random
+import threading
+import time
+import pytest
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from python_code_execution.local_python_executor import PrintContainer, truncate_content
+from python_code_execution.protocol import read_message
+from python_code_execution.worker import OutputStream
+
+
+def streamed(protocol):
+    """Text of the output messages written to the protocol stream."""
+    stream = io.BytesIO(protocol.getvalue())
+    chunks = []
+    while (message := read_message(stream)) is not None:
+        chunks.append(message[0]["output"])
+    return chunks
+
+
+def output_stream(max_length=1000, chunk_size=10, interval=60.0):
+    protocol = io.BytesIO()
+    return protocol, OutputStream(protocol, threading.Lock(), max_length, chunk_size=chunk_size, interval=interval)
+
+
+class TestOutputStream:
+    """Test batching prints into output messages."""
+
+    def test_chunks(self):
+        """Test that full chunks are sent right away and the rest on flush."""
+        protocol, stream = output_stream()
+        for i in range(5):
+            stream.write(f"line {i}\n")
+        assert streamed(protocol) == ["line 0\nlin", "e 1\nline 2", "\nline 3\nli"]
+        stream.flush()
+        assert streamed(protocol)[3:] == ["ne 4\n"]
+        assert "".join(streamed(protocol)) == "".join(f"line {i}\n" for i in range(5))
+
+    def test_interval_flush(self):
+        """Test that a pending print is sent once the interval has passed, without a flush."""
+        protocol, stream = output_stream(interval=0.05)
+        stream.write("hello")
+        assert streamed(protocol) == []
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            # The timer thread writes under the lock
+            with stream.lock:
+                if streamed(protocol):
+                    break
+            time.sleep(0.01)
+        assert streamed(protocol) == ["hello"]
+        # The timer is started again by the next print
+        stream.write("again")
+        stream.flush()
+        assert streamed(protocol) == ["hello", "again"]
+
+    def test_max_length(self):
+        """Test that at most max_length characters are streamed, across chunks and flushes."""
+        protocol, stream = output_stream(max_length=25)
+        stream.write("a" * 12)
+        stream.flush()
+        stream.write("b" * 20)
+        stream.write("c" * 5)
+        stream.flush()
+        assert "".join(streamed(protocol)) == "a" * 12 + "b" * 13
+        assert all(len(chunk) <= 10 for chunk in streamed(protocol))
+
+
+class TestPrintContainer:
+    """Test the ring buffer holding the printed text."""
+
+    @pytest.mark.parametrize("max_length", [1, 10, 11, 100])
+    def test_truncation(self, max_length):
+        """Test that the retained text matches truncate_content of everything printed."""
+        rng = random.Random(max_length)
+        container = PrintContainer(max_length=max_length)
+        printed = ""
+        for _ in range(200):
+            text = "".join(rng.choice("abc\n") for _ in range(rng.randrange(0, 3 * max_length)))
+            container += text
+            printed += text
+            assert container.value == truncate_content(printed, max_length)
+            assert len(container) == len(printed)
+
+    def test_memory_bounded(self):
+        """Test that the tail keeps only the last characters however much is printed."""
+        container = PrintContainer(max_length=100)
+        for i in range(10000):
+            container += f"{i}\n"
+        assert container.tail_length == 50
+        assert len(container.head) == 50
+        assert container.value.endswith("9998\n9999\n")
+
+    def test_on_write(self):
+        """Test that every print is passed to on_write, also beyond max_length, while write() is not."""
+        written = []
+        container = PrintContainer(on_write=written.append, max_length=4)
+        container += "hello"
+        container.append(" world")
+        container.write("!")
+        assert written == ["hello", " world"]
+        assert container.value == truncate_content("hello world!", 4)
@@ -0,0 +1,133 @@
+"""
+Simple tests for the worker protocol - framed messages with binary payloads, and truncated frames.
+"""
+
+import asyncio
+import io
+import sys
+from pathlib import Path
+
+import pytest
+from mcp.types import EmbeddedResource, TextResourceContents
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from python_code_execution.protocol import (
+    decode_result,
+    encode_message,
+    encode_result,
+    read_message,
+    read_message_async,
+    split_result,
+)
+from python_code_execution.result_cache import ResultCache
+from python_code_execution.schemas import FigureImage
+from python_code_execution.worker_pool import SandboxWorker, WorkerError
+
+MESSAGES = [
+    ({"ready": True}, []),
+    ({"text": "héllo", "content": [{"type": "image", "payload": 0}]}, [bytes(range(256)) * 100]),
+    ({"output": ""}, [b"", b"\x00", b"\n" * 3]),
+]
+
+
+def encoded(messages):
+    return b"".join(part for header, payloads in messages for part in encode_message(header, payloads))
+
+
+async def read_all_async(data):
+    """Messages read back by read_message_async from a stream holding `data`."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return [await read_message_async(reader) for _ in MESSAGES]
+
+
+class TestRoundTrip:
+    """Test encoding and reading back messages."""
+
+    def test_read_message(self):
+        """Test reading messages with binary payloads from a blocking stream, up to its end."""
+        stream = io.BytesIO(encoded(MESSAGES))
+        assert [read_message(stream) for _ in MESSAGES] == MESSAGES
+        assert read_message(stream) is None
+
+    def test_short_reads(self):
+        """Test that messages are put together from short reads, as on pipes."""
+
+        class Trickle(io.BytesIO):
+            def read(self, size=-1):
+                return super().read(min(size, 7))
+
+        stream = Trickle(encoded(MESSAGES))
+        assert [read_message(stream) for _ in MESSAGES] == MESSAGES
+
+    def test_read_message_async(self):
+        """Test reading messages with binary payloads from an asyncio stream."""
+        assert asyncio.run(read_all_async(encoded(MESSAGES))) == MESSAGES
+
+    def test_result(self):
+        """Test that figures and resources travel as payloads and come back as they were."""
+        image = FigureImage(data=b"\x89PNG\r\n\x1a\n\x00", mimeType="image/png")
+        resource = EmbeddedResource(
+            type="resource",
+            resource=TextResourceContents(uri="project://fig", text='{"data": []}', mimeType="application/json"),
+            extra_type="plotly",
+        )
+        header, payloads = encode_result("done", [image, resource])
+        assert payloads == [image.data, b'{"data": []}']
+        assert "data" not in str(header["content"][0])
+
+        reply = decode_result(*read_message(io.BytesIO(encoded([(header, payloads)]))))
+        assert reply["content"][0]["data"] == image.data
+        assert reply["content"][1]["resource"]["text"] == '{"data": []}'
+        assert split_result(reply) == encode_result("done", [image, resource])
+
+
+class TestTruncated:
+    """Test streams that end within a message."""
+
+    @pytest.mark.parametrize("cut", [1, 7, 8, 20, -9, -1])
+    def test_read_message(self, cut):
+        """Test that a truncated message raises EOFError instead of returning a partial one."""
+        data = encoded(MESSAGES[1:2])
+        with pytest.raises(EOFError):
+            read_message(io.BytesIO(data[:cut]))
+
+    @pytest.mark.parametrize("cut", [1, 20, -1])
+    def test_read_message_async(self, cut):
+        """Test that a truncated message raises asyncio.IncompleteReadError."""
+        data = encoded(MESSAGES[1:2])
+        with pytest.raises(asyncio.IncompleteReadError):
+            asyncio.run(read_all_async(data[:cut]))
+
+    def test_worker_error(self):
+        """Test that a worker dying within a message is reported as WorkerError."""
+        data = encoded([({"ready": True}, [])])[:-3]
+        code = f"import sys; sys.stdout.buffer.write({data!r}); sys.exit(3)"
+
+        async def run():
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "-c", code, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+            worker = SandboxWorker(process)
+            try:
+                await worker.run({"code": "print(1)"}, 30)
+            finally:
+                worker.kill()
+                # Let the transport close before the loop does
+                await asyncio.sleep(0.1)
+
+        with pytest.raises(WorkerError, match="exit code 3"):
+            asyncio.run(asyncio.wait_for(run(), 60))
+
+    def test_result_cache_entry(self, tmp_path):
+        """Test that a truncated cache entry is dropped instead of failing the call."""
+        job = {"code": "print(1)", "authorized_imports": [], "max_print_length": 100, "max_memory_mb": 100,
+               "max_cpu_time_sec": 10}
+        cache = ResultCache(str(tmp_path))
+        cache.put(job, {"text": "1", "content": []})
+        (path,) = tmp_path.iterdir()
+        path.write_bytes(path.read_bytes()[:-2])
+        assert cache.get(job) is None
+        assert list(tmp_path.iterdir()) == []
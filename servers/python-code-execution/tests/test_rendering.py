@@ -0,0 +1,130 @@
+"""
+Simple tests for figure rendering - formats, DPI and pixel caps, and thinning out large plots.
+"""
+
+import io
+import numpy as np
+import pytest
+from pathlib import Path
+import sys
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import plotly.graph_objects as go
+from PIL import Image
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from python_code_execution.rendering import downsample_plotly, normalize_format, render_figure, render_matplotlib
+from python_code_execution.schemas import MAX_FIGURE_DPI, MAX_FIGURE_PIXELS
+
+
+def image_size(rendered):
+    """Pixel width and height of the image among rendered figure content."""
+    image = next(item for item in rendered if hasattr(item, "mimeType") and item.mimeType.startswith("image/"))
+    return Image.open(io.BytesIO(image.data)).size
+
+
+def spiky_signal(length=100_000, spike=54_321):
+    """A fast oscillation with one spike, which plain striding misses."""
+    y = np.sin(np.arange(length) * 2.9)
+    y[spike] = 10.0
+    return np.arange(length), y
+
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    yield
+    plt.close("all")
+
+
+class TestLimits:
+    """Test the image format, DPI and pixel limits."""
+
+    def test_formats(self):
+        """Test accepted format names."""
+        assert normalize_format(None) == "png"
+        assert normalize_format("JPG") == "jpeg"
+        with pytest.raises(ValueError):
+            normalize_format("bmp")
+
+    def test_dpi_cap(self):
+        """Test that a requested DPI above MAX_FIGURE_DPI is lowered to it."""
+        fig = plt.figure(figsize=(4, 3))
+        assert image_size(render_figure(fig, "png", dpi=1000)) == (4 * MAX_FIGURE_DPI, 3 * MAX_FIGURE_DPI)
+        assert image_size(render_figure(fig, "png", dpi=50)) == (200, 150)
+
+    def test_matplotlib_pixel_cap(self):
+        """Test that a large figure is rendered within MAX_FIGURE_PIXELS."""
+        fig = plt.figure(figsize=(40, 30))
+        width, height = image_size(render_figure(fig, "png"))
+        assert width * height <= MAX_FIGURE_PIXELS
+        assert width / height == pytest.approx(4 / 3, rel=0.01)
+
+    def test_plotly_pixel_cap(self):
+        """Test that a large plotly figure is scaled down within MAX_FIGURE_PIXELS."""
+        fig = go.Figure(go.Scatter(y=[1, 3, 2]), layout={"width": 4000, "height": 3000})
+        width, height = image_size(render_figure(fig, "png"))
+        assert width * height <= MAX_FIGURE_PIXELS
+        assert width / height == pytest.approx(4 / 3, rel=0.01)
+
+
+class TestDownsampling:
+    """Test thinning out large plots for rendering."""
+
+    def test_matplotlib_line_keeps_peaks(self, monkeypatch):
+        """Test that a long line is thinned out with its spike and envelope kept, and restored afterwards."""
+        x, y = spiky_signal()
+        fig, ax = plt.subplots()
+        (line,) = ax.plot(x, y)
+        (markers,) = ax.plot(x, y, "o")
+        drawn = []
+        savefig = fig.savefig
+        monkeypatch.setattr(fig, "savefig", lambda *args, **kwargs: (
+            drawn.extend([line.get_ydata(), markers.get_ydata()]), savefig(*args, **kwargs)))
+
+        render_matplotlib(fig, "png", max_points=1000)
+        for ydata in drawn:
+            assert len(ydata) <= 1002
+            assert ydata.max() == 10.0
+            assert ydata.min() == pytest.approx(-1.0, abs=1e-3)
+        np.testing.assert_array_equal(line.get_ydata(), y)
+
+    def test_matplotlib_scatter_stride(self, monkeypatch):
+        """Test that scatter plots keep every n-th point with their colors and sizes."""
+        fig, ax = plt.subplots()
+        collection = ax.scatter(np.arange(5000), np.arange(5000), c=np.arange(5000), s=np.arange(5000))
+        drawn = []
+        savefig = fig.savefig
+        monkeypatch.setattr(fig, "savefig", lambda *args, **kwargs: (
+            drawn.append((collection.get_offsets().copy(), collection.get_array().copy())), savefig(*args, **kwargs)))
+
+        render_matplotlib(fig, "png", max_points=1000)
+        offsets, values = drawn[0]
+        assert len(offsets) == len(values) == 1000
+        np.testing.assert_array_equal(values, np.arange(0, 5000, 5))
+        assert len(collection.get_offsets()) == 5000
+
+    def test_plotly_lines_keep_peaks(self):
+        """Test that plotly traces drawn with lines keep their spike, along with per-point properties."""
+        x, y = spiky_signal()
+        fig = go.Figure(go.Scatter(x=x, y=y, text=[str(i) for i in x])).to_dict()
+        trace = downsample_plotly(fig, max_points=1000)["data"][0]
+        assert len(trace["y"]) <= 1002
+        assert max(trace["y"]) == 10.0
+        assert list(trace["text"]) == [str(i) for i in trace["x"]]
+        assert len(fig["data"][0]["y"]) == len(y)
+
+    def test_plotly_markers_stride(self):
+        """Test that marker-only plotly traces keep every n-th point and their marker colors."""
+        fig = go.Figure(go.Scatter(y=np.arange(5000.0), mode="markers", marker={"color": np.arange(5000)}))
+        trace = downsample_plotly(fig.to_dict(), max_points=1000)["data"][0]
+        np.testing.assert_array_equal(trace["y"], np.arange(0, 5000, 5))
+        np.testing.assert_array_equal(trace["marker"]["color"], np.arange(0, 5000, 5))
+
+    def test_small_traces_untouched(self):
+        """Test that traces within the limit are passed through as they are."""
+        fig = go.Figure(go.Scatter(y=[1, 2, 3])).to_dict()
+        assert downsample_plotly(fig, max_points=1000)["data"][0] is fig["data"][0]
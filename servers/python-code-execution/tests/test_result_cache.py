@@ -0,0 +1,122 @@
+"""
+Simple tests for the result cache - determinism checks, storage, eviction and runs that drew random numbers.
+"""
+
+import asyncio
+import os
+import pytest
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from python_code_execution.result_cache import ResultCache, is_deterministic
+from python_code_execution.schemas import BASE_BUILTIN_MODULES, DEFAULT_MAX_LEN_OUTPUT
+from python_code_execution.worker_pool import WorkerPool
+
+
+def job(code):
+    return {
+        "code": code,
+        "authorized_imports": BASE_BUILTIN_MODULES,
+        "max_print_length": DEFAULT_MAX_LEN_OUTPUT,
+        "max_memory_mb": 1000,
+        "max_cpu_time_sec": 15,
+    }
+
+
+DETERMINISTIC = {
+    "arithmetic": "print(sum(i * i for i in range(10)))",
+    "numpy": "import numpy as np\nprint(np.linalg.norm(np.ones(3)))",
+    "from_import": "from math import sqrt\nprint(sqrt(2))",
+    "syntax_error": "print(",
+}
+
+NONDETERMINISTIC = {
+    "import_random": "import random\nprint(random.random())",
+    "numpy_random": "import numpy as np\nprint(np.random.rand())",
+    "from_numpy_random": "from numpy.random import rand\nprint(rand())",
+    "from_numpy_import_random_alias": "from numpy import random as r\nprint(r.rand())",
+    "from_import_function": "from numpy.random import default_rng as make\nprint(make().random())",
+    "from_import_clock": "from time import perf_counter as clock\nprint(clock())",
+    "now": "from datetime import datetime\nprint(datetime.now())",
+    "getattr": "import math\nprint(getattr(math, 'pi'))",
+}
+
+
+class TestIsDeterministic:
+    """Test the static check for sources of randomness and time."""
+
+    @pytest.mark.parametrize("code", DETERMINISTIC.values(), ids=DETERMINISTIC.keys())
+    def test_deterministic(self, code):
+        """Test code without randomness or time."""
+        assert is_deterministic(code)
+
+    @pytest.mark.parametrize("code", NONDETERMINISTIC.values(), ids=NONDETERMINISTIC.keys())
+    def test_nondeterministic(self, code):
+        """Test code that imports or names a source of randomness or time, also under another name."""
+        assert not is_deterministic(code)
+
+
+class TestResultCache:
+    """Test storing, serving and evicting results."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that a stored reply comes back with its images, also from a new cache on the same directory."""
+        cache = ResultCache(str(tmp_path))
+        reply = {"text": "done", "content": [{"type": "image", "mimeType": "image/png", "data": b"\x89PNG\x00"}]}
+        assert cache.get(job("print(1)")) is None
+        assert cache.put(job("print(1)"), reply)
+        assert cache.get(job("print(1)")) == reply
+        assert ResultCache(str(tmp_path)).get(job("print(1)\n")) == reply
+
+    def test_key(self):
+        """Test that the limits are part of the key and trailing whitespace is not."""
+        assert ResultCache.key(job("print(1)")) == ResultCache.key(job("print(1)\r\n"))
+        assert ResultCache.key(job("print(1)")) != ResultCache.key({**job("print(1)"), "max_memory_mb": 10})
+
+    def test_nondeterministic_not_stored(self, tmp_path):
+        """Test that random code and runs that drew from the global generators are not stored."""
+        cache = ResultCache(str(tmp_path))
+        assert not cache.put(job(NONDETERMINISTIC["from_numpy_import_random_alias"]), {"text": "0.5", "content": []})
+        assert not cache.put(job("print(1)"), {"text": "1", "content": [], "used_random": True})
+        assert cache.get(job("print(1)")) is None
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test that the cache stays under its size by dropping the least recently used results."""
+        reply = {"text": "x" * 1000, "content": []}
+        cache = ResultCache(str(tmp_path), max_size_mb=2500 / 1024 / 1024)
+        cache.put(job("print(1)"), reply)
+        cache.put(job("print(2)"), reply)
+        assert cache.get(job("print(1)")) is not None
+        cache.put(job("print(3)"), reply)
+        assert cache.get(job("print(2)")) is None
+        assert cache.get(job("print(1)")) is not None
+        assert len(os.listdir(tmp_path)) == 2
+
+
+class TestUsedRandom:
+    """Test that workers report the runs that drew from the global random generators."""
+
+    @pytest.mark.parametrize("code, used_random", [
+        ("print(sum(range(10)))", False),
+        # Passes the static check, but draws from the global generator
+        ("import statistics\nprint(statistics.NormalDist().samples(2))", True),
+        ("import numpy as np\nprint(np.random.rand())", True),
+    ])
+    def test_used_random(self, monkeypatch, code, used_random):
+        """Test the flag on runs with and without random draws."""
+        # The worker runs in a subprocess, which needs to import the package too
+        monkeypatch.setenv("PYTHONPATH", str(Path(__file__).parent.parent / "src"))
+
+        async def run():
+            pool = await WorkerPool.start(1, warm_imports=[])
+            try:
+                return await pool.execute(job(code), 30)
+            finally:
+                pool.close()
+                # Let the killed worker's transport close before the loop does
+                await asyncio.sleep(0.1)
+
+        assert asyncio.run(asyncio.wait_for(run(), 60))["used_random"] is used_random
@@ -0,0 +1,117 @@
+"""
+Simple tests for module views - lazy attribute access, blocked modules and sharing views between jobs.
+"""
+
+import math
+import pytest
+from pathlib import Path
+import sys
+
+import numpy
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from python_code_execution import local_python_executor
+from python_code_execution.local_python_executor import (
+    InterpreterError,
+    SAFE_MODULE_CACHE,
+    SafeModule,
+    evaluate_python_code,
+    get_safe_module,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_resource_limits(monkeypatch):
+    """Keep the per-job CPU and memory limits off the test process."""
+    monkeypatch.setattr(local_python_executor, "set_resource_limits", lambda *args: None)
+
+
+def interpret(code, authorized_imports=("math", "numpy", "random")):
+    """Printed output of the code run by the sandboxed interpreter, including its error message."""
+    output, _ = evaluate_python_code(code, authorized_imports=list(authorized_imports))
+    return output
+
+
+class TestSafeModule:
+    """Test the views themselves."""
+
+    def test_attribute_access(self):
+        """Test that attributes are resolved from the module on first access and nested modules become views."""
+        view = get_safe_module(numpy, ["numpy"])
+        assert isinstance(view, SafeModule)
+        assert view.__name__ == "numpy"
+        assert view.pi == numpy.pi
+        assert view.ones is numpy.ones
+        assert isinstance(view.linalg, SafeModule)
+        assert view.linalg.norm is numpy.linalg.norm
+        assert "ones" in dir(view)
+        with pytest.raises(AttributeError):
+            view.no_such_attribute
+
+    def test_lazy(self):
+        """Test that only accessed attributes are copied onto the view."""
+        view = SafeModule(math, ["math"])
+        assert "sqrt" not in view.__dict__
+        assert view.sqrt is math.sqrt
+        assert view.__dict__["sqrt"] is math.sqrt
+
+    def test_read_only(self):
+        """Test that assigning or deleting attributes of a view raises InterpreterError."""
+        view = get_safe_module(math, ["math"])
+        with pytest.raises(InterpreterError):
+            view.pi = 3
+        with pytest.raises(InterpreterError):
+            del view.pi
+        assert view.pi == math.pi
+
+    def test_cache(self):
+        """Test that views are shared per module and set of authorized imports."""
+        view = get_safe_module(math, ["math", "numpy"])
+        assert get_safe_module(math, ["numpy", "math"]) is view
+        assert get_safe_module(math, ["math"]) is not view
+        assert SAFE_MODULE_CACHE[("math", frozenset(["math", "numpy"]))] is view
+        assert get_safe_module(view, ["math"]) is view
+        assert get_safe_module(math.sqrt, ["math"]) is math.sqrt
+
+
+class TestInterpreter:
+    """Test module views in sandboxed code."""
+
+    def test_import(self):
+        """Test that imported modules and their submodules work as usual."""
+        code = "import numpy as np\nfrom numpy import linalg\nprint(np.linalg.norm([3, 4]), linalg.det(np.eye(2)))"
+        assert interpret(code) == "5.0 1.0\n"
+
+    @pytest.mark.parametrize("code", [
+        "import random\nprint(random._os)",
+        "import random\nprint(random._os.system)",
+        "from random import _os\nprint(_os.getcwd())",
+        "import numpy as np\nprint(np.ctypeslib.os)",
+    ])
+    def test_blocked_submodules(self, code):
+        """Test that unauthorized modules reached through an authorized one are refused."""
+        assert "Forbidden access to module: os" in interpret(code)
+
+    @pytest.mark.parametrize("code", [
+        "import math\nmath.pi = 3",
+        "import math as m\nx = m\nx.tau = 1",
+        "import numpy as np\nnp.linalg.norm = abs",
+        "import math\ndel math.pi",
+    ])
+    def test_assignment_refused(self, code):
+        """Test that sandboxed code cannot modify a module."""
+        assert "InterpreterError" in interpret(code)
+
+    def test_no_leak_between_jobs(self):
+        """Test that a job cannot change what the modules of later jobs look like through the shared views."""
+        interpret("import math\nmath.pi = 3\nmath.sqrt = abs")
+        interpret("import numpy as np\nnp.linalg.norm = abs")
+        assert interpret("import math\nimport numpy as np\nprint(math.pi, math.sqrt(4), np.linalg.norm([3, 4]))") == (
+            f"{math.pi} 2.0 5.0\n")
+
+    def test_broader_imports_not_shared(self):
+        """Test that a module reached by a job allowed to import it stays blocked for a job that is not."""
+        assert "Forbidden" not in interpret("import random\nprint(random._os.sep)", ("random", "os"))
+        assert "Forbidden access to module: os" in interpret("import random\nprint(random._os.sep)", ("random",))
@@ -0,0 +1,160 @@
+"""
+Simple tests for persistent sessions - shared starts, eviction and busy sessions.
+"""
+
+import asyncio
+import pytest
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from python_code_execution.schemas import BASE_BUILTIN_MODULES, DEFAULT_MAX_LEN_OUTPUT
+from python_code_execution.sessions import SessionBusyError, SessionManager
+from python_code_execution.worker_pool import SandboxWorker
+
+
+class FakeWorker:
+    """Worker that runs a job until `release` is set and records the jobs it ran."""
+
+    def __init__(self):
+        self.jobs = []
+        self.killed = False
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def run(self, job, timeout, on_output=None):
+        self.jobs.append(job["code"])
+        await self.release.wait()
+        return {"text": job["code"], "content": []}
+
+    def alive(self):
+        return not self.killed
+
+    def kill(self):
+        self.killed = True
+
+    def memory_mb(self):
+        return 0.0
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    """Workers started by sessions, started after a short delay like real ones."""
+    started = []
+
+    async def start(warm_imports):
+        await asyncio.sleep(0.01)
+        started.append(FakeWorker())
+        return started[-1]
+
+    monkeypatch.setattr(SandboxWorker, "start", start)
+    return started
+
+
+def job(code):
+    return {"code": code}
+
+
+class TestSessionManager:
+    """Test opening, sharing and evicting sessions."""
+
+    def test_concurrent_first_calls(self, workers):
+        """Test that concurrent first calls with the same id share one worker."""
+        async def run():
+            sessions = SessionManager(max_sessions=2)
+            replies = await asyncio.gather(*(sessions.execute("a", job(f"call {i}"), timeout=5) for i in range(3)))
+            assert [reply["text"] for reply in replies] == ["call 0", "call 1", "call 2"]
+            sessions.close()
+
+        asyncio.run(asyncio.wait_for(run(), 5))
+        assert len(workers) == 1
+        assert workers[0].jobs == ["call 0", "call 1", "call 2"]
+
+    def test_evicts_least_recently_used(self, workers):
+        """Test that a new session evicts the least recently used idle one."""
+        async def run():
+            sessions = SessionManager(max_sessions=2)
+            await sessions.execute("a", job("1"), timeout=5)
+            await sessions.execute("b", job("2"), timeout=5)
+            await sessions.execute("a", job("3"), timeout=5)
+            await sessions.execute("c", job("4"), timeout=5)
+            assert "a" in sessions and "b" not in sessions and "c" in sessions
+            assert workers[1].killed and not workers[0].killed
+            sessions.close()
+
+        asyncio.run(asyncio.wait_for(run(), 5))
+
+    def test_busy_sessions_are_kept(self, workers):
+        """Test that a new session is refused rather than killing a session that is running code."""
+        async def run():
+            sessions = SessionManager(max_sessions=1)
+            await sessions.execute("a", job("warm up"), timeout=5)
+            workers[0].release.clear()
+            running = asyncio.ensure_future(sessions.execute("a", job("long job"), timeout=5))
+            await asyncio.sleep(0.05)
+            with pytest.raises(SessionBusyError):
+                await sessions.execute("b", job("other"), timeout=5)
+            assert not workers[0].killed
+            workers[0].release.set()
+            assert (await running)["text"] == "long job"
+            # Once idle, the session can make room
+            await sessions.execute("b", job("other"), timeout=5)
+            assert workers[0].killed
+            sessions.close()
+
+        asyncio.run(asyncio.wait_for(run(), 5))
+
+    def test_reset_while_waiting(self, workers):
+        """Test that a call waiting on a session that gets reset fails without starting a stray worker."""
+        async def run():
+            sessions = SessionManager(max_sessions=2)
+            await sessions.execute("a", job("warm up"), timeout=5)
+            workers[0].release.clear()
+            running = asyncio.ensure_future(sessions.execute("a", job("long job"), timeout=5))
+            waiting = asyncio.ensure_future(sessions.execute("a", job("next"), timeout=5))
+            await asyncio.sleep(0.05)
+            assert sessions.reset("a")
+            workers[0].release.set()
+            await running
+            with pytest.raises(RuntimeError):
+                await waiting
+            sessions.close()
+
+        asyncio.run(asyncio.wait_for(run(), 5))
+        assert len(workers) == 1
+
+
+class TestSessionState:
+    """Test the state a real session worker keeps between calls."""
+
+    def test_figures_are_kept(self, monkeypatch):
+        """Test that a figure opened in one call of a session is still open in the next."""
+        # The worker runs in a subprocess, which needs to import the package too
+        monkeypatch.setenv("PYTHONPATH", str(Path(__file__).parent.parent / "src"))
+
+        def worker_job(code):
+            return {
+                "code": code,
+                "authorized_imports": BASE_BUILTIN_MODULES,
+                "max_print_length": DEFAULT_MAX_LEN_OUTPUT,
+                "max_memory_mb": 1000,
+                "max_cpu_time_sec": 15,
+            }
+
+        async def run():
+            sessions = SessionManager(warm_imports=[])
+            try:
+                await sessions.execute("a", worker_job("import matplotlib.pyplot as plt\nplt.plot([1, 2])"), timeout=30)
+                reply = await sessions.execute(
+                    "a", worker_job("import matplotlib.pyplot as plt\nprint(plt.get_fignums(), len(plt.gca().lines))"),
+                    timeout=30,
+                )
+            finally:
+                sessions.close()
+                # Let the killed worker's transport close before the loop does
+                await asyncio.sleep(0.1)
+            return reply["text"]
+
+        assert asyncio.run(asyncio.wait_for(run(), 60)).strip() == "[1] 1"
@@ -0,0 +1,111 @@
+"""
+Simple tests for the warm worker pool - recycling workers and replacements that fail to start.
+"""
+
+import asyncio
+import pytest
+from pathlib import Path
+import sys
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from python_code_execution import worker_pool
+from python_code_execution.worker_pool import SandboxWorker, WorkerError, WorkerPool
+
+
+class FakeWorker:
+    """Worker that answers every job at once and asks to be recycled after it."""
+
+    def __init__(self):
+        self.jobs_done = 0
+        self.killed = False
+
+    async def run(self, job, timeout, on_output=None):
+        self.jobs_done += 1
+        return {"text": job["code"], "content": [], "recycle": True}
+
+    def alive(self):
+        return not self.killed
+
+    def kill(self):
+        self.killed = True
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    """Retry failed starts without waiting."""
+    monkeypatch.setattr(worker_pool, "WORKER_START_BACKOFF_SEC", 0.0)
+
+
+def failing_start(failures):
+    """A SandboxWorker.start that raises `failures` times, then starts fake workers."""
+    calls = []
+
+    async def start(warm_imports):
+        calls.append(warm_imports)
+        if len(calls) <= failures:
+            raise OSError("Too many open files")
+        return FakeWorker()
+
+    return start, calls
+
+
+def make_pool(size):
+    pool = WorkerPool(size=size, warm_imports=[])
+    for _ in range(size):
+        pool._idle.put_nowait(FakeWorker())
+    return pool
+
+
+class TestReplace:
+    """Test replacing recycled workers."""
+
+    def test_retry(self, monkeypatch):
+        """Test that a replacement is retried until a worker starts."""
+        start, calls = failing_start(failures=2)
+        monkeypatch.setattr(SandboxWorker, "start", start)
+
+        async def run():
+            pool = make_pool(1)
+            assert (await pool.execute({"code": "first"}, timeout=5))["text"] == "first"
+            assert (await pool.execute({"code": "second"}, timeout=5))["text"] == "second"
+            pool.close()
+
+        asyncio.run(asyncio.wait_for(run(), 5))
+        assert len(calls) >= 3
+
+    def test_no_workers_left(self, monkeypatch):
+        """Test that calls fail rather than wait forever once every replacement failed."""
+        start, _ = failing_start(failures=1000)
+        monkeypatch.setattr(SandboxWorker, "start", start)
+
+        async def run():
+            pool = make_pool(2)
+            await pool.execute({"code": "first"}, timeout=5)
+            await pool.execute({"code": "second"}, timeout=5)
+            # Both calls waiting for a worker, and later ones, are told that none is left
+            results = await asyncio.gather(*(pool.execute({"code": "third"}, timeout=5) for _ in range(2)),
+                                           return_exceptions=True)
+            assert all(isinstance(result, WorkerError) for result in results)
+            with pytest.raises(WorkerError):
+                await pool.execute({"code": "fourth"}, timeout=5)
+            pool.close()
+
+        asyncio.run(asyncio.wait_for(run(), 5))
+
+    def test_shrinks(self, monkeypatch):
+        """Test that a pool keeps serving calls with the workers it has left."""
+        start, _ = failing_start(failures=worker_pool.WORKER_START_RETRIES)
+        monkeypatch.setattr(SandboxWorker, "start", start)
+
+        async def run():
+            pool = make_pool(2)
+            await pool.execute({"code": "first"}, timeout=5)
+            await asyncio.gather(*pool._spawning)
+            assert pool._slots == 1
+            for _ in range(3):
+                assert (await pool.execute({"code": "again"}, timeout=5))["text"] == "again"
+            pool.close()
+
+        asyncio.run(asyncio.wait_for(run(), 5))